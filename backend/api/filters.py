@@ -1,20 +1,75 @@
-from django.db.models import BooleanField, ExpressionWrapper, Q
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import (
+    CharField,
+    Count,
+    Exists,
+    F,
+    FloatField,
+    Max,
+    Min,
+    OuterRef,
+    Value,
+)
 from django_filters import rest_framework as rf_filters
+from rest_framework.filters import OrderingFilter
+
+from core.caching import get_cache_version
+from products.models import FavoriteProduct, Product
+from products.search import search_products
+from recipes.models import Recipe
+
+# Filters whose values are counted by ProductFilter.get_facets
+FACET_FILTERS = [
+    "category",
+    "subcategory",
+    "producer",
+    "components",
+    "tags",
+    "promotions",
+]
+PRICE_FILTERS = ["min_price", "max_price"]
+
+
+class CachedAllValuesMultipleFilter(rf_filters.AllValuesMultipleFilter):
+    """
+    AllValuesMultipleFilter whose choices are cached till the products data
+    is changed instead of being queried on every request.
+    """
 
-from products.models import Product
+    @property
+    def field(self):
+        cache_key = (
+            f"filter_choices:{get_cache_version('products')}:"
+            f"{self.model._meta.label}:{self.field_name}"
+        )
+        choices = cache.get(cache_key)
+        if choices is None:
+            values = (
+                self.model._default_manager.distinct()
+                .order_by(self.field_name)
+                .values_list(self.field_name, flat=True)
+            )
+            choices = [(value, value) for value in values]
+            cache.set(cache_key, choices, settings.RESPONSE_CACHE_TIMEOUT)
+        self.extra["choices"] = choices
+        return super(rf_filters.AllValuesMultipleFilter, self).field
 
 
 class ProductFilter(rf_filters.FilterSet):
     """Class for filtering products."""
 
-    name = rf_filters.CharFilter(method="startswith_contains_union_method")
-    category = rf_filters.AllValuesMultipleFilter(field_name="category__slug")
-    subcategory = rf_filters.AllValuesMultipleFilter(field_name="subcategory__slug")
-    producer = rf_filters.AllValuesMultipleFilter(field_name="producer__slug")
-    components = rf_filters.AllValuesMultipleFilter(field_name="components__slug")
-    tags = rf_filters.AllValuesMultipleFilter(field_name="tags__slug")
-    promotions = rf_filters.AllValuesMultipleFilter(field_name="promotions__slug")
-    is_favorited = rf_filters.NumberFilter(method="product_boolean_methods")
+    name = rf_filters.CharFilter(method="name_search_method")
+    search = rf_filters.CharFilter(method="search_method")
+    category = CachedAllValuesMultipleFilter(field_name="category__slug")
+    subcategory = CachedAllValuesMultipleFilter(field_name="subcategory__slug")
+    producer = CachedAllValuesMultipleFilter(field_name="producer__slug")
+    components = CachedAllValuesMultipleFilter(field_name="components__slug")
+    tags = CachedAllValuesMultipleFilter(field_name="tags__slug")
+    promotions = CachedAllValuesMultipleFilter(field_name="promotions__slug")
+    is_favorited = rf_filters.NumberFilter(method="is_favorited_method")
     min_price = rf_filters.NumberFilter(method="get_min_price")
     max_price = rf_filters.NumberFilter(method="get_max_price")
 
@@ -22,6 +77,7 @@ class ProductFilter(rf_filters.FilterSet):
         model = Product
         fields = [
             "name",
+            "search",
             "category",
             "subcategory",
             "producer",
@@ -34,47 +90,147 @@ class ProductFilter(rf_filters.FilterSet):
             "max_price",
         ]
 
-    def startswith_contains_union_method(self, queryset, name, value):
+    def name_search_method(self, queryset, name, value):
         """
-        When using sqlite DB, filtering by name will be case-sensitive;
-        when using PostgreSQL DB, filtering by name will be case-insensitive
-        as it should be.
+        Full-text search by the product name only, the same as search_method
+        in the other fields.
         """
-        if not bool(value):
+        if not value.strip():
             return queryset
-        return (
-            queryset.filter(Q(name__istartswith=value) | Q(name__icontains=value))
-            .annotate(
-                is_start=ExpressionWrapper(
-                    Q(name__istartswith=value), output_field=BooleanField()
-                )
-            )
-            .order_by("-is_start")
-        )
+        return search_products(queryset, value, name_only=True)
+
+    def search_method(self, queryset, name, value):
+        """
+        Full-text search by the product name, producer, components and
+        description with Russian stemming, results are ranked by relevance.
+        """
+        if not value.strip():
+            return queryset
+        return search_products(queryset, value)
 
-    def product_boolean_methods(self, queryset, name, value):
+    def is_favorited_method(self, queryset, name, value):
+        """
+        Filters products by the favorited annotation which is added
+        by ProductSerializer.setup_eager_loading for authorized users.
+        """
         if value not in [0, 1]:
             return queryset
         user = self.request.user
         if user.is_anonymous:
             return queryset
-        product_ids = [obj.pk for obj in queryset if getattr(obj, name)(user) == value]
-        if product_ids:
-            return queryset.filter(pk__in=product_ids)
-        return queryset.none()
+        if "favorited" not in queryset.query.annotations:
+            queryset = queryset.annotate(
+                favorited=Exists(
+                    FavoriteProduct.objects.filter(user=user, product=OuterRef("id"))
+                )
+            )
+        return queryset.filter(favorited=bool(value))
 
     def get_min_price(self, queryset, name, value):
         if value <= 0:
             return queryset
-        product_ids = [obj.pk for obj in queryset if obj.final_price >= value]
-        if product_ids:
-            return queryset.filter(pk__in=product_ids)
-        return queryset.none()
+        return queryset.filter(final_price__gte=value)
 
     def get_max_price(self, queryset, name, value):
         if value <= 0:
             return queryset
-        product_ids = [obj.pk for obj in queryset if obj.final_price <= value]
-        if product_ids:
-            return queryset.filter(pk__in=product_ids)
-        return queryset.none()
+        return queryset.filter(final_price__lte=value)
+
+    def get_queryset_without(self, filter_names):
+        """Returns the queryset filtered by all the filters except the given."""
+        data = self.data.copy()
+        for filter_name in filter_names:
+            data.pop(filter_name, None)
+        filterset = self.__class__(data, self.queryset, request=self.request)
+        return filterset.qs.order_by()
+
+    def get_facets(self):
+        """
+        Counts products by values of every facet filter and finds the price
+        range in one query. Every facet is counted with all the filters except
+        its own, so other values of the facet can still be chosen.
+        """
+        no_value = Value(None, output_field=CharField())
+        no_price = Value(None, output_field=FloatField())
+        queries = [
+            self.get_queryset_without(PRICE_FILTERS)
+            .values(facet=Value("price"), facet_slug=no_value, facet_name=no_value)
+            .annotate(
+                count=Count("pk", distinct=True),
+                min_price=Min("final_price"),
+                max_price=Max("final_price"),
+            )
+        ]
+        for facet in FACET_FILTERS:
+            queries.append(
+                self.get_queryset_without([facet])
+                .values(
+                    facet=Value(facet),
+                    facet_slug=F(f"{facet}__slug"),
+                    facet_name=F(f"{facet}__name"),
+                )
+                .annotate(
+                    count=Count("pk", distinct=True),
+                    min_price=no_price,
+                    max_price=no_price,
+                )
+            )
+        facets = {facet: [] for facet in FACET_FILTERS}
+        facets["price"] = {"min": None, "max": None}
+        for row in queries[0].union(*queries[1:], all=True):
+            if row["facet"] == "price":
+                facets["price"] = {"min": row["min_price"], "max": row["max_price"]}
+            elif row["facet_slug"] is not None:
+                facets[row["facet"]].append(
+                    {
+                        "slug": row["facet_slug"],
+                        "name": row["facet_name"],
+                        "count": row["count"],
+                    }
+                )
+        for facet in FACET_FILTERS:
+            facets[facet].sort(key=lambda value: (-value["count"], value["name"]))
+        return facets
+
+    def get_cached_facets(self):
+        """Returns facets cached by the filter values till products are changed."""
+        signature = sorted(
+            (name, self.data.getlist(name))
+            for name in self.filters
+            if name in self.data
+        )
+        if "is_favorited" in self.data:
+            signature.append(("user", self.request.user.pk))
+        signature_hash = hashlib.md5(str(signature).encode()).hexdigest()
+        cache_key = f"facets:{get_cache_version('products')}:{signature_hash}"
+        facets = cache.get(cache_key)
+        if facets is None:
+            facets = self.get_facets()
+            cache.set(cache_key, facets, settings.RESPONSE_CACHE_TIMEOUT)
+        return facets
+
+
+class RecipeFilter(rf_filters.FilterSet):
+    """Class for filtering recipes by their nutrition totals."""
+
+    min_kcal = rf_filters.NumberFilter(field_name="kcal", lookup_expr="gte")
+    max_kcal = rf_filters.NumberFilter(field_name="kcal", lookup_expr="lte")
+    min_proteins = rf_filters.NumberFilter(field_name="proteins", lookup_expr="gte")
+    max_proteins = rf_filters.NumberFilter(field_name="proteins", lookup_expr="lte")
+
+    class Meta:
+        model = Recipe
+        fields = ["min_kcal", "max_kcal", "min_proteins", "max_proteins"]
+
+
+class ProductOrderingFilter(OrderingFilter):
+    """Orders found products by relevance unless other ordering is requested."""
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if (
+            "search_rank" in queryset.query.annotations
+            and not request.query_params.get(self.ordering_param)
+        ):
+            return ["-search_rank", *ordering]
+        return ordering
@@ -1,8 +1,36 @@
-from rest_framework import response, status
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from drf_yasg import openapi
+from rest_framework import permissions, response, serializers, status
 
 from .users_serializers import CustomUserDeleteSerializer, UserSerializer
+from core.caching import get_cache_version, get_response_cache_key
 
 MESSAGE_ON_DELETE = "This object was successfully deleted"
+FIELDS_QUERY_PARAM = "fields"
+EXPAND_QUERY_PARAM = "expand"
+
+SPARSE_FIELDSET_PARAMETERS = [
+    openapi.Parameter(
+        FIELDS_QUERY_PARAM,
+        openapi.IN_QUERY,
+        description=(
+            "Comma separated fields to return, nested objects are replaced "
+            "with their ids unless they are listed in the expand parameter"
+        ),
+        type=openapi.TYPE_STRING,
+    ),
+    openapi.Parameter(
+        EXPAND_QUERY_PARAM,
+        openapi.IN_QUERY,
+        description="Comma separated fields to return as nested objects",
+        type=openapi.TYPE_STRING,
+    ),
+]
 
 
 class DestroyWithPayloadMixin(object):
@@ -18,3 +46,125 @@ class DestroyWithPayloadMixin(object):
         serializer_data["Success"] = MESSAGE_ON_DELETE
         super().destroy(*args, **kwargs)
         return response.Response(serializer_data, status=status.HTTP_200_OK)
+
+
+class CachedResponseMixin(object):
+    """
+    Mixin to cache list and retrieve responses for anonymous users
+    and to answer their conditional requests with 304 Not Modified.
+    The cache is invalidated when data of the cache_group is changed.
+    """
+
+    cache_group = None
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_cached_response(self, view_method, request, *args, **kwargs):
+        if not request.user.is_anonymous:
+            return view_method(request, *args, **kwargs)
+        version = get_cache_version(self.cache_group)
+        cache_key = get_response_cache_key(self.cache_group, version, request)
+        headers = {
+            "ETag": quote_etag(hashlib.md5(cache_key.encode()).hexdigest()),
+            "Last-Modified": http_date(version),
+        }
+        not_modified = get_conditional_response(
+            request._request, etag=headers["ETag"], last_modified=version
+        )
+        if not_modified is not None:
+            return self.set_cache_headers(not_modified, headers)
+        data = cache.get(cache_key)
+        if data is None:
+            cached_response = view_method(request, *args, **kwargs)
+            if cached_response.status_code != status.HTTP_200_OK:
+                return cached_response
+            cache.set(cache_key, cached_response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        else:
+            cached_response = response.Response(data)
+        return self.set_cache_headers(cached_response, headers)
+
+    def set_cache_headers(self, cached_response, headers):
+        for header, value in headers.items():
+            cached_response[header] = value
+        return cached_response
+
+
+class SparseFieldset(object):
+    """
+    Fields requested with the fields and expand query parameters of GET
+    requests. Without the fields parameter all the fields are returned.
+    """
+
+    def __init__(self, request):
+        self.fields = self.get_param_values(request, FIELDS_QUERY_PARAM)
+        self.expand = self.get_param_values(request, EXPAND_QUERY_PARAM) or set()
+
+    @staticmethod
+    def get_param_values(request, param):
+        if (
+            request is None
+            or request.method not in permissions.SAFE_METHODS
+            or param not in request.query_params
+        ):
+            return None
+        return {
+            value.strip()
+            for values in request.query_params.getlist(param)
+            for value in values.split(",")
+            if value.strip()
+        }
+
+    def includes(self, field_name):
+        """Whether the field is returned."""
+        return self.fields is None or field_name in self.fields
+
+    def expands(self, field_name):
+        """Whether the field is returned as a nested object."""
+        return self.fields is None or (
+            field_name in self.fields and field_name in self.expand
+        )
+
+
+class SparseFieldsetMixin(object):
+    """
+    Serializer mixin to return only the fields requested by SparseFieldset,
+    nested serializers not listed in expand are replaced with ids.
+    Meta.collapsed_id_fields maps fields to the attributes of their objects
+    used as the ids instead of pks (e.g. product_id of order items).
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        root = self.parent
+        if isinstance(root, serializers.ListSerializer):
+            root = root.parent
+        if root is not None:
+            return fields
+        fieldset = SparseFieldset(self.context.get("request"))
+        id_fields = getattr(self.Meta, "collapsed_id_fields", {})
+        for field_name, field in list(fields.items()):
+            if not fieldset.includes(field_name):
+                del fields[field_name]
+            elif isinstance(field, serializers.BaseSerializer) and not (
+                fieldset.expands(field_name)
+            ):
+                fields[field_name] = self.get_collapsed_field(
+                    field, id_fields.get(field_name)
+                )
+        return fields
+
+    @staticmethod
+    def get_collapsed_field(field, id_field=None):
+        """Returns the field with the ids of the nested serializer objects."""
+        kwargs = {
+            "source": field.source,
+            "many": isinstance(field, serializers.ListSerializer),
+            "read_only": True,
+        }
+        if id_field is None:
+            return serializers.PrimaryKeyRelatedField(**kwargs)
+        return serializers.SlugRelatedField(slug_field=id_field, **kwargs)
@@ -4,6 +4,7 @@ import re
 from django.db.models import Prefetch
 from rest_framework import serializers
 
+from .mixins import SparseFieldset, SparseFieldsetMixin
 from .products_serializers import CouponLightSerializer, ProductPresentSerializer
 from .users_serializers import UserSerializer
 from orders.models import Order, OrderProduct
@@ -42,8 +43,6 @@ class ShoppingCartProductSerializer(serializers.ModelSerializer):
     def validate(self, attrs):
         if attrs["quantity"] < 1 or None:
             raise serializers.ValidationError(QUANTITY_ERROR_MESSAGE)
-        if not Product.objects.filter(id=attrs["id"]).exists():
-            raise serializers.ValidationError(PRODUCT_ERROR_MESSAGE)
         return attrs
 
 
@@ -66,6 +65,13 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
         fields = ("products",)
         model = Product
 
+    def validate_products(self, products):
+        """Checks all the products exist with one query."""
+        product_ids = {product["id"] for product in products}
+        if Product.objects.filter(id__in=product_ids).count() != len(product_ids):
+            raise serializers.ValidationError(PRODUCT_ERROR_MESSAGE)
+        return products
+
 
 class ShoppingCartProductListSerializer(serializers.Serializer):
     """Serializer for the list of products in the shopping cart."""
@@ -92,7 +98,7 @@ class ShoppingCartListSerializer(serializers.Serializer):
     discount_amount = serializers.FloatField(read_only=True)
 
 
-class OrderGetAuthSerializer(serializers.ModelSerializer):
+class OrderGetAuthSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for authorized user order representation."""
 
     products = OrderProductDisplaySerializer(source="orders", many=True)
@@ -119,21 +125,29 @@ class OrderGetAuthSerializer(serializers.ModelSerializer):
             "coupon",
         )
         model = Order
+        collapsed_id_fields = {"products": "product_id"}
 
     @classmethod
-    def setup_eager_loading(cls, queryset):
-        """Perform necessary eager loading of orders data."""
-        return queryset.select_related("user", "coupon_applied").prefetch_related(
-            Prefetch(
-                "orders",
-                queryset=OrderProduct.objects.select_related(
-                    "product__category",
-                ).prefetch_related("product__promotions"),
-            )
-        )
-
-
-class OrderGetAnonSerializer(serializers.ModelSerializer):
+    def setup_eager_loading(cls, queryset, fieldset=None):
+        """
+        Perform necessary eager loading of orders data,
+        only the relations of the requested fields are loaded.
+        """
+        fieldset = fieldset or SparseFieldset(None)
+        if fieldset.expands("user"):
+            queryset = queryset.select_related("user")
+        if fieldset.expands("coupon"):
+            queryset = queryset.select_related("coupon_applied")
+        if fieldset.expands("products"):
+            order_products = OrderProduct.objects.select_related("product__category")
+        elif fieldset.includes("products"):
+            order_products = OrderProduct.objects.only("id", "order", "product")
+        else:
+            return queryset
+        return queryset.prefetch_related(Prefetch("orders", queryset=order_products))
+
+
+class OrderGetAnonSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for anonimous user order representation."""
 
     products = OrderProductDisplaySerializer(source="orders", many=True)
@@ -159,6 +173,7 @@ class OrderGetAnonSerializer(serializers.ModelSerializer):
             "coupon",
         )
         model = Order
+        collapsed_id_fields = {"products": "product_id"}
 
     def get_user_data(self, obj):
         if obj.user_data is not None:
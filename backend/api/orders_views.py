@@ -1,8 +1,7 @@
-import stripe
 from django.conf import settings
 from django.contrib.sites.shortcuts import get_current_site
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import F, Q
 from django.utils import timezone
 from django.utils.decorators import method_decorator
 from drf_standardized_errors.openapi_serializers import (
@@ -28,8 +27,14 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
-from .mixins import MESSAGE_ON_DELETE, DestroyWithPayloadMixin
+from .mixins import (
+    MESSAGE_ON_DELETE,
+    SPARSE_FIELDSET_PARAMETERS,
+    DestroyWithPayloadMixin,
+    SparseFieldset,
+)
 from .orders_serializers import (
+    PRODUCT_ERROR_MESSAGE,
     OrderCreateAnonSerializer,
     OrderCreateAuthSerializer,
     OrderGetAnonSerializer,
@@ -41,12 +46,25 @@ from .orders_serializers import (
     StripePaySuccessPageSerializer,
     StripeSessionCreateSerializer,
 )
+from .pagination import OptionalCursorPagination
 from .products_serializers import CouponSerializer
 from .products_views import STATUS_200_RESPONSE_ON_DELETE_IN_DOCS
 from core.loggers import logger
-from core.utils import generate_order_number
-from orders.models import Delivery, Order, OrderProduct, ShoppingCart
+from core.tasks import send_email
+from orders.models import (
+    Delivery,
+    Order,
+    OrderProduct,
+    ShoppingCart,
+    generate_order_number,
+)
 from orders.shopping_carts import ShopCart
+from payments.gateways import (
+    PaymentGatewayAuthenticationError,
+    PaymentGatewayError,
+    PaymentGatewayRequestError,
+    get_payment_gateway,
+)
 from products.models import Coupon, Product
 from users.models import Address
 
@@ -73,6 +91,10 @@ STRIPE_INVALID_SESSION_ID_ERROR_MESSAGE = (
 STRIPE_API_KEY_ERROR_MESSAGE = "Неверный Stripe API key."
 SHOP_CART_CLEAR_MESSAGE = "Ваша корзина очищена, все товары из нее удалены."
 COUPON_ERROR_MESSAGE = "Промокод {code} недействителен."
+ORDER_CREATED_EMAIL_SUBJECT = "Заказ оформлен"
+ORDER_CREATED_EMAIL_MESSAGE = (
+    "Ваш заказ №{order_number} на сумму {total_price} ₽ оформлен."
+)
 
 
 @method_decorator(
@@ -261,8 +283,7 @@ class ShoppingCartViewSet(
         products = request.data["products"]
         serializer = ShoppingCartSerializer(data={"products": products})
         serializer.is_valid(raise_exception=True)
-        for product in products:
-            shopping_cart.add(product=product, quantity=product["quantity"])
+        shopping_cart.add_products(serializer.validated_data["products"])
         coupon = shopping_cart.get_coupon()
         total_price_without_coupon = shopping_cart.get_total_price_without_coupon()
         payload = {
@@ -342,6 +363,7 @@ class ShoppingCartViewSet(
     name="list",
     decorator=swagger_auto_schema(
         operation_summary="List all orders",
+        manual_parameters=SPARSE_FIELDSET_PARAMETERS,
         responses={200: OrderGetAuthSerializer, 401: ErrorResponse401Serializer},
     ),
 )
@@ -349,6 +371,7 @@ class ShoppingCartViewSet(
     name="retrieve",
     decorator=swagger_auto_schema(
         operation_summary="Get order by id",
+        manual_parameters=SPARSE_FIELDSET_PARAMETERS,
         responses={
             200: OrderGetAuthSerializer,
             403: ErrorResponse403Serializer,
@@ -410,8 +433,10 @@ class OrderViewSet(
 ):
     """Viewset for Order."""
 
-    queryset = OrderGetAuthSerializer.setup_eager_loading(Order.objects.all())
+    queryset = Order.objects.all()
     permission_classes = [AllowAny]
+    pagination_class = OptionalCursorPagination
+    ordering = ["-pk"]
 
     def get_serializer_class(self):
         if self.action == "pay":
@@ -426,6 +451,11 @@ class OrderViewSet(
             return OrderCreateAuthSerializer
         return OrderCreateAnonSerializer
 
+    def get_queryset(self):
+        return OrderGetAuthSerializer.setup_eager_loading(
+            Order.objects.all(), SparseFieldset(self.request)
+        )
+
     def create_order_data_and_new_address(self, data):
         order_data = {}
         order_data["comment"] = None
@@ -465,9 +495,9 @@ class OrderViewSet(
         and authorized users can only view their own orders.
         """
         user = self.request.user
-        order = get_object_or_404(Order, id=self.kwargs.get("pk"))
-        if (user.is_anonymous and order.user is not None) or (
-            user.is_authenticated and order.user != user
+        order = get_object_or_404(self.get_queryset(), id=self.kwargs.get("pk"))
+        if (user.is_anonymous and order.user_id is not None) or (
+            user.is_authenticated and order.user_id != user.pk
         ):
             payload = {
                 "type": ClientErrorEnum.CLIENT_ERROR,
@@ -490,6 +520,11 @@ class OrderViewSet(
         """Returns a list of all the orders of an authorized user."""
         if self.request.user.is_authenticated:
             queryset = self.get_queryset().filter(user=self.request.user)
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                logger.info("The user's order list page was successfully received.")
+                return self.get_paginated_response(serializer.data)
             serializer = self.get_serializer(queryset, many=True)
             logger.info("The user's order list was successfully received.")
             return Response(serializer.data, status=status.HTTP_200_OK)
@@ -534,36 +569,61 @@ class OrderViewSet(
         }
         serializer = self.get_serializer(shopping_data, request.data)
         serializer.is_valid(raise_exception=True)
-        order_data = self.create_order_data_and_new_address(request.data)
-
-        order = Order.objects.create(
-            user=order_data["user"],
-            user_data=order_data["user_data"],
-            status=Order.ORDERED,
-            payment_method=request.data["payment_method"],
-            delivery_method=request.data["delivery_method"],
-            delivery_point=order_data["delivery"],
-            package=order_data["package"],
-            comment=order_data["comment"],
-            address=order_data["address"],
-            add_address=order_data["add_address"],
-            total_price=shopping_data["total_price"] + int(order_data["package"]),
-        )
-        for prod in shopping_data["products"]:
-            product = Product.objects.get(id=prod["id"])
-            product.orders_number += 1
-            product.save()
-            OrderProduct.objects.create(
-                product=product,
-                quantity=prod["quantity"],
-                order=order,
+        quantities = {
+            product["id"]: product["quantity"] for product in shopping_data["products"]
+        }
+        products = Product.objects.only("id").in_bulk(quantities)
+        if len(products) != len(quantities):
+            logger.error(PRODUCT_ERROR_MESSAGE)
+            payload = {
+                "type": ClientErrorEnum.CLIENT_ERROR,
+                "errors": [
+                    {
+                        "code": ErrorCode404Enum.NOT_FOUND,
+                        "detail": PRODUCT_ERROR_MESSAGE,
+                    }
+                ],
+            }
+            return Response(
+                ErrorResponse404Serializer(payload).data,
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        # The number is taken before the transaction to release its counter
+        order_number = generate_order_number()
+        with transaction.atomic():
+            order_data = self.create_order_data_and_new_address(request.data)
+            order = Order.objects.create(
+                order_number=order_number,
+                user=order_data["user"],
+                user_data=order_data["user_data"],
+                status=Order.ORDERED,
+                payment_method=request.data["payment_method"],
+                delivery_method=request.data["delivery_method"],
+                delivery_point=order_data["delivery"],
+                package=order_data["package"],
+                comment=order_data["comment"],
+                address=order_data["address"],
+                add_address=order_data["add_address"],
+                total_price=shopping_data["total_price"] + int(order_data["package"]),
+                coupon_applied=coupon,
+                coupon_discount=coupon.discount if coupon else None,
+            )
+            OrderProduct.objects.bulk_create(
+                OrderProduct(order=order, product=product, quantity=quantities[pk])
+                for pk, product in products.items()
             )
-        order.order_number = generate_order_number()
-        if shopping_cart.coupon_id:
-            coupon = Coupon.objects.get(id=shopping_cart.coupon_id)
-            order.coupon_applied = coupon
-            order.coupon_discount = coupon.discount
-        order.save()
+            Product.objects.filter(pk__in=products).update(
+                orders_number=F("orders_number") + 1, updated_at=timezone.now()
+            )
+            if order.user is not None and order.user.email:
+                send_email.delay(
+                    subject=ORDER_CREATED_EMAIL_SUBJECT,
+                    message=ORDER_CREATED_EMAIL_MESSAGE.format(
+                        order_number=order.order_number,
+                        total_price=order.total_price,
+                    ),
+                    recipient_list=[order.user.email],
+                )
         if request.session.get("coupon_id"):
             del request.session["coupon_id"]
         shopping_cart.clear()
@@ -572,7 +632,7 @@ class OrderViewSet(
             if self.request.user.is_authenticated
             else OrderGetAnonSerializer
         )
-        response_serializer = response_serializer(order)
+        response_serializer = response_serializer(self.get_queryset().get(pk=order.pk))
         logger.info("The order was successfully created.")
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
@@ -600,7 +660,7 @@ class OrderViewSet(
                 ErrorResponse401Serializer(payload).data,
                 status=status.HTTP_401_UNAUTHORIZED,
             )
-        order = get_object_or_404(Order, id=self.kwargs.get("pk"))
+        order = get_object_or_404(self.get_queryset(), id=self.kwargs.get("pk"))
         if order.user != self.request.user:
             logger.error(ORDER_USER_ERROR_MESSAGE)
             payload = {
@@ -642,11 +702,10 @@ class OrderViewSet(
         logger.info("The order was successfully deleted.")
         return Response(serializer_data, status=status.HTTP_200_OK)
 
-    # TODO: test this endpoint
     @action(methods=["POST"], detail=True, permission_classes=[permissions.AllowAny])
     def pay(self, request, *args, **kwargs):
         """Creates a link for online payment for an order using Stripe."""
-        order = get_object_or_404(Order, id=self.kwargs.get("pk"))
+        order = get_object_or_404(self.get_queryset(), id=self.kwargs.get("pk"))
         if order.user is not None and order.user != self.request.user:
             payload = {
                 "type": ClientErrorEnum.CLIENT_ERROR,
@@ -679,26 +738,14 @@ class OrderViewSet(
                 ErrorResponse403Serializer(payload).data,
                 status=status.HTTP_403_FORBIDDEN,
             )
-        stripe.api_key = settings.STRIPE_SECRET_KEY
         current_site = get_current_site(request)
         if settings.MODE == "dev" or current_site.domain == "localhost":
             domain_url = f"http://{current_site}/"
         else:
             domain_url = f"https://{current_site}/"
         try:
-            checkout_session = stripe.checkout.Session.create(
-                line_items=[
-                    {
-                        "price_data": {
-                            "currency": "rub",
-                            "product_data": {
-                                "name": order,
-                            },
-                            "unit_amount": int(order.total_price * 100),
-                        },
-                        "quantity": 1,
-                    }
-                ],
+            checkout_session = get_payment_gateway().create_checkout_session(
+                order,
                 success_url=domain_url
                 + "payment-is-processing?session_id={CHECKOUT_SESSION_ID}",
                 cancel_url=domain_url
@@ -706,17 +753,13 @@ class OrderViewSet(
                 client_reference_id=request.user.username
                 if request.user.is_authenticated
                 else None,
-                payment_method_types=["card"],
-                mode="payment",
-                metadata={"order_id": order.id, "order_number": order.order_number},
             )
-            logger.info("Stripe Checkout Session created successfully.")
             payload = {"checkout_session_url": checkout_session.url}
             return Response(
                 StripeSessionCreateSerializer(payload).data,
                 status=status.HTTP_201_CREATED,
             )
-        except Exception as e:
+        except PaymentGatewayError as e:
             payload = {
                 "type": ServerErrorEnum.SERVER_ERROR,
                 "errors": [
@@ -732,24 +775,21 @@ class OrderViewSet(
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
-    # TODO: test this endpoint
     @action(methods=["POST"], detail=False, permission_classes=[permissions.AllowAny])
     def successful_pay(self, request, *args, **kwargs):
         """Shows the order id and number from Stripe Checkout Session after payment."""
         try:
-            stripe.api_key = settings.STRIPE_SECRET_KEY
             stripe_session_id = request.data["stripe_session_id"]
-            session = stripe.checkout.Session.retrieve(stripe_session_id)
+            session = get_payment_gateway().retrieve_checkout_session(stripe_session_id)
             payload = {
                 "stripe_session_id": stripe_session_id,
-                "order_id": session["metadata"]["order_id"],
-                "order_number": session["metadata"]["order_number"],
+                "order_id": session.metadata["order_id"],
+                "order_number": session.metadata["order_number"],
             }
             return Response(
                 StripePaySuccessPageSerializer(payload).data, status=status.HTTP_200_OK
             )
-        except stripe._error.AuthenticationError as e:
-            logger.error(f"{e}")
+        except PaymentGatewayAuthenticationError as e:
             payload = {
                 "type": ServerErrorEnum.SERVER_ERROR,
                 "errors": [
@@ -764,8 +804,7 @@ class OrderViewSet(
                 ErrorResponse500Serializer(payload).data,
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
-        except stripe._error.InvalidRequestError as e:
-            logger.error(f"{e}")
+        except PaymentGatewayRequestError as e:
             payload = {
                 "type": ServerErrorEnum.SERVER_ERROR,
                 "errors": [
@@ -1,4 +1,45 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.pagination import (
+    BasePagination,
+    Cursor,
+    CursorPagination,
+    PageNumberPagination,
+)
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from core.caching import get_cache_version
+
+
+def get_cached_count(queryset, view):
+    """
+    Counts objects of the queryset, the result is cached till the cache_group
+    data of the view is changed.
+    """
+    cache_group = getattr(view, "cache_group", None)
+    if cache_group is None:
+        return queryset.count()
+    queryset = queryset.order_by()
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    query_hash = hashlib.md5(f"{sql}{params}".encode()).hexdigest()
+    cache_key = f"count:{cache_group}:{get_cache_version(cache_group)}:{query_hash}"
+    count = cache.get(cache_key)
+    if count is None:
+        count = queryset.count()
+        cache.set(cache_key, count, settings.RESPONSE_CACHE_TIMEOUT)
+    return count
 
 
 class CustomPageNumberPagination(PageNumberPagination):
@@ -6,3 +47,212 @@ class CustomPageNumberPagination(PageNumberPagination):
 
     page_size_query_param = "limit"
     page_size = 10
+
+
+class CustomCursorPagination(CursorPagination):
+    """
+    Keyset pagination ordered by the OrderingFilter keys or the view ordering
+    with the pk as the tiebreaker. The cursor keeps the values of all the keys
+    of the page edge and NULLs go last, so no rows are skipped or repeated.
+    The total count is cached.
+    """
+
+    page_size_query_param = "limit"
+    page_size = 10
+    ordering = "pk"
+    ordering_error_message = "Cursor pagination can't order by {field}."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.ordering = getattr(view, "ordering", None) or self.ordering
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.count = get_cached_count(queryset, view)
+        self.keys = self.get_keys(queryset, self.get_ordering(request, queryset, view))
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        if self.cursor is not None:
+            queryset = queryset.filter(
+                self.get_keyset_filter(self.cursor.position, reverse)
+            )
+        queryset = queryset.order_by(*self.get_order_by(reverse))
+        results = list(queryset[: self.page_size + 1])
+        self.page = results[: self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        if not self.page:
+            self.has_next = self.has_previous = False
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_keys(self, queryset, ordering):
+        """
+        Returns the (name, descending, nullable) sort keys of the ordering,
+        foreign keys are compared by their columns.
+        """
+        opts = queryset.model._meta
+        keys = []
+        for item in ordering:
+            name = item.lstrip("-")
+            nullable = True
+            if name not in queryset.query.annotations:
+                try:
+                    field = opts.pk if name == "pk" else opts.get_field(name)
+                except FieldDoesNotExist:
+                    field = None
+                if field is None or not field.concrete or field.many_to_many:
+                    raise ParseError(self.ordering_error_message.format(field=name))
+                name, nullable = field.attname, field.null
+            keys.append((name, item.startswith("-"), nullable))
+        if opts.pk.attname not in [name for name, *_ in keys]:
+            keys.append((opts.pk.attname, False, False))
+        return keys
+
+    def get_order_by(self, reverse):
+        order_by = []
+        for name, descending, nullable in self.keys:
+            if descending != reverse:
+                expression = F(name).desc
+            else:
+                expression = F(name).asc
+            if not nullable:
+                order_by.append(expression())
+            elif reverse:
+                order_by.append(expression(nulls_first=True))
+            else:
+                order_by.append(expression(nulls_last=True))
+        return order_by
+
+    def get_keyset_filter(self, position, reverse):
+        """
+        Returns the condition of the rows following the position in the order
+        of the page: (a > x) or (a = x and b > y) and so on.
+        """
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (name, descending, nullable), value in zip(self.keys, position):
+            if value is None:
+                # NULLs go last, so only the reverse order has values after them
+                following = Q(**{f"{name}__isnull": False}) if reverse else None
+                same = Q(**{f"{name}__isnull": True})
+            else:
+                lookup = "lt" if descending != reverse else "gt"
+                following = Q(**{f"{name}__{lookup}": value})
+                if nullable and not reverse:
+                    following |= Q(**{f"{name}__isnull": True})
+                same = Q(**{name: value})
+            if following is not None:
+                condition |= equal & following
+            equal &= same
+        return condition
+
+    def get_position(self, instance):
+        return [getattr(instance, name) for name, *_ in self.keys]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(0, False, self.get_position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(Cursor(0, True, self.get_position(self.page[0])))
+
+    def encode_cursor(self, cursor):
+        data = json.dumps(
+            {"r": cursor.reverse, "p": cursor.position},
+            default=str,
+            separators=(",", ":"),
+        )
+        encoded = b64encode(data.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(b64decode(encoded.encode(), validate=True))
+            reverse, position = bool(data["r"]), list(data["p"])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if len(position) != len(self.keys):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(0, reverse, position)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("count", self.count),
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"] = {
+            "count": {"type": "integer", "example": 123},
+            **response_schema["properties"],
+        }
+        return response_schema
+
+
+class OptionalCursorPagination(BasePagination):
+    """
+    Switches to the cursor pagination if the request has the cursor query
+    parameter (an empty one for the first page), otherwise lists aren't paginated.
+    """
+
+    default_pagination_class = None
+    cursor_pagination_class = CustomCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        pagination_class = self.default_pagination_class
+        if self.cursor_pagination_class.cursor_query_param in request.query_params:
+            pagination_class = self.cursor_pagination_class
+        if pagination_class is None:
+            return None
+        self.paginator = pagination_class()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_schema_fields(self, view):
+        return self.cursor_pagination_class().get_schema_fields(view)
+
+    def get_schema_operation_parameters(self, view):
+        return self.cursor_pagination_class().get_schema_operation_parameters(view)
+
+
+class ProductPagination(OptionalCursorPagination, CustomPageNumberPagination):
+    """Page number pagination with the opt-in cursor pagination."""
+
+    default_pagination_class = CustomPageNumberPagination
+
+    def get_schema_fields(self, view):
+        cursor_query_param = self.cursor_pagination_class.cursor_query_param
+        return CustomPageNumberPagination.get_schema_fields(self, view) + [
+            field
+            for field in super().get_schema_fields(view)
+            if field.name == cursor_query_param
+        ]
+
+    def get_schema_operation_parameters(self, view):
+        cursor_query_param = self.cursor_pagination_class.cursor_query_param
+        return CustomPageNumberPagination.get_schema_operation_parameters(
+            self, view
+        ) + [
+            parameter
+            for parameter in super().get_schema_operation_parameters(view)
+            if parameter["name"] == cursor_query_param
+        ]
@@ -1,6 +1,8 @@
-from django.db.models import Avg, Exists, OuterRef, Prefetch
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Prefetch
 from rest_framework import serializers
 
+from .mixins import SparseFieldset, SparseFieldsetMixin
 from .users_serializers import UserLightSerializer
 from orders.shopping_carts import ShopCart
 from products.models import (
@@ -17,7 +19,24 @@ from products.models import (
     Tag,
 )
 
-RATING_DECIMAL_PLACES = 1
+TOP_PRODUCTS_ORDERING = ("-orders_number", "pk")
+
+
+def get_top_products_prefetch(products):
+    """
+    Returns the prefetch of the TOP_PRODUCTS_NUMBER best-selling products
+    of every category or tag. The sliced prefetch is ranked in the DB with
+    the ROW_NUMBER() window function partitioned by the category or tag
+    after filtering by the prefetched ones, so only the top products
+    of the requested categories or tags are fetched into top_products.
+    """
+    return Prefetch(
+        "products",
+        queryset=products.order_by(*TOP_PRODUCTS_ORDERING)[
+            : settings.TOP_PRODUCTS_NUMBER
+        ],
+        to_attr="top_products",
+    )
 
 
 class SubcategoryLightSerializer(serializers.ModelSerializer):
@@ -148,7 +167,7 @@ class PromotionSerializer(ProducerLightSerializer):
         return value
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for displaying products."""
 
     category = CategoryLightSerializer(read_only=True)
@@ -160,8 +179,8 @@ class ProductSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     promotion_quantity = serializers.SerializerMethodField()
     photo = serializers.ImageField(required=False)
-    final_price = serializers.SerializerMethodField()
-    rating = serializers.SerializerMethodField()
+    final_price = serializers.FloatField(read_only=True)
+    rating = serializers.FloatField(read_only=True)
 
     class Meta:
         model = Product
@@ -194,22 +213,31 @@ class ProductSerializer(serializers.ModelSerializer):
         )
 
     @classmethod
-    def setup_eager_loading(cls, queryset, user):
-        """Perform necessary eager loading of products data."""
-        if user.is_anonymous:
-            return (
-                queryset.select_related("category", "subcategory", "producer")
-                .prefetch_related("components", "tags", "promotions", "reviews")
-                .annotate(rating=Avg("reviews__score"))
-            )
-        return (
-            queryset.select_related("category", "subcategory", "producer")
-            .prefetch_related("components", "tags", "promotions", "reviews")
-            .annotate(
-                rating=Avg("reviews__score"),
-                favorited=Exists(
-                    FavoriteProduct.objects.filter(user=user, product=OuterRef("id"))
-                ),
+    def setup_eager_loading(cls, queryset, user, fieldset=None):
+        """
+        Perform necessary eager loading of products data,
+        only the relations of the requested fields are loaded.
+        """
+        fieldset = fieldset or SparseFieldset(None)
+        queryset = queryset.select_related(
+            *[
+                field
+                for field in ("category", "subcategory", "producer")
+                if fieldset.expands(field)
+            ]
+        ).prefetch_related(
+            *[
+                field
+                for field in ("components", "tags", "promotions")
+                if fieldset.includes(field)
+                or (field == "promotions" and fieldset.includes("promotion_quantity"))
+            ]
+        )
+        if user.is_anonymous or not fieldset.includes("is_favorited"):
+            return queryset
+        return queryset.annotate(
+            favorited=Exists(
+                FavoriteProduct.objects.filter(user=user, product=OuterRef("id"))
             )
         )
 
@@ -222,17 +250,6 @@ class ProductSerializer(serializers.ModelSerializer):
     def get_promotion_quantity(self, obj) -> int:
         return obj.promotions.count()
 
-    def get_final_price(self, obj) -> float:
-        return obj.final_price
-
-    def get_rating(self, obj) -> float:
-        """Rounds and returns the annotated rating value."""
-        return (
-            round(obj.rating, RATING_DECIMAL_PLACES)
-            if obj.rating is not None
-            else obj.rating
-        )
-
 
 class ProductCreateSerializer(ProductSerializer):
     """Serializer for creating products."""
@@ -324,7 +341,7 @@ class ProductPresentSerializer(serializers.ModelSerializer):
     """Serializer for short presentation products in order list."""
 
     photo = serializers.ImageField(required=False)
-    final_price = serializers.SerializerMethodField()
+    final_price = serializers.FloatField(read_only=True)
     category = CategoryLightSerializer(read_only=True)
 
     class Meta:
@@ -339,16 +356,13 @@ class ProductPresentSerializer(serializers.ModelSerializer):
             "category",
         )
 
-    def get_final_price(self, obj) -> float:
-        return obj.final_price
-
 
 class ProductTopSerializer(serializers.ModelSerializer):
     """
     Serializer for products in top_products field in lists of categories or tags."""
 
     photo = serializers.ImageField(required=False)
-    final_price = serializers.SerializerMethodField()
+    final_price = serializers.FloatField(read_only=True)
     category = CategoryLightSerializer(read_only=True)
     is_favorited = serializers.SerializerMethodField()
 
@@ -366,9 +380,6 @@ class ProductTopSerializer(serializers.ModelSerializer):
             "orders_number",
         )
 
-    def get_final_price(self, obj) -> float:
-        return obj.final_price
-
     def get_is_favorited(self, obj) -> bool:
         request = self.context.get("request")
         if not request or request.user.is_anonymous:
@@ -391,6 +402,44 @@ class ProductUserOrderCheckSerializer(serializers.Serializer):
     ordered = serializers.BooleanField(read_only=True)
 
 
+class SuggestionSerializer(serializers.Serializer):
+    """Serializer for search-as-you-type suggestions."""
+
+    type = serializers.ChoiceField(
+        choices=["product", "category", "tag", "producer"], read_only=True
+    )
+    id = serializers.IntegerField(read_only=True)
+    name = serializers.CharField(read_only=True)
+    slug = serializers.SlugField(read_only=True, allow_null=True)
+
+
+class FacetValueSerializer(serializers.Serializer):
+    """Serializer for a facet value with the number of matching products."""
+
+    slug = serializers.SlugField(read_only=True)
+    name = serializers.CharField(read_only=True)
+    count = serializers.IntegerField(read_only=True)
+
+
+class PriceRangeSerializer(serializers.Serializer):
+    """Serializer for the price range of matching products."""
+
+    min = serializers.FloatField(read_only=True, allow_null=True)
+    max = serializers.FloatField(read_only=True, allow_null=True)
+
+
+class ProductFacetsSerializer(serializers.Serializer):
+    """Serializer for the product filter facets."""
+
+    category = FacetValueSerializer(many=True, read_only=True)
+    subcategory = FacetValueSerializer(many=True, read_only=True)
+    producer = FacetValueSerializer(many=True, read_only=True)
+    components = FacetValueSerializer(many=True, read_only=True)
+    tags = FacetValueSerializer(many=True, read_only=True)
+    promotions = FacetValueSerializer(many=True, read_only=True)
+    price = PriceRangeSerializer(read_only=True)
+
+
 class FavoriteProductSerializer(serializers.ModelSerializer):
     """Serializer for favorite products list representation."""
 
@@ -421,43 +470,37 @@ class FavoriteProductDeleteSerializer(serializers.Serializer):
     success = serializers.CharField()
 
 
-class CategorySerializer(CategoryLightSerializer):
-    """Serializer for displaying categories and their top three products."""
+class CategorySerializer(SparseFieldsetMixin, CategoryLightSerializer):
+    """Serializer for displaying categories and their top products."""
 
     subcategories = SubcategoryLightSerializer(many=True, required=False)
-    top_products = ProductTopSerializer(many=True, source="products")
+    top_products = ProductTopSerializer(many=True, read_only=True, default=list)
 
     class Meta(CategoryLightSerializer.Meta):
         fields = ("id", "name", "slug", "image", "subcategories", "top_products")
 
     @classmethod
-    def setup_eager_loading(cls, queryset, user):
-        """Perform necessary eager loading of categories data."""
-        if user.is_anonymous:
-            return queryset.prefetch_related(
-                "subcategories",
-                Prefetch(
-                    "products",
-                    queryset=Product.objects.prefetch_related("promotions").order_by(
-                        "-orders_number"
-                    ),
-                ),
-            )
-        return queryset.prefetch_related(
-            "subcategories",
-            Prefetch(
-                "products",
-                queryset=Product.objects.prefetch_related("promotions")
-                .annotate(
-                    favorited=Exists(
-                        FavoriteProduct.objects.filter(
-                            user=user, product=OuterRef("id")
-                        )
-                    )
+    def setup_eager_loading(cls, queryset, user, fieldset=None):
+        """
+        Perform necessary eager loading of categories data.
+        Only the top products of the categories are fetched from the DB
+        and only the relations of the requested fields are loaded.
+        """
+        fieldset = fieldset or SparseFieldset(None)
+        if fieldset.includes("subcategories"):
+            queryset = queryset.prefetch_related("subcategories")
+        if not fieldset.includes("top_products"):
+            return queryset
+        top_products = Product.objects.all()
+        if not fieldset.expands("top_products"):
+            top_products = top_products.only("id", "category")
+        elif not user.is_anonymous:
+            top_products = top_products.annotate(
+                favorited=Exists(
+                    FavoriteProduct.objects.filter(user=user, product=OuterRef("id"))
                 )
-                .order_by("-orders_number"),
-            ),
-        )
+            )
+        return queryset.prefetch_related(get_top_products_prefetch(top_products))
 
 
 class CategoryBriefSerializer(CategorySerializer):
@@ -472,38 +515,25 @@ class CategoryBriefSerializer(CategorySerializer):
 class TagSerializer(TagLightSerializer):
     """Serializer for tags representation."""
 
-    top_products = ProductTopSerializer(many=True, source="products", required=False)
+    top_products = ProductTopSerializer(many=True, read_only=True, default=list)
 
     class Meta(TagLightSerializer.Meta):
         fields = ("id", "name", "slug", "image", "top_products")
 
     @classmethod
     def setup_eager_loading(cls, queryset, user):
-        """Perform necessary eager loading of tags data."""
-        if user.is_anonymous:
-            return queryset.prefetch_related(
-                Prefetch(
-                    "products",
-                    queryset=Product.objects.select_related("category")
-                    .prefetch_related("promotions")
-                    .order_by("-orders_number"),
-                ),
-            )
-        return queryset.prefetch_related(
-            Prefetch(
-                "products",
-                queryset=Product.objects.select_related("category")
-                .prefetch_related("promotions")
-                .annotate(
-                    favorited=Exists(
-                        FavoriteProduct.objects.filter(
-                            user=user, product=OuterRef("id")
-                        )
-                    )
+        """
+        Perform necessary eager loading of tags data.
+        Only the top products of the tags are fetched from the DB.
+        """
+        top_products = Product.objects.select_related("category")
+        if not user.is_anonymous:
+            top_products = top_products.annotate(
+                favorited=Exists(
+                    FavoriteProduct.objects.filter(user=user, product=OuterRef("id"))
                 )
-                .order_by("-orders_number"),
-            ),
-        )
+            )
+        return queryset.prefetch_related(get_top_products_prefetch(top_products))
 
 
 class CouponSerializer(serializers.ModelSerializer):
@@ -1,7 +1,9 @@
+from django.conf import settings
 from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django.utils.decorators import method_decorator
 from django_filters import rest_framework as rf_filters
+from django_filters.utils import translate_validation
 from drf_standardized_errors.openapi_serializers import (
     ClientErrorEnum,
     ErrorCode406Enum,
@@ -11,13 +13,20 @@ from drf_standardized_errors.openapi_serializers import (
     ErrorResponse406Serializer,
     ValidationErrorResponseSerializer,
 )
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from rest_framework import filters, permissions, response, status, viewsets
+from rest_framework import permissions, response, status, viewsets
 from rest_framework.decorators import action
 
-from .filters import ProductFilter
-from .mixins import MESSAGE_ON_DELETE, DestroyWithPayloadMixin
-from .pagination import CustomPageNumberPagination
+from .filters import ProductFilter, ProductOrderingFilter
+from .mixins import (
+    MESSAGE_ON_DELETE,
+    SPARSE_FIELDSET_PARAMETERS,
+    CachedResponseMixin,
+    DestroyWithPayloadMixin,
+    SparseFieldset,
+)
+from .pagination import ProductPagination
 from .permissions import IsAdminOrReadOnly
 from .products_serializers import (
     CategoryBriefSerializer,
@@ -29,11 +38,13 @@ from .products_serializers import (
     FavoriteProductSerializer,
     ProducerSerializer,
     ProductCreateSerializer,
+    ProductFacetsSerializer,
     ProductSerializer,
     ProductUpdateSerializer,
     ProductUserOrderCheckSerializer,
     PromotionSerializer,
     SubcategorySerializer,
+    SuggestionSerializer,
     TagSerializer,
 )
 from orders.models import OrderProduct
@@ -47,6 +58,8 @@ from products.models import (
     Subcategory,
     Tag,
 )
+from products.suggestions import suggestion_index
+from products.views_counter import product_views_buffer
 
 NO_FAVORITE_PRODUCT_ERROR_MESSAGE = "Этого продукта не было в вашем списке Избранного."
 DOUBLE_FAVORITE_PRODUCT_ERROR_MESSAGE = (
@@ -61,6 +74,7 @@ STATUS_200_RESPONSE_ON_DELETE_IN_DOCS = (
     name="list",
     decorator=swagger_auto_schema(
         operation_summary="List all categories",
+        manual_parameters=SPARSE_FIELDSET_PARAMETERS,
         operation_description="Returns a list of all the categories",
         responses={200: CategorySerializer},
     ),
@@ -69,6 +83,7 @@ STATUS_200_RESPONSE_ON_DELETE_IN_DOCS = (
     name="retrieve",
     decorator=swagger_auto_schema(
         operation_summary="Get category by id",
+        manual_parameters=SPARSE_FIELDSET_PARAMETERS,
         operation_description="Retrieves a category by its id",
         responses={200: CategorySerializer, 404: ErrorResponse404Serializer},
     ),
@@ -127,13 +142,16 @@ STATUS_200_RESPONSE_ON_DELETE_IN_DOCS = (
         responses={200: CategoryBriefSerializer, 404: ErrorResponse404Serializer},
     ),
 )
-class CategoryViewSet(DestroyWithPayloadMixin, viewsets.ModelViewSet):
+class CategoryViewSet(
+    CachedResponseMixin, DestroyWithPayloadMixin, viewsets.ModelViewSet
+):
     """Viewset for categories."""
 
     http_method_names = ["get", "post", "patch", "delete"]
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAdminOrReadOnly]
+    cache_group = "categories"
 
     def get_serializer_class(self):
         if self.action in ["create", "partial_update"]:
@@ -144,7 +162,7 @@ class CategoryViewSet(DestroyWithPayloadMixin, viewsets.ModelViewSet):
 
     def get_queryset(self):
         return CategorySerializer.setup_eager_loading(
-            Category.objects.all(), self.request.user
+            Category.objects.all(), self.request.user, SparseFieldset(self.request)
         )
 
     # TODO: test this endpoint
@@ -304,13 +322,16 @@ class SubcategoryViewSet(DestroyWithPayloadMixin, viewsets.ModelViewSet):
         },
     ),
 )
-class ComponentViewSet(DestroyWithPayloadMixin, viewsets.ModelViewSet):
+class ComponentViewSet(
+    CachedResponseMixin, DestroyWithPayloadMixin, viewsets.ModelViewSet
+):
     """Viewset for components."""
 
     http_method_names = ["get", "post", "patch", "delete"]
     queryset = Component.objects.all()
     serializer_class = ComponentSerializer
     permission_classes = [IsAdminOrReadOnly]
+    cache_group = "components"
 
 
 @method_decorator(
@@ -369,13 +390,14 @@ class ComponentViewSet(DestroyWithPayloadMixin, viewsets.ModelViewSet):
         },
     ),
 )
-class TagViewSet(DestroyWithPayloadMixin, viewsets.ModelViewSet):
+class TagViewSet(CachedResponseMixin, DestroyWithPayloadMixin, viewsets.ModelViewSet):
     """Viewset for tags."""
 
     http_method_names = ["get", "post", "patch", "delete"]
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [IsAdminOrReadOnly]
+    cache_group = "tags"
 
     def get_queryset(self):
         return TagSerializer.setup_eager_loading(Tag.objects.all(), self.request.user)
@@ -437,13 +459,16 @@ class TagViewSet(DestroyWithPayloadMixin, viewsets.ModelViewSet):
         },
     ),
 )
-class ProducerViewSet(DestroyWithPayloadMixin, viewsets.ModelViewSet):
+class ProducerViewSet(
+    CachedResponseMixin, DestroyWithPayloadMixin, viewsets.ModelViewSet
+):
     """Viewset for producers."""
 
     http_method_names = ["get", "post", "patch", "delete"]
     queryset = Producer.objects.all()
     serializer_class = ProducerSerializer
     permission_classes = [IsAdminOrReadOnly]
+    cache_group = "producers"
 
 
 @method_decorator(
@@ -502,19 +527,23 @@ class ProducerViewSet(DestroyWithPayloadMixin, viewsets.ModelViewSet):
         },
     ),
 )
-class PromotionViewSet(DestroyWithPayloadMixin, viewsets.ModelViewSet):
+class PromotionViewSet(
+    CachedResponseMixin, DestroyWithPayloadMixin, viewsets.ModelViewSet
+):
     """Viewset for promotions."""
 
     http_method_names = ["get", "post", "patch", "delete"]
     queryset = Promotion.objects.all()
     serializer_class = PromotionSerializer
     permission_classes = [IsAdminOrReadOnly]
+    cache_group = "promotions"
 
 
 @method_decorator(
     name="list",
     decorator=swagger_auto_schema(
         operation_summary="List all products",
+        manual_parameters=SPARSE_FIELDSET_PARAMETERS,
         operation_description="Returns a list of all the products",
         responses={200: ProductSerializer},
     ),
@@ -523,6 +552,7 @@ class PromotionViewSet(DestroyWithPayloadMixin, viewsets.ModelViewSet):
     name="retrieve",
     decorator=swagger_auto_schema(
         operation_summary="Get product by id",
+        manual_parameters=SPARSE_FIELDSET_PARAMETERS,
         operation_description="Retrieves a product by its id",
         responses={200: ProductSerializer, 404: ErrorResponse404Serializer},
     ),
@@ -567,17 +597,20 @@ class PromotionViewSet(DestroyWithPayloadMixin, viewsets.ModelViewSet):
         },
     ),
 )
-class ProductViewSet(DestroyWithPayloadMixin, viewsets.ModelViewSet):
+class ProductViewSet(
+    CachedResponseMixin, DestroyWithPayloadMixin, viewsets.ModelViewSet
+):
     """Viewset for products."""
 
     http_method_names = ["get", "post", "patch", "delete"]
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [IsAdminOrReadOnly]
-    filter_backends = [rf_filters.DjangoFilterBackend, filters.OrderingFilter]
+    cache_group = "products"
+    filter_backends = [rf_filters.DjangoFilterBackend, ProductOrderingFilter]
     filterset_class = ProductFilter
     ordering = ["pk"]
-    pagination_class = CustomPageNumberPagination
+    pagination_class = ProductPagination
 
     def get_serializer_class(self):
         if self.action == "create":
@@ -592,7 +625,7 @@ class ProductViewSet(DestroyWithPayloadMixin, viewsets.ModelViewSet):
 
     def get_queryset(self):
         return ProductSerializer.setup_eager_loading(
-            Product.objects.all(), self.request.user
+            Product.objects.all(), self.request.user, SparseFieldset(self.request)
         )
 
     @transaction.atomic
@@ -610,13 +643,15 @@ class ProductViewSet(DestroyWithPayloadMixin, viewsets.ModelViewSet):
             serializer.save(category=subcategory.parent_category)
         return super().perform_update(serializer)
 
-    @transaction.atomic
     def retrieve(self, request, *args, **kwargs):
-        """Increments the views_number field when someone views this product."""
-        obj = self.get_object()
-        obj.views_number += 1
-        obj.save(update_fields=("views_number",))
-        return super().retrieve(request, *args, **kwargs)
+        """
+        Counts the product view. Views are accumulated in a buffer
+        and saved to the DB in bulk periodically.
+        """
+        instance = self.get_object()
+        instance.views_number += product_views_buffer.add(instance.pk)
+        serializer = self.get_serializer(instance)
+        return response.Response(serializer.data)
 
     @swagger_auto_schema(
         method="post",
@@ -705,6 +740,68 @@ class ProductViewSet(DestroyWithPayloadMixin, viewsets.ModelViewSet):
         )
         return response.Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @swagger_auto_schema(
+        method="get",
+        operation_summary="Suggest names for the search box",
+        operation_description=(
+            "Returns the best matching products, categories, tags and producers "
+            "by the beginning of their names' words, misspelled words also match"
+        ),
+        manual_parameters=[
+            openapi.Parameter("q", openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter("limit", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        ],
+        responses={200: SuggestionSerializer(many=True)},
+    )
+    @action(
+        methods=["get"],
+        detail=False,
+        permission_classes=[permissions.AllowAny],
+        filter_backends=[],
+        pagination_class=None,
+    )
+    def suggest(self, request):
+        """Returns suggestions from the in-process index without DB queries."""
+        try:
+            limit = int(request.query_params.get("limit", settings.SUGGESTIONS_NUMBER))
+        except ValueError:
+            limit = settings.SUGGESTIONS_NUMBER
+        limit = max(min(limit, settings.MAX_SUGGESTIONS_NUMBER), 0)
+        suggestions = suggestion_index.search(request.query_params.get("q", ""), limit)
+        return response.Response(
+            SuggestionSerializer(suggestions, many=True).data, status=status.HTTP_200_OK
+        )
+
+    @swagger_auto_schema(
+        method="get",
+        operation_summary="Get product filter facets",
+        operation_description=(
+            "Returns the number of products for every value of the category, "
+            "subcategory, producer, components, tags and promotions filters "
+            "and the price range of the products found by the other filters"
+        ),
+        responses={
+            200: ProductFacetsSerializer,
+            400: ValidationErrorResponseSerializer,
+        },
+    )
+    @action(
+        methods=["get"],
+        detail=False,
+        permission_classes=[permissions.AllowAny],
+        pagination_class=None,
+    )
+    def facets(self, request):
+        """Returns product counts of the filter values in one DB query."""
+        filterset = ProductFilter(
+            request.query_params, Product.objects.all(), request=request
+        )
+        if not filterset.is_valid():
+            raise translate_validation(filterset.errors)
+        return response.Response(
+            filterset.get_cached_facets(), status=status.HTTP_200_OK
+        )
+
     # TODO: test this endpoint
     @method_decorator(
         name="retrieve",
@@ -1,6 +1,6 @@
 from math import ceil
 
-from django.db.models import Count, F, Prefetch, Sum
+from django.db.models import Prefetch
 from drf_yasg import openapi
 from rest_framework import serializers
 
@@ -93,7 +93,6 @@ class RecipeSerializer(serializers.ModelSerializer):
     """Serializer for recipe representation."""
 
     ingredients = ProductsInRecipeSerializer(source="recipeingredient", many=True)
-    total_ingredients = serializers.SerializerMethodField()
     proteins = serializers.SerializerMethodField()
     fats = serializers.SerializerMethodField()
     carbohydrates = serializers.SerializerMethodField()
@@ -120,32 +119,15 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     @classmethod
     def setup_eager_loading(cls, queryset):
-        """Perform necessary eager loading of recipes data."""
+        """
+        Perform necessary eager loading of recipes data, nutrition totals
+        are kept in the recipe columns.
+        """
         return queryset.prefetch_related(
             Prefetch(
                 "recipeingredient",
-                queryset=ProductsInRecipe.objects.select_related(
-                    "ingredient"
-                ).prefetch_related("ingredient__promotions"),
+                queryset=ProductsInRecipe.objects.select_related("ingredient"),
             )
-        ).annotate(
-            total_ingredients=Count("ingredients"),
-            proteins=Sum(
-                F("recipeingredient__ingredient__proteins")
-                * F("recipeingredient__amount")
-                / 100
-            ),
-            fats=Sum(
-                F("recipeingredient__ingredient__fats")
-                * F("recipeingredient__amount")
-                / 100
-            ),
-            carbohydrates=Sum(
-                F("recipeingredient__ingredient__carbohydrates")
-                * F("recipeingredient__amount")
-                / 100
-            ),
-            kcal=F("proteins") * 4 + F("fats") * 9 + F("carbohydrates") * 4,
         )
 
     def get_proteins(self, obj) -> float:
@@ -159,6 +141,3 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     def get_kcal(self, obj) -> int:
         return round(obj.kcal, RECIPE_KCAL_DECIMAL_PLACES)
-
-    def get_total_ingredients(self, obj) -> int:
-        return obj.total_ingredients
@@ -1,8 +1,12 @@
 from django.utils.decorators import method_decorator
+from django_filters import rest_framework as rf_filters
 from drf_standardized_errors.openapi_serializers import ErrorResponse404Serializer
 from drf_yasg.utils import swagger_auto_schema
+from rest_framework.filters import OrderingFilter
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
+from .filters import RecipeFilter
+from .mixins import CachedResponseMixin
 from .recipes_serializers import RecipeSerializer
 from recipes.models import Recipe
 
@@ -11,7 +15,10 @@ from recipes.models import Recipe
     name="list",
     decorator=swagger_auto_schema(
         operation_summary="List all recipes",
-        operation_description=("Returns a list of all the recipes"),
+        operation_description=(
+            "Returns a list of all the recipes, they can be filtered "
+            "and ordered by nutrition totals"
+        ),
         responses={200: RecipeSerializer},
     ),
 )
@@ -23,6 +30,13 @@ from recipes.models import Recipe
         responses={200: RecipeSerializer, 404: ErrorResponse404Serializer},
     ),
 )
-class RecipeViewSet(ReadOnlyModelViewSet):
-    queryset = RecipeSerializer.setup_eager_loading(Recipe.objects.all())
+class RecipeViewSet(CachedResponseMixin, ReadOnlyModelViewSet):
+    queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
+    cache_group = "recipes"
+    filter_backends = [rf_filters.DjangoFilterBackend, OrderingFilter]
+    filterset_class = RecipeFilter
+    ordering_fields = ["kcal", "proteins", "fats", "carbohydrates", "cooking_time"]
+
+    def get_queryset(self):
+        return RecipeSerializer.setup_eager_loading(super().get_queryset())
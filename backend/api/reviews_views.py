@@ -12,6 +12,7 @@ from rest_framework import permissions, response, status, viewsets
 from rest_framework.decorators import action
 
 from .mixins import DestroyWithPayloadMixin
+from .pagination import OptionalCursorPagination
 from .permissions import IsAuthorOrAdminOrReadOnly
 from .products_views import STATUS_200_RESPONSE_ON_DELETE_IN_DOCS
 from .reviews_serializers import ReviewSerializer, ReviewUserCheckSerializer
@@ -89,6 +90,7 @@ class ReviewViewSet(DestroyWithPayloadMixin, viewsets.ModelViewSet):
     queryset = Review.objects.select_related("product", "author")
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthorOrAdminOrReadOnly]
+    pagination_class = OptionalCursorPagination
 
     def get_serializer_class(self):
         if self.action == "review_user_check":
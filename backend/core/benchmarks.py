@@ -0,0 +1,530 @@
+import random
+import re
+import statistics
+import time
+from collections import namedtuple
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from core.caching import CACHED_RESPONSE_DEPENDENCIES, invalidate_cached_responses
+from core.middleware import query_stats_recorded
+from orders.models import Order, OrderProduct
+from products.models import (
+    Category,
+    Component,
+    FavoriteProduct,
+    Producer,
+    Product,
+    ProductPromotion,
+    Promotion,
+    Subcategory,
+    Tag,
+    apply_discount,
+    update_search_vectors,
+)
+from products.search import product_search_index
+from products.suggestions import suggestion_index
+from recipes.models import ProductsInRecipe, Recipe, update_recipes_nutrition
+from reviews.models import Review, update_products_rating
+from users.models import User
+
+BATCH_SIZE = 5000
+BENCHMARK_PASSWORD = "benchmark-password"
+
+# Words of the generated product names, so the search finds something
+# fmt: off
+ADJECTIVES = (
+    "свежий", "органический", "домашний", "фермерский", "диетический",
+    "безглютеновый", "цельнозерновой", "веганский", "копченый", "сладкий",
+)
+NOUNS = (
+    "хлеб", "сыр", "йогурт", "творог", "батон", "кефир", "сок", "чай",
+    "мед", "орех", "огурец", "помидор", "яблоко", "молоко", "гранола",
+)
+# fmt: on
+
+Scenario = namedtuple("Scenario", ["name", "request", "setup"])
+
+
+class CatalogueGenerator(object):
+    """
+    Fills an empty DB with a synthetic catalogue of the given size.
+    Objects are created with bulk_create, so the denormalized data
+    (final prices, ratings, search vectors) is calculated at the end.
+    """
+
+    def __init__(
+        self,
+        products,
+        promotions=None,
+        reviews=None,
+        favorites=None,
+        orders=None,
+        recipes=None,
+        seed=0,
+    ):
+        self.products = products
+        self.promotions = 20 if promotions is None else promotions
+        self.reviews = products if reviews is None else reviews
+        self.favorites = products // 2 if favorites is None else favorites
+        self.orders = products // 10 if orders is None else orders
+        self.recipes = max(products // 1000, 10) if recipes is None else recipes
+        self.users = max(products // 100, 10)
+        self.random = random.Random(seed)
+
+    def bulk_create(self, model, objects):
+        """Creates the objects (possibly a generator) in batches."""
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) == BATCH_SIZE:
+                model.objects.bulk_create(batch)
+                batch = []
+        model.objects.bulk_create(batch)
+
+    def sample_products(self, number):
+        return self.random.sample(range(1, self.products + 1), number)
+
+    def spread(self, total, owners):
+        """Yields owner ids and numbers of objects splitting total between them."""
+        per_owner, rest = divmod(min(total, owners * self.products), owners)
+        for owner_id in range(1, owners + 1):
+            yield owner_id, min(per_owner + (owner_id <= rest), self.products)
+
+    @transaction.atomic
+    def generate(self):
+        self.generate_catalogue()
+        self.generate_products()
+        self.generate_users()
+        self.generate_activity()
+        self.generate_recipes()
+        self.reset_sequences()
+        update_products_rating(Product.objects.all())
+        update_search_vectors(Product.objects.all())
+        update_recipes_nutrition(Recipe.objects.all())
+        for group in CACHED_RESPONSE_DEPENDENCIES:
+            invalidate_cached_responses(group)
+        product_search_index.clear()
+        suggestion_index.clear()
+
+    def generate_catalogue(self):
+        self.bulk_create(
+            Category,
+            (Category(id=i, name=f"Категория {i}", slug=f"c{i}") for i in range(1, 11)),
+        )
+        self.bulk_create(
+            Subcategory,
+            (
+                Subcategory(
+                    id=i,
+                    name=f"Подкатегория {i}",
+                    slug=f"s{i}",
+                    parent_category_id=i % 10 + 1,
+                )
+                for i in range(1, 51)
+            ),
+        )
+        self.producers = max(self.products // 100, 10)
+        self.bulk_create(
+            Producer,
+            (
+                Producer(id=i, name=f"Производитель {i}", slug=f"p{i}", address="-")
+                for i in range(1, self.producers + 1)
+            ),
+        )
+        self.bulk_create(
+            Component,
+            (
+                Component(id=i, name=f"{NOUNS[i % len(NOUNS)]} {i}", slug=f"k{i}")
+                for i in range(1, 201)
+            ),
+        )
+        self.bulk_create(
+            Tag, (Tag(id=i, name=f"Тег {i}", slug=f"t{i}") for i in range(1, 21))
+        )
+        self.discounts = {}
+        for i in range(1, self.promotions + 1):
+            self.discounts[i] = self.random.randint(5, 50)
+        self.bulk_create(
+            Promotion,
+            (
+                Promotion(
+                    id=i,
+                    name=f"Акция {i}",
+                    slug=f"a{i}",
+                    discount=discount,
+                    is_constant=True,
+                )
+                for i, discount in self.discounts.items()
+            ),
+        )
+
+    def generate_products(self):
+        products_promotions = {}
+
+        def products():
+            for i in range(1, self.products + 1):
+                subcategory_id = self.random.randint(1, 50)
+                price = float(self.random.randint(30, 3000))
+                discount = 0
+                if self.discounts and self.random.random() < 0.2:
+                    products_promotions[i] = self.random.choice(list(self.discounts))
+                    discount = self.discounts[products_promotions[i]]
+                yield Product(
+                    id=i,
+                    name=(
+                        f"{self.random.choice(ADJECTIVES)} "
+                        f"{self.random.choice(NOUNS)} {i}"
+                    ),
+                    description=" ".join(self.random.choices(NOUNS, k=8)),
+                    category_id=subcategory_id % 10 + 1,
+                    subcategory_id=subcategory_id,
+                    producer_id=self.random.randint(1, self.producers),
+                    price=price,
+                    final_price=apply_discount(price, discount),
+                    orders_number=self.random.randint(0, 1000),
+                )
+
+        self.bulk_create(Product, products())
+        self.bulk_create(
+            ProductPromotion,
+            (
+                ProductPromotion(product_id=product_id, promotion_id=promotion_id)
+                for product_id, promotion_id in products_promotions.items()
+            ),
+        )
+        self.bulk_create(
+            Product.components.through,
+            (
+                Product.components.through(product_id=i, component_id=component_id)
+                for i in range(1, self.products + 1)
+                for component_id in self.random.sample(range(1, 201), 3)
+            ),
+        )
+        self.bulk_create(
+            Product.tags.through,
+            (
+                Product.tags.through(product_id=i, tag_id=self.random.randint(1, 20))
+                for i in range(1, self.products + 1)
+                if self.random.random() < 0.3
+            ),
+        )
+
+    def generate_users(self):
+        password = make_password(BENCHMARK_PASSWORD)
+        self.bulk_create(
+            User,
+            (
+                User(
+                    id=i,
+                    username=f"benchmark{i}",
+                    email=f"benchmark{i}@good_food.fake",
+                    phone_number="89000000000",
+                    password=password,
+                )
+                for i in range(1, self.users + 1)
+            ),
+        )
+
+    def generate_activity(self):
+        self.bulk_create(
+            Review,
+            (
+                Review(product_id=product_id, author_id=user_id, score=score)
+                for user_id, number in self.spread(self.reviews, self.users)
+                for product_id in self.sample_products(number)
+                for score in [self.random.randint(1, 5)]
+            ),
+        )
+        self.bulk_create(
+            FavoriteProduct,
+            (
+                FavoriteProduct(product_id=product_id, user_id=user_id)
+                for user_id, number in self.spread(self.favorites, self.users)
+                for product_id in self.sample_products(number)
+            ),
+        )
+        self.bulk_create(
+            Order,
+            (
+                Order(id=i, user_id=i % self.users + 1, order_number=f"benchmark-{i}")
+                for i in range(1, self.orders + 1)
+            ),
+        )
+        self.bulk_create(
+            OrderProduct,
+            (
+                OrderProduct(order_id=i, product_id=product_id, quantity=1)
+                for i in range(1, self.orders + 1)
+                for product_id in self.sample_products(min(3, self.products))
+            ),
+        )
+
+    def generate_recipes(self):
+        self.bulk_create(
+            Recipe,
+            (
+                Recipe(
+                    id=i,
+                    author_id=i % self.users + 1,
+                    name=f"Рецепт {i}",
+                    text="-",
+                    cooking_time=30,
+                )
+                for i in range(1, self.recipes + 1)
+            ),
+        )
+        self.bulk_create(
+            ProductsInRecipe,
+            (
+                ProductsInRecipe(recipe_id=i, ingredient_id=product_id, amount=1)
+                for i in range(1, self.recipes + 1)
+                for product_id in self.sample_products(min(5, self.products))
+            ),
+        )
+
+    def reset_sequences(self):
+        """Moves the id sequences past the explicitly set ids."""
+        models = [
+            Category,
+            Subcategory,
+            Producer,
+            Component,
+            Tag,
+            Promotion,
+            Product,
+            User,
+            Order,
+            Recipe,
+        ]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+
+
+def get_scenarios(rng):
+    """Returns the benchmarked requests of the hot API endpoints."""
+    categories = list(Category.objects.values_list("slug", flat=True))
+    product_ids = list(Product.objects.values_list("pk", flat=True)[:1000])
+    pages = min(max(len(product_ids) // 10, 1), 10)
+
+    def random_cart():
+        return {
+            "products": [
+                {"id": product_id, "quantity": rng.randint(1, 3)}
+                for product_id in rng.sample(product_ids, min(2, len(product_ids)))
+            ]
+        }
+
+    def add_to_cart(client, i):
+        return client.post("/api/shopping_cart/", random_cart(), format="json")
+
+    def create_order(client, address):
+        return client.post(
+            "/api/order/",
+            {
+                "payment_method": Order.COURIER_CASH_PAYMENT,
+                "delivery_method": Order.COURIER,
+                "add_address": address,
+            },
+            format="json",
+        )
+
+    def checkout(client, i):
+        return create_order(client, f"Benchmark street {i}")
+
+    order_ids = []
+
+    def create_unpaid_order(client, i):
+        add_to_cart(client, i)
+        order_ids.append(create_order(client, f"Payment street {i}").data["id"])
+
+    def pay(client, i):
+        return client.post(f"/api/order/{order_ids.pop()}/pay/")
+
+    return [
+        Scenario(
+            "product list",
+            lambda client, i: client.get(
+                "/api/products/", {"page": rng.randint(1, pages)}
+            ),
+            None,
+        ),
+        Scenario(
+            "product filter",
+            lambda client, i: client.get(
+                "/api/products/",
+                {
+                    "category": rng.choice(categories),
+                    "min_price": rng.randint(100, 1000),
+                    "ordering": "-rating",
+                },
+            ),
+            None,
+        ),
+        Scenario(
+            "product search",
+            lambda client, i: client.get(
+                "/api/products/",
+                {"search": f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)[:3]}"},
+            ),
+            None,
+        ),
+        Scenario(
+            "category list", lambda client, i: client.get("/api/categories/"), None
+        ),
+        Scenario("cart add", add_to_cart, None),
+        Scenario("checkout", checkout, add_to_cart),
+        Scenario("pay", pay, create_unpaid_order),
+        Scenario("recipe list", lambda client, i: client.get("/api/recipes/"), None),
+    ]
+
+
+# Hot lookups by a user and a product and the indexes they should use
+# Names of the indexes used in EXPLAIN plans of SQLite and PostgreSQL
+PLAN_INDEX_PATTERN = re.compile(
+    r"(?:USING (?:COVERING )?INDEX|Index (?:Only )?Scan using|Index Scan on) (\w+)"
+)
+
+INDEX_LOOKUPS = (
+    (
+        "order list",
+        lambda user, product: Order.objects.filter(user=user),
+        "order_user_date_idx",
+    ),
+    (
+        "order user check",
+        lambda user, product: OrderProduct.objects.filter(
+            product=product, order__user=user
+        ),
+        "order_product_product_idx",
+    ),
+    (
+        "favorite flag",
+        lambda user, product: FavoriteProduct.objects.filter(
+            user=user, product=product
+        ),
+        "unique_favorite_user",
+    ),
+    (
+        "product reviews",
+        lambda user, product: Review.objects.filter(product=product),
+        "unique_product_author",
+    ),
+)
+
+
+def get_index_columns(model, index_name):
+    """Returns the columns of the model index or unique constraint."""
+    for index in [*model._meta.indexes, *model._meta.constraints]:
+        if index.name == index_name:
+            return [
+                model._meta.get_field(field_name.lstrip("-")).column
+                for field_name in index.fields
+            ]
+    return None
+
+
+def get_sqlite_index_columns(index_name):
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA index_info("{index_name}")')
+        return [column for _, _, column in sorted(cursor.fetchall())]
+
+
+def uses_expected_index(model, index_name, plan):
+    """
+    Whether the plan uses the index. SQLite creates its own indexes for
+    the unique constraints, they are compared by their columns.
+    """
+    autoindex_prefix = f"sqlite_autoindex_{model._meta.db_table}_"
+    for used_index in PLAN_INDEX_PATTERN.findall(plan):
+        if used_index == index_name:
+            return True
+        if used_index.startswith(autoindex_prefix) and get_sqlite_index_columns(
+            used_index
+        ) == get_index_columns(model, index_name):
+            return True
+    return False
+
+
+def explain_index_lookups():
+    """
+    Collects the table statistics and returns the EXPLAIN plans
+    of the hot lookups and whether they use the expected indexes.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    user = User.objects.order_by("pk").first()
+    product = Product.objects.order_by("pk").first()
+    plans = {}
+    for name, lookup, index in INDEX_LOOKUPS:
+        queryset = lookup(user, product)
+        plan = queryset.explain()
+        uses_index = uses_expected_index(queryset.model, index, plan)
+        plans[name] = {"index": index, "uses_index": uses_index, "plan": plan}
+    return plans
+
+
+def get_percentile(values, percent):
+    """Returns the percentile with linear interpolation between the values."""
+    values = sorted(values)
+    position = (len(values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def run_benchmarks(rounds=50, warmup=5, seed=0, names=None):
+    """
+    Requests every scenario rounds times through the whole Django stack
+    as an authorized user (responses for anonymous users are cached)
+    and returns latency percentiles (ms) and query counts by scenario.
+    Payments go to the fake gateway, FAKE_PAYMENT_GATEWAY_LATENCY
+    simulates the network.
+    """
+    with override_settings(PAYMENT_GATEWAY="fake"):
+        return measure_scenarios(rounds, warmup, seed, names)
+
+
+def measure_scenarios(rounds, warmup, seed, names):
+    rng = random.Random(seed)
+    user = User.objects.order_by("pk").first()
+    results = {}
+    for scenario in get_scenarios(rng):
+        if names and scenario.name not in names:
+            continue
+        client = APIClient()
+        client.force_authenticate(user=user)
+        latencies, queries, errors = [], [], 0
+
+        def record_queries(sender, stats, **kwargs):
+            queries.append(stats.count)
+
+        for i in range(warmup + rounds):
+            if scenario.setup is not None:
+                scenario.setup(client, i)
+            query_stats_recorded.connect(record_queries)
+            start = time.perf_counter()
+            response = scenario.request(client, i)
+            latency = (time.perf_counter() - start) * 1000
+            query_stats_recorded.disconnect(record_queries)
+            if i < warmup:
+                queries.clear()
+                continue
+            latencies.append(latency)
+            errors += response.status_code >= 400
+        results[scenario.name] = {
+            "rounds": rounds,
+            "errors": errors,
+            "mean_ms": round(statistics.fmean(latencies), 2),
+            "p50_ms": round(get_percentile(latencies, 50), 2),
+            "p90_ms": round(get_percentile(latencies, 90), 2),
+            "p99_ms": round(get_percentile(latencies, 99), 2),
+            "queries": round(float(statistics.median(queries)), 1),
+            "max_queries": max(queries),
+        }
+    return results
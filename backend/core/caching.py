@@ -0,0 +1,118 @@
+import hashlib
+import threading
+import time
+
+from django.apps import apps
+from django.core.signals import request_finished, request_started
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.dispatch import receiver
+
+RESPONSE_CACHE_PREFIX = "response_cache"
+
+PRODUCT_PRICE_MODELS = (
+    "products.Promotion",
+    "products.Coupon",
+    "products.ProductPromotion",
+)
+
+# Models whose changes make the cached responses of every group stale
+# (m2m_changed signals are sent by the intermediate models like Product_tags,
+# reviews make the products stale only by changing their rating)
+CACHED_RESPONSE_DEPENDENCIES = {
+    "products": {
+        "products.Product",
+        "products.Product_tags",
+        "products.Product_components",
+        "products.Category",
+        "products.Subcategory",
+        "products.Tag",
+        "products.Producer",
+        "products.Component",
+        *PRODUCT_PRICE_MODELS,
+    },
+    "categories": {
+        "products.Category",
+        "products.Subcategory",
+        "products.Product",
+        *PRODUCT_PRICE_MODELS,
+    },
+    "tags": {
+        "products.Tag",
+        "products.Product_tags",
+        "products.Category",
+        "products.Product",
+        *PRODUCT_PRICE_MODELS,
+    },
+    "producers": {"products.Producer"},
+    "components": {"products.Component"},
+    "promotions": {"products.Promotion", "products.Coupon"},
+    "recipes": {
+        "recipes.Recipe",
+        "recipes.ProductsInRecipe",
+        "products.Product",
+        *PRODUCT_PRICE_MODELS,
+    },
+}
+
+
+# Versions of the groups read by the current request, so every request reads
+# them from the DB once
+request_versions = threading.local()
+
+
+@receiver(request_started)
+def start_request_versions(**kwargs):
+    request_versions.in_request = True
+    request_versions.versions = None
+
+
+@receiver(request_finished)
+def finish_request_versions(**kwargs):
+    request_versions.in_request = False
+    request_versions.versions = None
+
+
+def get_cache_versions():
+    """Returns the manager of CacheVersion (core.models imports this module)."""
+    return apps.get_model("core", "CacheVersion").objects
+
+
+def get_cache_version(group):
+    """
+    Returns the time of the last change of the group data,
+    it's used both in cache keys and as the Last-Modified value.
+    The versions are kept in the DB, so they are shared by all the processes.
+    """
+    versions = getattr(request_versions, "versions", None)
+    if versions is None:
+        versions = dict(get_cache_versions().values_list("group", "version"))
+        if getattr(request_versions, "in_request", False):
+            request_versions.versions = versions
+    if group not in versions:
+        cache_version, _ = get_cache_versions().get_or_create(
+            group=group, defaults={"version": int(time.time())}
+        )
+        versions[group] = cache_version.version
+    return versions[group]
+
+
+def get_response_cache_key(group, version, request):
+    """Returns the cache key of the response for the request path and params."""
+    path_hash = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f"{RESPONSE_CACHE_PREFIX}:{group}:{version}:{path_hash}"
+
+
+def invalidate_cached_responses(group):
+    """Makes all the cached responses of the group stale."""
+    now = int(time.time())
+    updated = (
+        get_cache_versions()
+        .filter(group=group)
+        .update(version=Greatest(F("version") + 1, now))
+    )
+    if not updated:
+        get_cache_versions().get_or_create(group=group, defaults={"version": now})
+    versions = getattr(request_versions, "versions", None)
+    if versions is not None:
+        versions.pop(group, None)
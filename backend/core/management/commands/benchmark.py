@@ -0,0 +1,132 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core.benchmarks import CatalogueGenerator, explain_index_lookups, run_benchmarks
+from products.models import Product
+
+REPORT_COLUMNS = ("mean_ms", "p50_ms", "p90_ms", "p99_ms", "queries", "errors")
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates a synthetic catalogue in a test DB and measures latency "
+        "and SQL queries of the hot API endpoints"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=10000)
+        parser.add_argument("--promotions", type=int)
+        parser.add_argument("--reviews", type=int)
+        parser.add_argument("--favorites", type=int)
+        parser.add_argument("--orders", type=int)
+        parser.add_argument("--recipes", type=int)
+        parser.add_argument("--rounds", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--scenario", action="append", help="Benchmark only these scenarios"
+        )
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Keep the test DB with the generated catalogue for the next runs",
+        )
+        parser.add_argument(
+            "--explain",
+            action="store_true",
+            help="Check that the EXPLAIN plans of the hot lookups use their indexes",
+        )
+        parser.add_argument("--output", help="Save the results to the JSON file")
+        parser.add_argument(
+            "--compare", help="Compare the results with the saved JSON file"
+        )
+
+    def handle(self, *args, **options):
+        if options["rounds"] < 1:
+            raise CommandError("--rounds must be positive")
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as f:
+                baseline = json.load(f)["results"]
+        old_name = connection.settings_dict["NAME"]
+        setup_test_environment()
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options["keepdb"]
+        )
+        try:
+            report = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options["keepdb"]
+            )
+            teardown_test_environment()
+        self.print_report(report["results"], baseline)
+        if "plans" in report:
+            self.print_plans(report["plans"])
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+
+    def run(self, options):
+        products_number = Product.objects.count()
+        if products_number not in (0, options["products"]):
+            raise CommandError(
+                f"The kept test DB has {products_number} products, "
+                "run without --keepdb to generate a new catalogue"
+            )
+        if products_number == 0:
+            self.stdout.write(f"Generating {options['products']} products...")
+            CatalogueGenerator(
+                options["products"],
+                promotions=options["promotions"],
+                reviews=options["reviews"],
+                favorites=options["favorites"],
+                orders=options["orders"],
+                recipes=options["recipes"],
+                seed=options["seed"],
+            ).generate()
+        results = run_benchmarks(
+            rounds=options["rounds"],
+            warmup=options["warmup"],
+            seed=options["seed"],
+            names=options["scenario"],
+        )
+        report = {
+            "products": options["products"],
+            "rounds": options["rounds"],
+            "db": connection.vendor,
+            "results": results,
+        }
+        if options["explain"]:
+            report["plans"] = explain_index_lookups()
+        return report
+
+    def print_report(self, results, baseline=None):
+        self.stdout.write(
+            f"{'scenario':<16}" + "".join(f"{column:>12}" for column in REPORT_COLUMNS)
+        )
+        for name, result in results.items():
+            line = f"{name:<16}" + "".join(
+                f"{result[column]:>12}" for column in REPORT_COLUMNS
+            )
+            if baseline and name in baseline and baseline[name]["p50_ms"]:
+                change = result["p50_ms"] / baseline[name]["p50_ms"] - 1
+                line += (
+                    f"  p50 {change:+.0%}, queries "
+                    f"{result['queries'] - baseline[name]['queries']:+g}"
+                )
+            self.stdout.write(line)
+
+    def print_plans(self, plans):
+        for name, result in plans.items():
+            if result["uses_index"]:
+                self.stdout.write(f"{name}: uses {result['index']}")
+            else:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"{name}: doesn't use {result['index']}\n{result['plan']}"
+                    )
+                )
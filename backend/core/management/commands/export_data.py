@@ -1,476 +1,253 @@
 import csv
+import gzip
+import hashlib
+import io
+import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
+import django
 from django.apps import apps
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 from good_food.settings import BASE_DIR
-from products.models import Product
 
-products = Product.objects.all()
 DATA_DIR = os.path.join(BASE_DIR, "export")
-
-
-def export_products():
-    data = apps.get_model("products", "Product")
-    field_names = [
-        "id",
-        "name",
-        "description",
-        "creation_time",
-        "photo",
-        "category_id",
-        "subcategory_id",
-        "producer_id",
-        "measure_unit",
-        "amount",
-        "price",
-        "kcal",
-        "proteins",
-        "fats",
-        "carbohydrates",
-    ]
-    with open(
-        os.path.join(DATA_DIR, "products.csv"), "w", newline="", encoding="utf-8"
-    ) as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(field_names)
-        for obj in data.objects.all():
-            row = [getattr(obj, field) for field in field_names]
-            writer.writerow(row)
-
-
-def export_products_components():
-    field_names = ["id", "product_id", "component_id"]
-    with open(
-        os.path.join(DATA_DIR, "products_components.csv"),
-        "w",
-        newline="",
-        encoding="utf-8",
-    ) as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(field_names)
-        id = 0
-        for product in products:
-            components = product.components.all()
-            for component in components:
-                id += 1
-                data = [id, product.pk, component.pk]
-                writer.writerow(data)
-
-
-def export_products_tags():
-    field_names = ["id", "product_id", "tag_id"]
-    with open(
-        os.path.join(DATA_DIR, "products_tags.csv"), "w", newline="", encoding="utf-8"
-    ) as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(field_names)
-        id = 0
-        for product in products:
-            tags = product.tags.all()
-            for tag in tags:
-                id += 1
-                data = [id, product.pk, tag.pk]
-                writer.writerow(data)
-
-
-def export_categories():
-    data = apps.get_model("products", "Category")
-    field_names = [f.name for f in data._meta.fields]
-    with open(
-        os.path.join(DATA_DIR, "category.csv"), "w", newline="", encoding="utf-8"
-    ) as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(field_names)
-        for obj in data.objects.all():
-            row = [getattr(obj, field) for field in field_names]
-            writer.writerow(row)
-
-
-def export_subcategories():
-    data = apps.get_model("products", "Subcategory")
-    field_names = ["id", "name", "slug", "parent_category_id", "image"]
-    with open(
-        os.path.join(DATA_DIR, "subcategory.csv"), "w", newline="", encoding="utf-8"
-    ) as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(field_names)
-        for obj in data.objects.all():
-            row = [getattr(obj, field) for field in field_names]
-            writer.writerow(row)
-
-
-def export_components():
-    data = apps.get_model("products", "Component")
-    field_names = [f.name for f in data._meta.fields]
-    with open(
-        os.path.join(DATA_DIR, "components.csv"), "w", newline="", encoding="utf-8"
-    ) as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(field_names)
-        for obj in data.objects.all():
-            row = [getattr(obj, field) for field in field_names]
-            writer.writerow(row)
-
-
-def export_tags():
-    data = apps.get_model("products", "Tag")
-    field_names = [f.name for f in data._meta.fields]
-    with open(
-        os.path.join(DATA_DIR, "tags.csv"), "w", newline="", encoding="utf-8"
-    ) as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(field_names)
-        for obj in data.objects.all():
-            row = [getattr(obj, field) for field in field_names]
-            writer.writerow(row)
-
-
-def export_producers():
-    data = apps.get_model("products", "Producer")
-    field_names = [f.name for f in data._meta.fields]
-    with open(
-        os.path.join(DATA_DIR, "producer.csv"), "w", newline="", encoding="utf-8"
-    ) as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(field_names)
-        for obj in data.objects.all():
-            row = [getattr(obj, field) for field in field_names]
-            writer.writerow(row)
-
-
-def export_promotions():
-    data = apps.get_model("products", "Promotion")
-    field_names = [f.name for f in data._meta.fields]
-    with open(
-        os.path.join(DATA_DIR, "promotions.csv"), "w", newline="", encoding="utf-8"
-    ) as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(field_names)
-        for obj in data.objects.all():
-            row = [getattr(obj, field) for field in field_names]
-            writer.writerow(row)
-
-
-def export_products_promotions():
-    data = apps.get_model("products", "ProductPromotion")
-    field_names = ["id", "product_id", "promotion_id"]
-    with open(
-        os.path.join(DATA_DIR, "products_promotions.csv"),
-        "w",
-        newline="",
-        encoding="utf-8",
-    ) as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(field_names)
-        for obj in data.objects.all():
-            row = [getattr(obj, field) for field in field_names]
-            writer.writerow(row)
-
-
-def export_users():
-    data = apps.get_model("users", "User")
-    field_names = [f.name for f in data._meta.fields]
-    with open(
-        os.path.join(DATA_DIR, "users.csv"), "w", newline="", encoding="utf-8"
-    ) as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(field_names)
-        for obj in data.objects.all():
-            row = [getattr(obj, field) for field in field_names]
-            writer.writerow(row)
-
-
-def export_user_address():
-    data = apps.get_model("users", "Address")
-    field_names = ["id", "address", "priority_address", "user_id"]
-    with open(
-        os.path.join(DATA_DIR, "user_addresses.csv"),
-        "w",
-        newline="",
-        encoding="utf-8",
-    ) as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(field_names)
-        for obj in data.objects.all():
-            row = [getattr(obj, field) for field in field_names]
-            writer.writerow(row)
-
-
-def export_delivery_points():
-    data = apps.get_model("orders", "Delivery")
-    field_names = [f.name for f in data._meta.fields]
-    with open(
-        os.path.join(DATA_DIR, "delivery_points.csv"), "w", newline="", encoding="utf-8"
-    ) as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(field_names)
-        for obj in data.objects.all():
-            row = [getattr(obj, field) for field in field_names]
-            writer.writerow(row)
-
-
-def export_favorites():
-    data = apps.get_model("products", "FavoriteProduct")
-    field_names = ["id", "product_id", "user_id"]
-    with open(
-        os.path.join(DATA_DIR, "favorites.csv"),
-        "w",
-        newline="",
-        encoding="utf-8",
-    ) as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(field_names)
-        for obj in data.objects.all():
-            row = [getattr(obj, field) for field in field_names]
-            writer.writerow(row)
-
-
-def export_tokens():
-    data = apps.get_model("authtoken", "Token")
-    field_names = ["key", "created", "user_id"]
-    with open(
-        os.path.join(DATA_DIR, "tokens.csv"),
-        "w",
-        newline="",
-        encoding="utf-8",
-    ) as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(field_names)
-        for obj in data.objects.all():
-            row = [getattr(obj, field) for field in field_names]
-            writer.writerow(row)
-
-
-def export_reviews():
-    data = apps.get_model("reviews", "Review")
-    field_names = [
-        "id",
-        "text",
-        "score",
-        "pub_date",
-        "author_id",
-        "product_id",
-        "was_edited",
-    ]
-    with open(
-        os.path.join(DATA_DIR, "reviews.csv"),
-        "w",
-        newline="",
-        encoding="utf-8",
-    ) as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(field_names)
-        for obj in data.objects.all():
-            row = [getattr(obj, field) for field in field_names]
-            writer.writerow(row)
-
-
-def export_orders():
-    data = apps.get_model("orders", "Order")
-    field_names = [
-        "id",
-        "order_number",
-        "ordering_date",
-        "status",
-        "payment_method",
-        "is_paid",
-        "comment",
-        "delivery_method",
-        "package",
-        "address_id",
-        "delivery_point_id",
-        "user_id",
-        "add_address",
-        "total_price",
-        "user_data",
-    ]
-    with open(
-        os.path.join(DATA_DIR, "orders.csv"),
-        "w",
-        newline="",
-        encoding="utf-8",
-    ) as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(field_names)
-        for obj in data.objects.all():
-            row = [getattr(obj, field) for field in field_names]
-            writer.writerow(row)
-
-
-def export_shopping_cart():
-    data = apps.get_model("orders", "ShoppingCart")
-    field_names = ["id", "created", "product_id", "user_id"]
-    with open(
-        os.path.join(DATA_DIR, "shopping_cart.csv"),
-        "w",
-        newline="",
-        encoding="utf-8",
-    ) as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(field_names)
-        for obj in data.objects.all():
-            row = [getattr(obj, field) for field in field_names]
-            writer.writerow(row)
-
-
-def export_order_products():
-    data = apps.get_model("orders", "OrderProduct")
-    field_names = ["id", "quantity", "order_id", "product_id"]
-    with open(
-        os.path.join(DATA_DIR, "order_products.csv"),
-        "w",
-        newline="",
-        encoding="utf-8",
-    ) as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(field_names)
-        for obj in data.objects.all():
-            row = [getattr(obj, field) for field in field_names]
-            writer.writerow(row)
-
-
-def export_sessions():
-    data = apps.get_model("sessions", "Session")
-    field_names = ["_state", "session_key", "session_data", "expire_date"]
-    with open(
-        os.path.join(DATA_DIR, "sessions.csv"),
-        "w",
-        newline="",
-        encoding="utf-8",
-    ) as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(field_names)
-        for obj in data.objects.all():
-            row = [getattr(obj, field) for field in field_names]
-            writer.writerow(row)
-
-
-def export_recipes():
-    data = apps.get_model("recipes", "Recipe")
-    field_names = [
-        "id",
-        "pub_date",
-        "author_id",
-        "name",
-        "image",
-        "text",
-        "cooking_time",
-    ]
-    with open(
-        os.path.join(DATA_DIR, "recipes.csv"), "w", newline="", encoding="utf-8"
-    ) as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(field_names)
-        for obj in data.objects.all():
-            row = [getattr(obj, field) for field in field_names]
-            writer.writerow(row)
-
-
-def export_products_in_recipe():
-    data = apps.get_model("recipes", "ProductsInRecipe")
-    field_names = ["id", "recipe_id", "ingredient_id", "amount"]
-    with open(
-        os.path.join(DATA_DIR, "products_in_recipe.csv"),
-        "w",
-        newline="",
-        encoding="utf-8",
-    ) as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(field_names)
-        for obj in data.objects.all():
-            row = [getattr(obj, field) for field in field_names]
-            writer.writerow(row)
+CHUNK_SIZE = 2000
+MANIFEST_FILENAME = "manifest.json"
+COMPRESSION_EXTENSIONS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+# Exported tables: the CSV file, the model and the exported fields,
+# the files and the columns are the ones load_data reads
+# fmt: off
+EXPORT_TABLES = [
+    (
+        "products.csv", "products.Product",
+        [
+            "id", "name", "description", "creation_time", "photo", "category_id",
+            "subcategory_id", "producer_id", "measure_unit", "amount", "price",
+            "kcal", "proteins", "fats", "carbohydrates", "views_number",
+            "orders_number",
+        ],
+    ),
+    (
+        "products_components.csv", "products.Product_components",
+        ["id", "product_id", "component_id"],
+    ),
+    ("products_tags.csv", "products.Product_tags", ["id", "product_id", "tag_id"]),
+    ("category.csv", "products.Category", None),
+    (
+        "subcategory.csv", "products.Subcategory",
+        ["id", "name", "slug", "parent_category_id", "image"],
+    ),
+    ("components.csv", "products.Component", None),
+    ("tags.csv", "products.Tag", None),
+    ("producer.csv", "products.Producer", None),
+    ("promotions.csv", "products.Promotion", None),
+    (
+        "products_promotions.csv", "products.ProductPromotion",
+        ["id", "product_id", "promotion_id"],
+    ),
+    ("users.csv", "users.User", None),
+    ("delivery_points.csv", "orders.Delivery", None),
+    ("favorites.csv", "products.FavoriteProduct", ["id", "product_id", "user_id"]),
+    (
+        "user_addresses.csv", "users.Address",
+        ["id", "address", "priority_address", "user_id"],
+    ),
+    ("tokens.csv", "authtoken.Token", ["key", "created", "user_id"]),
+    (
+        "reviews.csv", "reviews.Review",
+        [
+            "id", "text", "score", "pub_date", "author_id", "product_id",
+            "was_edited",
+        ],
+    ),
+    (
+        "orders.csv", "orders.Order",
+        [
+            "id", "order_number", "ordering_date", "status", "payment_method",
+            "is_paid", "comment", "delivery_method", "package", "address_id",
+            "delivery_point_id", "user_id", "add_address", "total_price",
+            "user_data",
+        ],
+    ),
+    (
+        "shopping_cart.csv", "orders.ShoppingCart",
+        ["id", "created", "product_id", "user_id"],
+    ),
+    (
+        "order_products.csv", "orders.OrderProduct",
+        ["id", "quantity", "order_id", "product_id"],
+    ),
+    (
+        "sessions.csv", "sessions.Session",
+        ["session_key", "session_data", "expire_date"],
+    ),
+    (
+        "recipes.csv", "recipes.Recipe",
+        ["id", "pub_date", "author_id", "name", "image", "text", "cooking_time"],
+    ),
+    (
+        "products_in_recipe.csv", "recipes.ProductsInRecipe",
+        ["id", "recipe_id", "ingredient_id", "amount"],
+    ),
+]
+# fmt: on
+
+# Fields of the modification time used by --since, updated_at by default.
+# Tables without one are skipped by delta exports.
+DELTA_FIELDS = {
+    "products.Product_components": "product__updated_at",
+    "products.Product_tags": "product__updated_at",
+    "products.ProductPromotion": "product__updated_at",
+    "authtoken.Token": "created",
+    "sessions.Session": None,
+}
+
+
+def open_output(path, compression):
+    """Opens the binary file for writing with the compression."""
+    if compression == "gzip":
+        # mtime=0 keeps checksums of the same data equal between exports
+        return gzip.GzipFile(path, "wb", mtime=0)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise CommandError("zstd compression requires the zstandard package")
+        return zstandard.ZstdCompressor().stream_writer(open(path, "wb"))
+    return open(path, "wb")
+
+
+def get_file_checksum(path):
+    checksum = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+def export_table(
+    filename, model_label, field_names, output_dir, compression, since=None
+):
+    """
+    Streams the table rows (only changed since the time if it's given)
+    to the CSV file without creating model objects and returns
+    the manifest entry of the file.
+    """
+    model = apps.get_model(model_label)
+    queryset = model.objects.order_by("pk")
+    if since is not None:
+        delta_field = DELTA_FIELDS.get(model_label, "updated_at")
+        queryset = queryset.filter(**{f"{delta_field}__gte": since})
+    if field_names is None:
+        field_names = [field.attname for field in model._meta.fields]
+    path = os.path.join(output_dir, filename + COMPRESSION_EXTENSIONS[compression])
+    rows_number = 0
+    start = time.perf_counter()
+    with open_output(path, compression) as output:
+        with io.TextIOWrapper(output, encoding="utf-8", newline="") as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(field_names)
+            rows = queryset.values_list(*field_names).iterator(chunk_size=CHUNK_SIZE)
+            for row in rows:
+                writer.writerow(row)
+                rows_number += 1
+    return {
+        "file": os.path.basename(path),
+        "model": model_label,
+        "rows": rows_number,
+        "size": os.path.getsize(path),
+        "sha256": get_file_checksum(path),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def setup_worker():
+    """Sets Django up in a spawned worker, forked workers get it from the parent."""
+    django.setup()
 
 
 class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument("--output-dir", default=DATA_DIR)
+        parser.add_argument(
+            "--compress", choices=list(COMPRESSION_EXTENSIONS), default="none"
+        )
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=1,
+            help="Number of processes exporting the tables in parallel",
+        )
+        delta = parser.add_mutually_exclusive_group()
+        delta.add_argument(
+            "--since",
+            help="Export only rows changed since the ISO 8601 date and time",
+        )
+        delta.add_argument(
+            "--since-manifest",
+            help="Export only rows changed since the export of the manifest",
+        )
+
+    def get_since(self, options):
+        """Returns the watermark of the delta export or None."""
+        if options["since_manifest"]:
+            with open(options["since_manifest"], encoding="utf-8") as f:
+                value = json.load(f)["created"]
+        elif options["since"]:
+            value = options["since"]
+        else:
+            return None
+        since = parse_datetime(value)
+        if since is None:
+            raise CommandError(f"Invalid date and time: {value}")
+        if timezone.is_naive(since):
+            return timezone.make_aware(since)
+        return since
+
     def handle(self, *args, **options):
-        export_products()
-        self.stdout.write(
-            self.style.SUCCESS("Экспорт данных модели Product прошёл успешно.")
-        )
-        export_products_components()
-        self.stdout.write(
-            self.style.SUCCESS(
-                "Экспорт данных поля components модели Product прошёл успешно."
-            )
-        )
-        export_products_tags()
-        self.stdout.write(
-            self.style.SUCCESS(
-                "Экспорт данных поля tags модели Product прошёл успешно."
+        if options["jobs"] < 1:
+            raise CommandError("--jobs must be positive")
+        since = self.get_since(options)
+        # Taken before the export, so rows changed during it get to the next delta
+        created = timezone.now()
+        output_dir = options["output_dir"]
+        compression = options["compress"]
+        os.makedirs(output_dir, exist_ok=True)
+        tasks = [
+            (filename, model_label, field_names, output_dir, compression, since)
+            for filename, model_label, field_names in EXPORT_TABLES
+            if since is None or DELTA_FIELDS.get(model_label, "updated_at")
+        ]
+        if options["jobs"] == 1:
+            files = [export_table(*task) for task in tasks]
+        else:
+            # Every worker process needs its own DB connection
+            connections.close_all()
+            with ProcessPoolExecutor(
+                options["jobs"], initializer=setup_worker
+            ) as executor:
+                files = list(executor.map(export_table, *zip(*tasks)))
+        for entry in files:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Экспорт данных модели {entry['model']} прошёл успешно: "
+                    f"{entry['rows']} строк в {entry['file']}."
+                )
             )
-        )
-        export_categories()
-        self.stdout.write(
-            self.style.SUCCESS("Экспорт данных модели Category прошёл успешно.")
-        )
-        export_subcategories()
-        self.stdout.write(
-            self.style.SUCCESS("Экспорт данных модели Subcategory прошёл успешно.")
-        )
-        export_components()
-        self.stdout.write(
-            self.style.SUCCESS("Экспорт данных модели Component прошёл успешно.")
-        )
-        export_tags()
-        self.stdout.write(
-            self.style.SUCCESS("Экспорт данных модели Tag прошёл успешно.")
-        )
-        export_producers()
-        self.stdout.write(
-            self.style.SUCCESS("Экспорт данных модели Producer прошёл успешно.")
-        )
-        export_promotions()
-        self.stdout.write(
-            self.style.SUCCESS("Экспорт данных модели Promotion прошёл успешно.")
-        )
-        export_products_promotions()
-        self.stdout.write(
-            self.style.SUCCESS("Экспорт данных модели ProductPromoton прошёл успешно.")
-        )
-        export_users()
-        self.stdout.write(
-            self.style.SUCCESS("Экспорт данных модели User прошёл успешно.")
-        )
-        export_delivery_points()
-        self.stdout.write(
-            self.style.SUCCESS("Экспорт данных модели Delivery прошёл успешно.")
-        )
-        export_favorites()
-        self.stdout.write(
-            self.style.SUCCESS("Экспорт данных модели FavoriteProduct прошёл успешно.")
-        )
-        export_user_address()
-        self.stdout.write(
-            self.style.SUCCESS("Экспорт данных модели Address прошёл успешно.")
-        )
-        export_tokens()
-        self.stdout.write(
-            self.style.SUCCESS("Экспорт данных модели Token прошёл успешно.")
-        )
-        export_reviews()
-        self.stdout.write(
-            self.style.SUCCESS("Экспорт данных модели Review прошёл успешно.")
-        )
-        export_orders()
-        self.stdout.write(
-            self.style.SUCCESS("Экспорт данных модели Order прошёл успешно.")
-        )
-        export_order_products()
-        self.stdout.write(
-            self.style.SUCCESS("Экспорт данных модели OrderProduct прошёл успешно.")
-        )
-        export_sessions()
-        self.stdout.write(
-            self.style.SUCCESS("Экспорт данных модели Session прошёл успешно.")
-        )
-        export_recipes()
-        self.stdout.write(
-            self.style.SUCCESS("Экспорт даных модели Recipe прошёл успешно.")
-        )
-        export_products_in_recipe()
-        self.stdout.write(
-            self.style.SUCCESS("Экспорт даных модели ProductsInRecipe прошёл успешно.")
-        )
+        manifest = {
+            "created": created.isoformat(),
+            "since": since and since.isoformat(),
+            "compression": compression,
+            "files": files,
+        }
+        with open(
+            os.path.join(output_dir, MANIFEST_FILENAME), "w", encoding="utf-8"
+        ) as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
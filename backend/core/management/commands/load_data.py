@@ -1,390 +1,536 @@
+import gzip
+import io
 import os
+import time
+from collections import defaultdict
 from csv import DictReader
+from itertools import islice
 
 from django.contrib.sessions.models import Session
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.core.management.color import no_style
-from django.db import connection
+from django.db import connection, transaction
+from django.db.models import Q
 from django.utils import timezone
 from rest_framework.authtoken.models import Token
 
+from core.caching import CACHED_RESPONSE_DEPENDENCIES, invalidate_cached_responses
+from core.management.commands.export_data import COMPRESSION_EXTENSIONS
 from good_food.settings import BASE_DIR
-from orders.models import Delivery, Order, OrderProduct
+from orders.models import Delivery, Order, OrderProduct, sync_order_number_counter
 from products.models import (
     Category,
     Component,
     FavoriteProduct,
     Producer,
     Product,
+    ProductPromotion,
     Promotion,
     Subcategory,
     Tag,
+    update_final_prices,
+    update_search_vectors,
 )
-from recipes.models import ProductsInRecipe, Recipe
-from reviews.models import Review
+from products.search import product_search_index
+from products.suggestions import suggestion_index
+from recipes.models import ProductsInRecipe, Recipe, update_recipes_nutrition
+from reviews.models import Review, update_products_rating
 from users.models import Address, User
 
 DATA_DIR = os.path.join(BASE_DIR, "data")
+BATCH_SIZE = 2000
+
+
+def build_user(row):
+    return User(
+        id=row["id"],
+        password=row["password"],
+        last_login=None if row["last_login"] == "" else row["last_login"],
+        is_superuser=row["is_superuser"],
+        first_name=row["first_name"],
+        last_name=row["last_name"],
+        is_staff=row["is_staff"],
+        is_active=row["is_active"],
+        date_joined=row["date_joined"],
+        username=row["username"],
+        email=row["email"],
+        city=row["city"],
+        birth_date=None if row["birth_date"] == "" else row["birth_date"],
+        phone_number=row["phone_number"],
+        photo=row["photo"],
+    )
+
+
+def build_category(row):
+    return Category(
+        id=row["id"],
+        name=row["name"],
+        slug=row["slug"],
+        image=row["image"],
+    )
+
+
+def build_subcategory(row):
+    return Subcategory(
+        id=row["id"],
+        parent_category_id=row["parent_category_id"],
+        name=row["name"],
+        slug=row["slug"],
+        image=row["image"],
+    )
+
+
+def build_tag(row):
+    return Tag(id=row["id"], name=row["name"], slug=row["slug"], image=row["image"])
+
+
+def build_producer(row):
+    return Producer(
+        id=row["id"],
+        name=row["name"],
+        slug=row["slug"],
+        producer_type=row["producer_type"],
+        description=row["description"],
+        address=row["address"],
+        image=row["image"],
+    )
+
+
+def build_component(row):
+    return Component(id=row["id"], name=row["name"], slug=row["slug"])
+
+
+def build_promotion(row):
+    promotion = Promotion(
+        id=row["id"],
+        promotion_type=row["promotion_type"],
+        name=row["name"],
+        slug=row["slug"],
+        discount=row["discount"],
+        conditions=row["conditions"],
+        is_active=row["is_active"],
+        is_constant=row["is_constant"],
+        image=row["image"],
+    )
+    if row.get("start_time"):
+        promotion.start_time = row["start_time"]
+    if row.get("end_time"):
+        promotion.end_time = row["end_time"]
+    return promotion
+
+
+def build_product(row):
+    if row.get("creation_time"):
+        creation_time = row["creation_time"]
+    else:
+        creation_time = timezone.now()
+    return Product(
+        id=row["id"],
+        name=row["name"],
+        description=row["description"],
+        creation_time=creation_time,
+        category_id=row["category_id"],
+        subcategory_id=row["subcategory_id"],
+        producer_id=row["producer_id"],
+        measure_unit=row["measure_unit"],
+        amount=row["amount"],
+        price=row["price"],
+        photo=row["photo"],
+        kcal=row["kcal"],
+        proteins=row["proteins"],
+        fats=row["fats"],
+        carbohydrates=row["carbohydrates"],
+        views_number=row.get("views_number") or 0,
+        orders_number=row.get("orders_number") or 0,
+    )
+
+
+def build_product_component(row):
+    return Product.components.through(
+        product_id=row["product_id"], component_id=row["component_id"]
+    )
+
+
+def build_product_tag(row):
+    return Product.tags.through(product_id=row["product_id"], tag_id=row["tag_id"])
+
+
+def build_product_promotion(row):
+    return ProductPromotion(
+        id=row.get("id") or None,
+        product_id=row["product_id"],
+        promotion_id=row["promotion_id"],
+    )
+
+
+def build_favorite(row):
+    return FavoriteProduct(
+        id=row["id"],
+        product_id=row["product_id"],
+        user_id=row["user_id"],
+    )
+
+
+def build_delivery_point(row):
+    return Delivery(
+        id=row["id"],
+        delivery_point=row["delivery_point"],
+    )
+
+
+def build_order(row):
+    return Order(
+        id=row["id"],
+        order_number=row["order_number"],
+        ordering_date=row["ordering_date"],
+        status=row["status"],
+        payment_method=row["payment_method"],
+        is_paid=row["is_paid"],
+        comment=row["comment"],
+        delivery_method=row["delivery_method"],
+        package=row["package"],
+        address_id=row["address_id"],
+        delivery_point_id=row["delivery_point_id"],
+        user_id=row["user_id"],
+        add_address=row["add_address"],
+        total_price=row["total_price"],
+        user_data=row["user_data"],
+    )
+
+
+def build_order_product(row):
+    return OrderProduct(
+        id=row["id"],
+        quantity=row["quantity"],
+        order_id=row["order_id"],
+        product_id=row["product_id"],
+    )
+
+
+def build_user_address(row):
+    return Address(
+        id=row["id"],
+        address=row["address"],
+        priority_address=row["priority_address"],
+        user_id=row["user_id"],
+    )
+
+
+def build_token(row):
+    return Token(key=row["key"], created=row["created"], user_id=row["user_id"])
+
+
+def build_review(row):
+    return Review(
+        id=row["id"],
+        text=row["text"],
+        score=row["score"],
+        pub_date=row["pub_date"],
+        author_id=row["author_id"],
+        product_id=row["product_id"],
+        was_edited=row["was_edited"],
+    )
+
+
+def build_session(row):
+    return Session(
+        session_key=row["session_key"],
+        session_data=row["session_data"],
+        expire_date=row["expire_date"],
+    )
+
+
+def build_recipe(row):
+    if row.get("pub_date"):
+        pub_date = row["pub_date"]
+    else:
+        pub_date = timezone.now()
+    return Recipe(
+        id=row["id"],
+        pub_date=pub_date,
+        author_id=row["author_id"],
+        name=row["name"],
+        image=row["image"],
+        text=row["text"],
+        cooking_time=row["cooking_time"],
+    )
+
+
+def build_product_in_recipe(row):
+    return ProductsInRecipe(
+        id=row["id"],
+        recipe_id=row["recipe_id"],
+        ingredient_id=row["ingredient_id"],
+        amount=row["amount"],
+    )
+
+
+# CSV files in the loading order: the model, the function making an object
+# from a row and the references of the rows checked against the loaded ids
+CSV_FILES = [
+    ("users.csv", User, build_user, {}),
+    ("user_addresses.csv", Address, build_user_address, {}),
+    ("category.csv", Category, build_category, {}),
+    ("subcategory.csv", Subcategory, build_subcategory, {}),
+    ("tags.csv", Tag, build_tag, {}),
+    ("producer.csv", Producer, build_producer, {}),
+    ("components.csv", Component, build_component, {}),
+    ("promotions.csv", Promotion, build_promotion, {}),
+    ("products.csv", Product, build_product, {}),
+    (
+        "products_components.csv",
+        Product.components.through,
+        build_product_component,
+        {"product_id": Product, "component_id": Component},
+    ),
+    (
+        "products_tags.csv",
+        Product.tags.through,
+        build_product_tag,
+        {"product_id": Product, "tag_id": Tag},
+    ),
+    (
+        "products_promotions.csv",
+        ProductPromotion,
+        build_product_promotion,
+        {"product_id": Product, "promotion_id": Promotion},
+    ),
+    ("favorites.csv", FavoriteProduct, build_favorite, {}),
+    ("delivery_points.csv", Delivery, build_delivery_point, {}),
+    ("orders.csv", Order, build_order, {}),
+    ("order_products.csv", OrderProduct, build_order_product, {}),
+    ("tokens.csv", Token, build_token, {}),
+    ("reviews.csv", Review, build_review, {}),
+    ("sessions.csv", Session, build_session, {}),
+    ("recipes.csv", Recipe, build_recipe, {}),
+    ("products_in_recipe.csv", ProductsInRecipe, build_product_in_recipe, {}),
+]
+
+
+# Links exported all together with their products, loads replace the old
+# links of the loaded products (the ids of the links may differ between
+# the DBs)
+PRODUCT_LINK_MODELS = (
+    Product.components.through,
+    Product.tags.through,
+    ProductPromotion,
+)
 
-
-def read_users():
-    with open(os.path.join(DATA_DIR, "users.csv"), "r", encoding="utf-8") as f:
-        reader = DictReader(f)
-        for row in reader:
-            user = User(
-                id=row["id"],
-                password=row["password"],
-                last_login=None if row["last_login"] == "" else row["last_login"],
-                is_superuser=row["is_superuser"],
-                first_name=row["first_name"],
-                last_name=row["last_name"],
-                is_staff=row["is_staff"],
-                is_active=row["is_active"],
-                date_joined=row["date_joined"],
-                username=row["username"],
-                email=row["email"],
-                city=row["city"],
-                birth_date=None if row["birth_date"] == "" else row["birth_date"],
-                phone_number=row["phone_number"],
-                photo=row["photo"],
-            )
-            user.save()
-
-
-def read_category():
-    with open(os.path.join(DATA_DIR, "category.csv"), "r", encoding="utf-8") as f:
-        reader = DictReader(f)
-        for row in reader:
-            category = Category(
-                id=row["id"],
-                name=row["name"],
-                slug=row["slug"],
-                image=row["image"],
-            )
-            category.save()
-
-
-def read_subcategory():
-    with open(os.path.join(DATA_DIR, "subcategory.csv"), "r", encoding="utf-8") as f:
-        reader = DictReader(f)
-        for row in reader:
-            subcategory = Subcategory(
-                id=row["id"],
-                parent_category_id=row["parent_category_id"],
-                name=row["name"],
-                slug=row["slug"],
-                image=row["image"],
-            )
-            subcategory.save()
-
-
-def read_tags():
-    with open(os.path.join(DATA_DIR, "tags.csv"), "r", encoding="utf-8") as f:
-        reader = DictReader(f)
-        for row in reader:
-            tag = Tag(
-                id=row["id"], name=row["name"], slug=row["slug"], image=row["image"]
-            )
-            tag.save()
-
-
-def read_producer():
-    with open(os.path.join(DATA_DIR, "producer.csv"), "r", encoding="utf-8") as f:
-        reader = DictReader(f)
-        for row in reader:
-            producer = Producer(
-                id=row["id"],
-                name=row["name"],
-                slug=row["slug"],
-                producer_type=row["producer_type"],
-                description=row["description"],
-                address=row["address"],
-                image=row["image"],
-            )
-            producer.save()
-
-
-def read_components():
-    with open(os.path.join(DATA_DIR, "components.csv"), "r", encoding="utf-8") as f:
-        reader = DictReader(f)
-        for row in reader:
-            component = Component(id=row["id"], name=row["name"], slug=row["slug"])
-            component.save()
-
-
-def read_promotions():
-    with open(os.path.join(DATA_DIR, "promotions.csv"), "r", encoding="utf-8") as f:
-        reader = DictReader(f)
-        for row in reader:
-            promotion = Promotion(
-                id=row["id"],
-                promotion_type=row["promotion_type"],
-                name=row["name"],
-                slug=row["slug"],
-                discount=row["discount"],
-                conditions=row["conditions"],
-                is_active=row["is_active"],
-                is_constant=row["is_constant"],
-                image=row["image"],
-            )
-            if row.get("start_time"):
-                promotion.start_time = row["start_time"]
-            if row.get("end_time"):
-                promotion.start_time = row["end_time"]
-            promotion.save()
-
-
-def read_products():
-    with open(os.path.join(DATA_DIR, "products.csv"), "r", encoding="utf-8") as f:
-        reader = DictReader(f)
-        for row in reader:
-            if row.get("creation_time"):
-                creation_time = row["creation_time"]
-            else:
-                creation_time = timezone.now()
-            product = Product(
-                id=row["id"],
-                name=row["name"],
-                description=row["description"],
-                creation_time=creation_time,
-                category_id=row["category_id"],
-                subcategory_id=row["subcategory_id"],
-                producer_id=row["producer_id"],
-                measure_unit=row["measure_unit"],
-                amount=row["amount"],
-                price=row["price"],
-                photo=row["photo"],
-                kcal=row["kcal"],
-                proteins=row["proteins"],
-                fats=row["fats"],
-                carbohydrates=row["carbohydrates"],
-            )
-            product.save()
-
-
-def read_products_components():
-    with open(
-        os.path.join(DATA_DIR, "products_components.csv"), "r", encoding="utf-8"
-    ) as f:
-        reader = DictReader(f)
-        for row in reader:
-            product = Product.objects.get(id=row["product_id"])
-            component = Component.objects.get(id=row["component_id"])
-            product.components.add(component)
-
-
-def read_products_tags():
-    with open(os.path.join(DATA_DIR, "products_tags.csv"), "r", encoding="utf-8") as f:
-        reader = DictReader(f)
-        for row in reader:
-            product = Product.objects.get(id=row["product_id"])
-            tag = Tag.objects.get(id=row["tag_id"])
-            product.tags.add(tag)
-
-
-def read_products_promotions():
-    with open(
-        os.path.join(DATA_DIR, "products_promotions.csv"), "r", encoding="utf-8"
-    ) as f:
-        reader = DictReader(f)
-        for row in reader:
-            product = Product.objects.get(id=row["product_id"])
-            promotion = Promotion.objects.get(id=row["promotion_id"])
-            product.promotions.add(promotion)
-
-
-def read_favorites():
-    with open(os.path.join(DATA_DIR, "favorites.csv"), "r", encoding="utf-8") as f:
-        reader = DictReader(f)
-        for row in reader:
-            favorite_product = FavoriteProduct(
-                id=row["id"],
-                product_id=row["product_id"],
-                user_id=row["user_id"],
-            )
-            favorite_product.save()
-
-
-def read_delivery_points():
-    with open(
-        os.path.join(DATA_DIR, "delivery_points.csv"), "r", encoding="utf-8"
-    ) as f:
-        reader = DictReader(f)
-        for row in reader:
-            delivery_point = Delivery(
-                id=row["id"],
-                delivery_point=row["delivery_point"],
-            )
-            delivery_point.save()
-
-
-def read_orders():
-    with open(os.path.join(DATA_DIR, "orders.csv"), "r", encoding="utf-8") as f:
-        reader = DictReader(f)
-        for row in reader:
-            order = Order(
-                id=row["id"],
-                order_number=row["order_number"],
-                ordering_date=row["ordering_date"],
-                status=row["status"],
-                payment_method=row["payment_method"],
-                is_paid=row["is_paid"],
-                comment=row["comment"],
-                delivery_method=row["delivery_method"],
-                package=row["package"],
-                address_id=row["address_id"],
-                delivery_point_id=row["delivery_point_id"],
-                user_id=row["user_id"],
-                add_address=row["add_address"],
-                total_price=row["total_price"],
-                user_data=row["user_data"],
-            )
-            order.save()
-
-
-def read_order_products():
-    with open(os.path.join(DATA_DIR, "order_products.csv"), "r", encoding="utf-8") as f:
-        reader = DictReader(f)
-        for row in reader:
-            order_product = OrderProduct(
-                id=row["id"],
-                quantity=row["quantity"],
-                order_id=row["order_id"],
-                product_id=row["product_id"],
-            )
-            order_product.save()
-
-
-def read_user_addresses():
-    with open(os.path.join(DATA_DIR, "user_addresses.csv"), "r", encoding="utf-8") as f:
-        reader = DictReader(f)
-        for row in reader:
-            address = Address(
-                id=row["id"],
-                address=row["address"],
-                priority_address=row["priority_address"],
-                user_id=row["user_id"],
-            )
-            address.save()
-
-
-def read_tokens():
-    with open(os.path.join(DATA_DIR, "tokens.csv"), "r", encoding="utf-8") as f:
-        reader = DictReader(f)
-        for row in reader:
-            token = Token(
-                key=row["key"], created=row["created"], user_id=row["user_id"]
-            )
-            token.save()
-
-
-def read_reviews():
-    with open(os.path.join(DATA_DIR, "reviews.csv"), "r", encoding="utf-8") as f:
-        reader = DictReader(f)
-        for row in reader:
-            review = Review(
-                id=row["id"],
-                text=row["text"],
-                score=row["score"],
-                pub_date=row["pub_date"],
-                author_id=row["author_id"],
-                product_id=row["product_id"],
-                was_edited=row["was_edited"],
-            )
-            review.save()
-
-
-def read_sessions():
-    with open(os.path.join(DATA_DIR, "sessions.csv"), "r", encoding="utf-8") as f:
-        reader = DictReader(f)
-        for row in reader:
-            session = Session(
-                session_key=row["session_key"],
-                session_data=row["session_data"],
-                expire_date=row["expire_date"],
-            )
-            session.save()
-
-
-def read_recipes():
-    with open(os.path.join(DATA_DIR, "recipes.csv"), "r", encoding="utf-8") as f:
-        reader = DictReader(f)
-        for row in reader:
-            if row.get("pub_date"):
-                pub_date = row["pub_date"]
-            else:
-                pub_date = timezone.now()
-            recipe = Recipe(
-                id=row["id"],
-                pub_date=pub_date,
-                author_id=row["author_id"],
-                name=row["name"],
-                image=row["image"],
-                text=row["text"],
-                cooking_time=row["cooking_time"],
-            )
-            recipe.save()
-
-
-def read_products_in_recipes():
-    with open(
-        os.path.join(DATA_DIR, "products_in_recipe.csv"), "r", encoding="utf-8"
-    ) as f:
-        reader = DictReader(f)
-        for row in reader:
-            recipe = ProductsInRecipe(
-                id=row["id"],
-                recipe_id=row["recipe_id"],
-                ingredient_id=row["ingredient_id"],
-                amount=row["amount"],
+# Fields of the delta rows with the ids of the products and the recipes
+# which denormalized data depends on the rows
+CHANGED_OBJECT_REFERENCES = {
+    Product: (Product, "pk"),
+    Product.components.through: (Product, "product_id"),
+    Product.tags.through: (Product, "product_id"),
+    ProductPromotion: (Product, "product_id"),
+    Review: (Product, "product_id"),
+    Recipe: (Recipe, "pk"),
+    ProductsInRecipe: (Recipe, "recipe_id"),
+}
+
+
+def find_data_file(data_dir, filename):
+    """Returns the path of the plain or compressed CSV file or None."""
+    for extension in COMPRESSION_EXTENSIONS.values():
+        path = os.path.join(data_dir, filename + extension)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def open_input(path):
+    """Opens the plain or compressed CSV file for reading."""
+    if path.endswith(COMPRESSION_EXTENSIONS["gzip"]):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    if path.endswith(COMPRESSION_EXTENSIONS["zstd"]):
+        try:
+            import zstandard
+        except ImportError:
+            raise CommandError("zstd compression requires the zstandard package")
+        return io.TextIOWrapper(
+            zstandard.ZstdDecompressor().stream_reader(open(path, "rb")),
+            encoding="utf-8",
+            newline="",
+        )
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+class CSVLoader(object):
+    """
+    Streams rows of the CSV files into the DB with bulk_create in batches,
+    so no per-row queries are made and no per-row signals are sent.
+    The rows are upserted by their ids, so the same files can be loaded again
+    and delta loads update the existing data.
+    """
+
+    def __init__(self, data_dir, batch_size=BATCH_SIZE, delta=False):
+        self.data_dir = data_dir
+        self.batch_size = batch_size
+        self.delta = delta
+        self.loaded_ids = defaultdict(set)
+        self.existing_ids = {}
+        self.changed_ids = defaultdict(set)
+
+    def is_known(self, model, pk):
+        """Checks the id was loaded or, for delta loads, is already in the DB."""
+        if pk in self.loaded_ids[model]:
+            return True
+        if not self.delta:
+            return False
+        if model not in self.existing_ids:
+            self.existing_ids[model] = {
+                str(pk) for pk in model.objects.values_list("pk", flat=True)
+            }
+        return pk in self.existing_ids[model]
+
+    def read_objects(self, filename, reader, model, build, references):
+        for line_number, row in enumerate(reader, start=2):
+            for field, referenced_model in references.items():
+                if not self.is_known(referenced_model, row[field]):
+                    raise CommandError(
+                        f"{filename}, line {line_number}: "
+                        f"{referenced_model.__name__} {row[field]} not found"
+                    )
+            obj = build(row)
+            if obj.pk is not None:
+                self.loaded_ids[model].add(str(obj.pk))
+            if model in CHANGED_OBJECT_REFERENCES:
+                changed_model, field = CHANGED_OBJECT_REFERENCES[model]
+                self.changed_ids[changed_model].add(str(getattr(obj, field)))
+            if model in PRODUCT_LINK_MODELS and self.delta:
+                obj.pk = None
+            yield obj
+
+    def get_bulk_create_options(self, model, columns):
+        """Returns bulk_create options upserting the rows by their ids."""
+        if model in PRODUCT_LINK_MODELS:
+            product_ids = iter(self.loaded_ids[Product])
+            while batch := list(islice(product_ids, self.batch_size)):
+                model.objects.filter(product_id__in=batch).delete()
+            return {"ignore_conflicts": True}
+        update_fields = [
+            field.name
+            for field in model._meta.concrete_fields
+            if not field.primary_key
+            and (
+                field.name in columns
+                or field.attname in columns
+                or field.name == "updated_at"
             )
-            recipe.save()
+        ]
+        return {
+            "update_conflicts": True,
+            "unique_fields": [model._meta.pk.name],
+            "update_fields": update_fields,
+        }
+
+    def load(self, filename, model, build, references):
+        """
+        Loads the CSV file and returns the number of the loaded rows
+        or None if a delta load has no such file.
+        """
+        path = find_data_file(self.data_dir, filename)
+        if path is None:
+            if self.delta:
+                return None
+            raise CommandError(f"File {filename} not found in {self.data_dir}")
+        with open_input(path) as f:
+            reader = DictReader(f)
+            options = self.get_bulk_create_options(model, reader.fieldnames or [])
+            objects = self.read_objects(filename, reader, model, build, references)
+            rows_number = 0
+            while batch := list(islice(objects, self.batch_size)):
+                model.objects.bulk_create(batch, **options)
+                rows_number += len(batch)
+        return rows_number
+
+    def get_changed_product_ids(self):
+        """Returns ids of the products which denormalized data may be changed."""
+        product_ids = set(self.changed_ids[Product])
+        related_products = Product.objects.filter(
+            Q(promotions__in=self.loaded_ids[Promotion])
+            | Q(producer__in=self.loaded_ids[Producer])
+            | Q(components__in=self.loaded_ids[Component])
+        )
+        product_ids.update(
+            str(pk) for pk in related_products.values_list("pk", flat=True)
+        )
+        return product_ids
+
+    def get_changed_recipe_ids(self):
+        """Returns ids of the recipes which nutrition may be changed."""
+        recipe_ids = set(self.changed_ids[Recipe])
+        product_ids = iter(self.loaded_ids[Product])
+        while batch := list(islice(product_ids, self.batch_size)):
+            recipes = Recipe.objects.filter(ingredients__in=batch)
+            recipe_ids.update(str(pk) for pk in recipes.values_list("pk", flat=True))
+        return recipe_ids
+
+
+def get_querysets(model, ids, batch_size=BATCH_SIZE):
+    """Yields querysets of the objects with the ids in batches, all if ids is None."""
+    if ids is None:
+        yield model.objects.all()
+        return
+    ids = iter(ids)
+    while batch := list(islice(ids, batch_size)):
+        yield model.objects.filter(pk__in=batch)
+
+
+def update_denormalized_data(product_ids=None, recipe_ids=None):
+    """
+    Updates the data which is usually kept up to date by signals
+    of the given products and recipes or of all of them.
+    """
+    for products in get_querysets(Product, product_ids):
+        update_final_prices(products)
+        update_products_rating(products)
+        update_search_vectors(products)
+    for recipes in get_querysets(Recipe, recipe_ids):
+        update_recipes_nutrition(recipes)
+    sync_order_number_counter()
+    for group in CACHED_RESPONSE_DEPENDENCIES:
+        invalidate_cached_responses(group)
+    product_search_index.clear()
+    suggestion_index.clear()
 
 
 class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument("--data-dir", default=DATA_DIR)
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--delta",
+            action="store_true",
+            help="Upsert the files of export_data --since into the existing data",
+        )
+
+    @transaction.atomic
     def handle(self, *args, **options):
-        read_users()
-        self.stdout.write("Данные из файла users.csv загружены")
-        read_user_addresses()
-        self.stdout.write("Данные из файла user_addresses.csv загружены")
-        read_category()
-        self.stdout.write("Данные из файла category.csv загружены")
-        read_subcategory()
-        self.stdout.write("Данные из файла subcategory.csv загружены")
-        read_tags()
-        self.stdout.write("Данные из файла tags.csv загружены")
-        read_producer()
-        self.stdout.write("Данные из файла producer.csv загружены")
-        read_components()
-        self.stdout.write("Данные из файла components.csv загружены")
-        read_promotions()
-        self.stdout.write("Данные из файла promotions.csv загружены")
-        read_products()
-        self.stdout.write("Данные из файла products.csv загружены")
-        read_products_components()
-        self.stdout.write("Данные из файла products_components.csv загружены")
-        read_products_tags()
-        self.stdout.write("Данные из файла products_tags.csv загружены")
-        read_products_promotions()
-        self.stdout.write("Данные из файла products_promotions.csv загружены")
-        read_favorites()
-        self.stdout.write("Данные из файла favorites.csv загружены")
-        read_delivery_points()
-        self.stdout.write("Данные из файла delivery_points.csv загружены")
-        read_orders()
-        self.stdout.write("Данные из файла orders.csv загружены")
-        read_order_products()
-        self.stdout.write("Данные из файла order_products.csv загружены")
-        read_tokens()
-        self.stdout.write("Данные из файла tokens.csv загружены")
-        read_reviews()
-        self.stdout.write("Данные из файла reviews.csv загружены")
-        read_sessions()
-        self.stdout.write("Данные из файла sessions.csv загружены")
-        read_recipes()
-        self.stdout.write("Данные из файла recipes.csv загружены")
-        read_products_in_recipes()
-        self.stdout.write("Данные из файла products_in_recipe.csv загружены")
+        loader = CSVLoader(
+            options["data_dir"], options["batch_size"], delta=options["delta"]
+        )
+        for filename, model, build, references in CSV_FILES:
+            start = time.perf_counter()
+            rows_number = loader.load(filename, model, build, references)
+            if rows_number is None:
+                self.stdout.write(f"Файла {filename} нет в выгрузке изменений")
+                continue
+            rows_per_second = rows_number / max(time.perf_counter() - start, 1e-6)
+            self.stdout.write(
+                f"Данные из файла {filename} загружены: {rows_number} строк, "
+                f"{rows_per_second:.0f} строк/с"
+            )
+        if options["delta"]:
+            update_denormalized_data(
+                loader.get_changed_product_ids(), loader.get_changed_recipe_ids()
+            )
+        else:
+            update_denormalized_data()
+        self.stdout.write(
+            "Цены, рейтинги, поисковые индексы товаров "
+            "и пищевая ценность рецептов обновлены"
+        )
 
         model_list = [
             Delivery,
@@ -396,6 +542,7 @@ class Command(BaseCommand):
             Producer,
             Product,
             Promotion,
+            ProductPromotion,
             Subcategory,
             Tag,
             Review,
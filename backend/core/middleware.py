@@ -0,0 +1,108 @@
+import hashlib
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.dispatch import Signal
+
+from core.loggers import logger
+
+NUMBER_PATTERN = re.compile(r"\b\d+\b")
+PLACEHOLDERS_PATTERN = re.compile(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)")
+
+# Sent with the request and its QueryStats after every response
+query_stats_recorded = Signal()
+
+
+def get_fingerprint(sql):
+    """
+    Returns the hash of the SQL query with numbers and lists of parameters
+    replaced, so the same query for different objects has the same hash.
+    """
+    sql = PLACEHOLDERS_PATTERN.sub("(...)", NUMBER_PATTERN.sub("?", sql))
+    return hashlib.md5(sql.encode()).hexdigest()[:12]
+
+
+class QueryStats(object):
+    """DB execute wrapper counting SQL queries, their duplicates and DB time."""
+
+    def __init__(self):
+        self.fingerprints = Counter()
+        self.samples = {}
+        self.db_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            fingerprint = get_fingerprint(sql)
+            self.fingerprints[fingerprint] += 1
+            self.samples.setdefault(fingerprint, sql)
+
+    @property
+    def count(self):
+        return sum(self.fingerprints.values())
+
+    @property
+    def duplicates(self):
+        """Number of queries repeating an earlier query of the request."""
+        return self.count - len(self.fingerprints)
+
+    def most_duplicated(self):
+        """Returns the fingerprint and the number of the most repeated query."""
+        if not self.fingerprints:
+            return None, 0
+        return self.fingerprints.most_common(1)[0]
+
+
+class QueryStatsMiddleware(object):
+    """
+    Records SQL queries of every request, logs them via core.loggers
+    (as warnings when the request looks like an N+1 problem) and adds
+    X-DB-* response headers if QUERY_STATS_HEADERS is on.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        fingerprint, repeats = stats.most_duplicated()
+        log_fields = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "query_count": stats.count,
+            "duplicate_queries": stats.duplicates,
+            "most_duplicated_query": fingerprint,
+            "most_duplicated_repeats": repeats,
+            "db_time_ms": round(stats.db_time * 1000, 2),
+        }
+        message = "SQL queries: " + " ".join(
+            f"{key}={value}" for key, value in log_fields.items()
+        )
+        if (
+            stats.count > settings.QUERY_COUNT_WARNING_THRESHOLD
+            or repeats > settings.QUERY_REPEATS_WARNING_THRESHOLD
+        ):
+            logger.warning(
+                f"{message} query={stats.samples[fingerprint]!r}",
+                extra={"query_stats": log_fields},
+            )
+        else:
+            logger.debug(message, extra={"query_stats": log_fields})
+        if settings.QUERY_STATS_HEADERS:
+            response["X-DB-Query-Count"] = stats.count
+            response["X-DB-Duplicate-Queries"] = stats.duplicates
+            response["X-DB-Time-Ms"] = log_fields["db_time_ms"]
+        query_stats_recorded.send(sender=self.__class__, request=request, stats=stats)
+        return response
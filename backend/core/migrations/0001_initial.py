@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:46
+
+import time
+
+from django.db import migrations, models
+
+CACHED_RESPONSE_GROUPS = (
+    "products",
+    "categories",
+    "tags",
+    "producers",
+    "components",
+    "promotions",
+    "recipes",
+)
+
+
+def create_cache_versions(apps, schema_editor):
+    CacheVersion = apps.get_model("core", "CacheVersion")
+    version = int(time.time())
+    CacheVersion.objects.bulk_create(
+        [CacheVersion(group=group, version=version) for group in CACHED_RESPONSE_GROUPS]
+    )
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="CacheVersion",
+            fields=[
+                (
+                    "group",
+                    models.CharField(
+                        max_length=50,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="Group",
+                    ),
+                ),
+                ("version", models.BigIntegerField(verbose_name="Version")),
+            ],
+            options={
+                "verbose_name": "Cache version",
+                "verbose_name_plural": "Cache versions",
+            },
+        ),
+        migrations.RunPython(create_cache_versions, migrations.RunPython.noop),
+    ]
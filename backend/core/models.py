@@ -1,6 +1,10 @@
 from django.db import models
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
 from django.utils.text import slugify
 
+from core.caching import CACHED_RESPONSE_DEPENDENCIES, invalidate_cached_responses
+
 
 class CategoryModel(models.Model):
     """Abstract model for product categories and subcategories."""
@@ -29,3 +33,41 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class UpdatedModel(models.Model):
+    """Abstract model. Adds modification date used by the delta data sync."""
+
+    updated_at = models.DateTimeField("Updated", auto_now=True, db_index=True)
+
+    class Meta:
+        abstract = True
+
+
+class CacheVersion(models.Model):
+    """
+    Time of the last change of the data of a cached responses group,
+    shared by all the web and worker processes.
+    """
+
+    group = models.CharField("Group", max_length=50, primary_key=True)
+    version = models.BigIntegerField("Version")
+
+    class Meta:
+        verbose_name = "Cache version"
+        verbose_name_plural = "Cache versions"
+
+    def __str__(self):
+        return f"{self.group}: {self.version}"
+
+
+@receiver(post_save)
+@receiver(post_delete)
+@receiver(m2m_changed)
+def invalidate_cached_responses_after_change(sender, **kwargs):
+    """Invalidates cached responses which depend on the changed model."""
+    if not kwargs.get("action", "post_").startswith("post_"):
+        return
+    for group, labels in CACHED_RESPONSE_DEPENDENCIES.items():
+        if sender._meta.label in labels:
+            invalidate_cached_responses(group)
@@ -0,0 +1,15 @@
+from django.core.mail import send_mail
+
+from task_queue.queue import task
+
+
+@task
+def send_email(subject, message, recipient_list, from_email=None, html_message=None):
+    """Sends the email, SMTP errors make the task queue retry it."""
+    send_mail(
+        subject=subject,
+        message=message,
+        from_email=from_email,
+        recipient_list=recipient_list,
+        html_message=html_message,
+    )
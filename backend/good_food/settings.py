@@ -65,6 +65,7 @@ INSTALLED_APPS = [
     "orders.apps.OrdersConfig",
     "reviews.apps.ReviewsConfig",
     "payments.apps.PaymentsConfig",
+    "task_queue.apps.TaskQueueConfig",
     # Third parties apps
     "rest_framework",
     "debug_toolbar",
@@ -78,6 +79,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.QueryStatsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -94,6 +96,70 @@ ORDER_SESSION_ID = "order_id"
 
 SESSION_ENGINE = "django.contrib.sessions.backends.db"
 
+# Shopping carts are kept in the session, with a cache backend shared by all
+# the processes (e.g. "django.core.cache.backends.redis.RedisCache" and
+# "redis://redis:6379") they are kept in the cache (one key per cart item)
+SHOPPING_CART_CACHE_BACKEND = os.getenv("SHOPPING_CART_CACHE_BACKEND")
+SHOPPING_CART_STORAGE = os.getenv(
+    "SHOPPING_CART_STORAGE",
+    default=(
+        "orders.cart_storages.CacheCartStorage"
+        if SHOPPING_CART_CACHE_BACKEND
+        else "orders.cart_storages.SessionCartStorage"
+    ),
+)
+SHOPPING_CART_CACHE = "shopping_carts"
+SHOPPING_CART_TIMEOUT = int(
+    os.getenv("SHOPPING_CART_TIMEOUT", default=60 * 60 * 24 * 14)
+)
+
+# How long (in seconds) catalogue responses for anonymous users are cached,
+# they are also invalidated on every change of the data
+RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", default=60 * 5))
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    SHOPPING_CART_CACHE: {
+        "BACKEND": SHOPPING_CART_CACHE_BACKEND
+        or "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": os.getenv("SHOPPING_CART_CACHE_LOCATION", default="carts"),
+    },
+}
+
+# Number of top products shown for every category and tag
+TOP_PRODUCTS_NUMBER = int(os.getenv("TOP_PRODUCTS_NUMBER", default=3))
+
+# Default and max numbers of search-as-you-type suggestions
+SUGGESTIONS_NUMBER = int(os.getenv("SUGGESTIONS_NUMBER", default=5))
+MAX_SUGGESTIONS_NUMBER = int(os.getenv("MAX_SUGGESTIONS_NUMBER", default=20))
+# How often (in seconds) the suggestions index is fully rebuilt
+SUGGESTIONS_REBUILD_INTERVAL = int(
+    os.getenv("SUGGESTIONS_REBUILD_INTERVAL", default=60 * 5)
+)
+
+# How often (in seconds) buffered product views are saved to the DB,
+# 0 disables the background saving
+PRODUCT_VIEWS_FLUSH_INTERVAL = int(
+    os.getenv("PRODUCT_VIEWS_FLUSH_INTERVAL", default=60)
+)
+
+# Most relevant products found by the in-process search index (the DBs
+# without full-text search), the rest of the matches are dropped
+PRODUCT_SEARCH_MAX_RESULTS = int(os.getenv("PRODUCT_SEARCH_MAX_RESULTS", default=500))
+
+# Add X-DB-Query-Count, X-DB-Duplicate-Queries and X-DB-Time-Ms response headers
+QUERY_STATS_HEADERS = os.getenv("QUERY_STATS_HEADERS", default="no") == "yes"
+# Requests with more SQL queries or with a query repeated more times
+# are logged as warnings
+QUERY_COUNT_WARNING_THRESHOLD = int(
+    os.getenv("QUERY_COUNT_WARNING_THRESHOLD", default=30)
+)
+QUERY_REPEATS_WARNING_THRESHOLD = int(
+    os.getenv("QUERY_REPEATS_WARNING_THRESHOLD", default=5)
+)
+
 ROOT_URLCONF = "good_food.urls"
 
 TEMPLATES = [
@@ -218,8 +284,26 @@ DJOSER = {
         "user": "api.users_serializers.UserSerializer",
         "current_user": "api.users_serializers.UserSerializer",
     },
+    # The emails are sent by the task queue worker
+    "EMAIL": {
+        "activation": "users.emails.ActivationEmail",
+        "confirmation": "users.emails.ConfirmationEmail",
+        "password_reset": "users.emails.PasswordResetEmail",
+        "password_changed_confirmation": "users.emails.PasswordChangedConfirmationEmail",
+        "username_changed_confirmation": "users.emails.UsernameChangedConfirmationEmail",
+        "username_reset": "users.emails.UsernameResetEmail",
+    },
 }
 
+# Task queue (see the run_tasks command): retries of failed tasks,
+# the delay (in seconds) before the first retry, it doubles every retry,
+# the time (in seconds) a worker owns a task before others may take it
+# and the time (in seconds) the idle worker waits for new tasks
+TASK_QUEUE_MAX_RETRIES = int(os.getenv("TASK_QUEUE_MAX_RETRIES", default=5))
+TASK_QUEUE_RETRY_DELAY = int(os.getenv("TASK_QUEUE_RETRY_DELAY", default=30))
+TASK_QUEUE_LOCK_TIMEOUT = int(os.getenv("TASK_QUEUE_LOCK_TIMEOUT", default=60 * 5))
+TASK_QUEUE_POLL_INTERVAL = float(os.getenv("TASK_QUEUE_POLL_INTERVAL", default=1))
+
 # CORS
 # TODO: change before presentation
 CORS_ALLOW_ALL_ORIGINS = True
@@ -249,3 +333,16 @@ SECURE_HSTS_SECONDS = 3600
 STRIPE_PUBLISHABLE_KEY = os.getenv("STRIPE_PUBLISHABLE_KEY")
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
+
+# Payment gateway: "stripe" or "fake" (in-memory, for tests and benchmarks)
+PAYMENT_GATEWAY = os.getenv("PAYMENT_GATEWAY", default="stripe")
+# Timeouts (in seconds) and retries of the payment gateway requests
+PAYMENT_GATEWAY_CONNECT_TIMEOUT = int(
+    os.getenv("PAYMENT_GATEWAY_CONNECT_TIMEOUT", default=3)
+)
+PAYMENT_GATEWAY_READ_TIMEOUT = int(
+    os.getenv("PAYMENT_GATEWAY_READ_TIMEOUT", default=10)
+)
+PAYMENT_GATEWAY_MAX_RETRIES = int(os.getenv("PAYMENT_GATEWAY_MAX_RETRIES", default=2))
+# Response time (in ms) of the fake payment gateway to simulate the network
+FAKE_PAYMENT_GATEWAY_LATENCY = int(os.getenv("FAKE_PAYMENT_GATEWAY_LATENCY", default=0))
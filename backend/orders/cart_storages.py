@@ -0,0 +1,146 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+from core.loggers import logger
+
+
+class SessionCartStorage(object):
+    """Keeps the whole shopping cart in the Django session."""
+
+    def __init__(self, request):
+        self.session = request.session
+
+    def load(self):
+        """Returns all the items of the shopping cart by product id."""
+        items = self.session.get(settings.SHOPPING_CART_SESSION_ID)
+        return items if isinstance(items, dict) else {}
+
+    def save_item(self, items, product_id):
+        """Saves the item of the product (items is the whole cart)."""
+        self.session[settings.SHOPPING_CART_SESSION_ID] = items
+        self.session.modified = True
+
+    def delete_item(self, items, product_id):
+        """Deletes the item of the product (items is the whole cart)."""
+        self.save_item(items, product_id)
+
+    def clear(self):
+        """Deletes the shopping cart."""
+        self.session.pop(settings.SHOPPING_CART_SESSION_ID, None)
+        self.session.modified = True
+
+
+class CacheCartStorage(object):
+    """
+    Keeps every shopping cart item under its own cache key, so changing one
+    item doesn't rewrite the whole cart. The product ids of the cart are kept
+    in numbered slot keys and a new slot is taken by the atomic incr of the
+    cart key, so concurrent requests don't lose the items of each other.
+    A slot is kept when its item is deleted and reused when the product is
+    added again. Only the cart id is saved in the Django session.
+    """
+
+    def __init__(self, request):
+        self.session = request.session
+        self.cache = caches[settings.SHOPPING_CART_CACHE]
+        self.timeout = settings.SHOPPING_CART_TIMEOUT
+        self.cart_id = self.session.get(settings.SHOPPING_CART_SESSION_ID)
+        self.slot_product_ids = set()
+        self.keys = []
+        if isinstance(self.cart_id, dict):
+            self.migrate_session_cart(self.cart_id)
+
+    def migrate_session_cart(self, items):
+        """Moves the shopping cart saved by SessionCartStorage to the cache."""
+        self.cart_id = None
+        self.session.pop(settings.SHOPPING_CART_SESSION_ID, None)
+        self.session.modified = True
+        if not items:
+            return
+        cart_key = self.get_cart_key()
+        data = {self.get_item_key(p_id): item for p_id, item in items.items()}
+        data.update(
+            {self.get_slot_key(n): p_id for n, p_id in enumerate(items, start=1)}
+        )
+        self.cache.set_many(data, self.timeout)
+        self.cache.set(cart_key, len(items), self.timeout)
+        logger.info("The session shopping cart was moved to the cache.")
+
+    def get_cart_key(self):
+        if self.cart_id is None:
+            self.cart_id = uuid.uuid4().hex
+            self.session[settings.SHOPPING_CART_SESSION_ID] = self.cart_id
+        return f"shopping_cart:{self.cart_id}"
+
+    def get_slot_key(self, number):
+        return f"{self.get_cart_key()}:slot:{number}"
+
+    def get_item_key(self, product_id):
+        return f"{self.get_cart_key()}:{product_id}"
+
+    def load(self):
+        """Returns all the items of the shopping cart by product id."""
+        if self.cart_id is None:
+            return {}
+        cart_key = self.get_cart_key()
+        slot_keys = [
+            self.get_slot_key(n) for n in range(1, self.cache.get(cart_key, 0) + 1)
+        ]
+        slots = self.cache.get_many(slot_keys)
+        product_ids = dict.fromkeys(slots[key] for key in slot_keys if key in slots)
+        keys = {p_id: self.get_item_key(p_id) for p_id in product_ids}
+        items = self.cache.get_many(keys.values())
+        self.slot_product_ids = set(product_ids)
+        self.keys = [cart_key, *slots, *keys.values()]
+        return {p_id: items[key] for p_id, key in keys.items() if key in items}
+
+    def add_slot(self, product_id):
+        """Adds the product id to the list of the cart products."""
+        cart_key = self.get_cart_key()
+        self.cache.add(cart_key, 0, self.timeout)
+        slot_key = self.get_slot_key(self.cache.incr(cart_key))
+        self.cache.set(slot_key, product_id, self.timeout)
+        self.slot_product_ids.add(product_id)
+        self.keys += [cart_key, slot_key]
+
+    def touch(self):
+        """Prolongs all the keys of the cart together, once per request."""
+        for key in self.keys:
+            self.cache.touch(key, self.timeout)
+        self.keys = []
+
+    def save_item(self, items, product_id):
+        """Saves the item of the product (items is the whole cart)."""
+        item_key = self.get_item_key(product_id)
+        if product_id in self.slot_product_ids or not self.cache.add(
+            item_key, items[product_id], self.timeout
+        ):
+            self.cache.set(item_key, items[product_id], self.timeout)
+        else:
+            self.add_slot(product_id)
+        self.touch()
+
+    def delete_item(self, items, product_id):
+        """
+        Deletes the item of the product (items is the whole cart), its slot
+        is skipped on loading and reused when the product is added again.
+        """
+        self.cache.delete(self.get_item_key(product_id))
+        self.touch()
+
+    def clear(self):
+        """Deletes the shopping cart."""
+        if self.cart_id is None:
+            return
+        self.load()
+        self.cache.delete_many(self.keys)
+        self.slot_product_ids = set()
+        self.keys = []
+
+
+def get_cart_storage(request):
+    """Returns the shopping cart storage set in SHOPPING_CART_STORAGE."""
+    return import_string(settings.SHOPPING_CART_STORAGE)(request)
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("orders", "0008_order_coupon_applied_order_coupon_discount_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="delivery",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Updated"
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Updated"
+            ),
+        ),
+        migrations.AddField(
+            model_name="orderproduct",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Updated"
+            ),
+        ),
+        migrations.AddField(
+            model_name="shoppingcart",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Updated"
+            ),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:13
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def renumber_duplicate_orders(apps, schema_editor):
+    """Adds the id to the repeated numbers of the existing orders."""
+    Order = apps.get_model("orders", "Order")
+    duplicates = (
+        Order.objects.values("order_number")
+        .annotate(orders=Count("id"))
+        .filter(orders__gt=1)
+        .values_list("order_number", flat=True)
+    )
+    for order_number in list(duplicates):
+        orders = Order.objects.filter(order_number=order_number).order_by("id")
+        for order in orders[1:]:
+            order.order_number = f"{order_number}-{order.id}"
+            order.save(update_fields=["order_number"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("orders", "0009_delivery_updated_at_order_updated_at_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OrderNumberCounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(unique=True, verbose_name="Date")),
+                (
+                    "last_number",
+                    models.PositiveIntegerField(default=0, verbose_name="Last number"),
+                ),
+            ],
+            options={
+                "verbose_name": "Order number counter",
+                "verbose_name_plural": "Order number counters",
+            },
+        ),
+        migrations.RunPython(renumber_duplicate_orders, migrations.RunPython.noop),
+    ]
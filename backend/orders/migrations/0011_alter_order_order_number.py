@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:13
+
+from django.db import migrations, models
+
+import orders.models
+
+
+class Migration(migrations.Migration):
+    # Separate from the renumbering, PostgreSQL doesn't alter tables
+    # with pending trigger events of the changed rows
+    dependencies = [
+        ("orders", "0010_order_number_counter"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="order",
+            name="order_number",
+            field=models.CharField(
+                default=orders.models.generate_order_number,
+                max_length=50,
+                unique=True,
+                verbose_name="Number",
+            ),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0010_drop_favoriteproduct_user_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("orders", "0011_alter_order_order_number"),
+    ]
+
+    # The new indexes are created before the ones they replace are dropped
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["user", "-ordering_date"], name="order_user_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="orderproduct",
+            index=models.Index(
+                fields=["product", "order"], name="order_product_product_idx"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="order",
+            name="user",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="orders",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Покупатель",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="orderproduct",
+            name="product",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="products",
+                to="products.product",
+                verbose_name="Продукт в корзине",
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("orders", "0012_hot_lookup_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="order",
+            name="order_number",
+            field=models.CharField(
+                blank=True, max_length=50, unique=True, verbose_name="Number"
+            ),
+        ),
+    ]
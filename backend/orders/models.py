@@ -1,12 +1,15 @@
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
 
+from core.models import UpdatedModel
 from products.models import Coupon, Product
 from users.models import Address, User
 
 
 # TODO: seems this model is not used now (all shopcarts are in sessions)
-class ShoppingCart(models.Model):
+class ShoppingCart(UpdatedModel):
     """Model for creating a shopping cart."""
 
     user = models.ForeignKey(
@@ -33,7 +36,7 @@ class ShoppingCart(models.Model):
         return f"Shopping cart of {self.user}, {self.status}, {moment}"
 
 
-class Delivery(models.Model):
+class Delivery(UpdatedModel):
     """Model to store pick-up points addresses."""
 
     delivery_point = models.CharField(
@@ -50,7 +53,61 @@ class Delivery(models.Model):
         return self.delivery_point
 
 
-class Order(models.Model):
+class OrderNumberCounter(models.Model):
+    """The last order number of the day."""
+
+    date = models.DateField("Date", unique=True)
+    last_number = models.PositiveIntegerField("Last number", default=0)
+
+    class Meta:
+        verbose_name = "Order number counter"
+        verbose_name_plural = "Order number counters"
+
+    def __str__(self):
+        return f"{self.date}: {self.last_number}"
+
+
+def generate_order_number():
+    """
+    Returns the next number of the day, e.g. 2024-01-31-000042.
+    The UPDATE locks the counter row until the commit, so concurrent
+    transactions get different numbers. Called outside a transaction,
+    it doesn't keep other checkouts waiting for the order insert.
+    """
+    today = timezone.localdate()
+    counters = OrderNumberCounter.objects.filter(date=today)
+    with transaction.atomic():
+        if counters.update(last_number=F("last_number") + 1):
+            number = counters.values_list("last_number", flat=True).get()
+        else:
+            counter, created = OrderNumberCounter.objects.get_or_create(
+                date=today, defaults={"last_number": 1}
+            )
+            if not created:
+                # Another transaction has created the counter of the day
+                counters.update(last_number=F("last_number") + 1)
+                counter.refresh_from_db(fields=["last_number"])
+            number = counter.last_number
+    return f"{today}-{number:06d}"
+
+
+def sync_order_number_counter():
+    """Moves the counter of the day past the numbers of the loaded orders."""
+    today = timezone.localdate()
+    numbers = Order.objects.filter(order_number__startswith=f"{today}-").values_list(
+        "order_number", flat=True
+    )
+    suffixes = (number.rsplit("-", 1)[1] for number in numbers)
+    last_number = max(
+        (int(suffix) for suffix in suffixes if suffix.isdigit()), default=0
+    )
+    counter, _ = OrderNumberCounter.objects.get_or_create(date=today)
+    if counter.last_number < last_number:
+        counter.last_number = last_number
+        counter.save(update_fields=["last_number"])
+
+
+class Order(UpdatedModel):
     """Model for creating an order."""
 
     ORDERED = "Ordered"
@@ -86,6 +143,7 @@ class Order(models.Model):
 
     DELIVERY_METHOD = ((DELIVERY_POINT, "Пункт выдачи"), (COURIER, "Курьер"))
 
+    # Indexed by order_user_date_idx
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -93,8 +151,10 @@ class Order(models.Model):
         null=True,
         related_name="orders",
         verbose_name="Покупатель",
+        db_index=False,
     )
-    order_number = models.CharField("Number", max_length=50, default="1")
+    # Taken from the counter of the day on the first save
+    order_number = models.CharField("Number", max_length=50, unique=True, blank=True)
     ordering_date = models.DateTimeField(auto_now_add=True, verbose_name="DateTime")
     products = models.ManyToManyField(
         Product,
@@ -162,21 +222,33 @@ class Order(models.Model):
         ordering = ["-ordering_date"]
         verbose_name = "Заказ"
         verbose_name_plural = "Заказы"
+        indexes = [
+            # Order history of a user
+            models.Index(fields=["user", "-ordering_date"], name="order_user_date_idx")
+        ]
 
     def __str__(self):
         if self.user is not None:
             return f"Order {self.order_number} of {self.user.username}"
         return f"Order {self.order_number} of Anonymous User"
 
+    def save(self, *args, **kwargs):
+        """Numbers the new order, so unsaved orders don't take numbers."""
+        if self._state.adding and not self.order_number:
+            self.order_number = generate_order_number()
+        super().save(*args, **kwargs)
 
-class OrderProduct(models.Model):
+
+class OrderProduct(UpdatedModel):
     """Model for adding products in shopping cart."""
 
+    # Indexed by order_product_product_idx
     product = models.ForeignKey(
         Product,
         on_delete=models.CASCADE,
         related_name="products",
         verbose_name="Продукт в корзине",
+        db_index=False,
     )
     quantity = models.PositiveIntegerField(
         verbose_name="Количество",
@@ -202,6 +274,11 @@ class OrderProduct(models.Model):
                 name="unique_order_products",
             )
         ]
+        indexes = [
+            # Orders of a product, the check whether a user has ordered it
+            # reads the order ids from the index
+            models.Index(fields=["product", "order"], name="order_product_product_idx")
+        ]
 
     def __str__(self):
         return f"{self.product.name} - {self.order.pk}."
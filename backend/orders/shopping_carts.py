@@ -1,27 +1,42 @@
-from django.conf import settings
 from django.utils import timezone
 
 from core.loggers import logger
+from orders.cart_storages import get_cart_storage
 from products.models import Coupon, Product
 
 PRICE_DECIMAL_PLACES = 2
+SHOP_CART_PRODUCT_FIELDS = (
+    "id",
+    "name",
+    "photo",
+    "category__slug",
+    "final_price",
+    "amount",
+    "measure_unit",
+)
 
 
 class ShopCart(object):
     def __init__(self, request):
         """Initialize the shopping_cart."""
         self.session = request.session
-        self.shopping_cart = self.session.get(settings.SHOPPING_CART_SESSION_ID, {})
+        self.storage = get_cart_storage(request)
+        self.shopping_cart = self.storage.load()
         self.coupon_id = self.session.get("coupon_id")
 
-    def save(self):
-        self.session[settings.SHOPPING_CART_SESSION_ID] = self.shopping_cart
-        self.session.modified = True
+    def add_products(self, products):
+        """Add the products with their quantities, fetching them in one query."""
+        cart_products = (
+            Product.objects.select_related("category")
+            .only(*SHOP_CART_PRODUCT_FIELDS)
+            .in_bulk([product["id"] for product in products])
+        )
+        for product in products:
+            self.add(cart_products[product["id"]], product["quantity"])
 
-    def add(self, product, quantity):
+    def add(self, p, quantity):
         """Add a product to the shopping_cart."""
-        p_id = str(product["id"])
-        p = Product.objects.get(id=product["id"])
+        p_id = str(p.id)
         if p_id not in self.shopping_cart:
             self.shopping_cart[p_id] = {
                 "id": p.id,
@@ -37,13 +52,13 @@ class ShopCart(object):
         else:
             self.shopping_cart[p_id]["quantity"] = int(quantity)
 
-        self.save()
+        self.storage.save_item(self.shopping_cart, p_id)
 
     def remove(self, product_id):
         """Change a product quantity from the shopping_cart."""
         p_id = str(product_id)
         del self.shopping_cart[p_id]
-        self.save()
+        self.storage.delete_item(self.shopping_cart, p_id)
 
     def __iter__(self):
         """Iterate over the items in the cart and get the products from the database."""
@@ -112,6 +127,6 @@ class ShopCart(object):
         return round(total_price, PRICE_DECIMAL_PLACES)
 
     def clear(self):
-        """remove cart from session."""
-        del self.session[settings.SHOPPING_CART_SESSION_ID]
-        self.session.modified = True
+        """remove cart from the storage."""
+        self.shopping_cart = {}
+        self.storage.clear()
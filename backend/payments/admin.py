@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from payments.models import StripeEvent
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ("id", "event_id", "type", "received")
+    list_filter = ("type", "received")
+    search_fields = ("event_id",)
+    readonly_fields = ("event_id", "type", "payload", "received")
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import cache
+from urllib.parse import quote
+
+import stripe
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from core.loggers import logger
+
+FAKE_CHECKOUT_URL = "https://checkout.fake/pay/"
+
+CheckoutSession = namedtuple("CheckoutSession", ["id", "url", "metadata"])
+
+
+class PaymentGatewayError(Exception):
+    """The payment gateway request failed."""
+
+
+class PaymentGatewayAuthenticationError(PaymentGatewayError):
+    """The payment gateway rejected the API key."""
+
+
+class PaymentGatewayRequestError(PaymentGatewayError):
+    """The payment gateway rejected the request, e.g. the session was not found."""
+
+
+def get_idempotency_key(order, params):
+    """
+    Returns the key which makes repeated or retried requests for the same
+    order with the same parameters return the same checkout session,
+    a request with changed parameters (sum, URLs, etc.) gets a new one.
+    """
+    params_hash = hashlib.sha256(
+        json.dumps(params, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return f"checkout-session-{order.pk}-{params_hash}"
+
+
+def get_checkout_metadata(order):
+    return {"order_id": str(order.pk), "order_number": str(order.order_number)}
+
+
+def get_checkout_params(order, success_url, cancel_url, client_reference_id=None):
+    """Returns the parameters of the checkout session of the order."""
+    return {
+        "line_items": [
+            {
+                "price_data": {
+                    "currency": "rub",
+                    "product_data": {"name": str(order)},
+                    "unit_amount": int(order.total_price * 100),
+                },
+                "quantity": 1,
+            }
+        ],
+        "success_url": success_url,
+        "cancel_url": cancel_url,
+        "client_reference_id": client_reference_id,
+        "payment_method_types": ["card"],
+        "mode": "payment",
+        "metadata": get_checkout_metadata(order),
+    }
+
+
+class PaymentGateway(object):
+    """
+    Base class of payment gateway clients. The async methods run requests
+    in a worker thread, so they don't block the event loop of ASGI views.
+    """
+
+    def create_checkout_session(
+        self, order, success_url, cancel_url, client_reference_id=None
+    ):
+        raise NotImplementedError
+
+    def retrieve_checkout_session(self, session_id):
+        raise NotImplementedError
+
+    async def acreate_checkout_session(self, *args, **kwargs):
+        return await sync_to_async(
+            self.create_checkout_session, thread_sensitive=False
+        )(*args, **kwargs)
+
+    async def aretrieve_checkout_session(self, *args, **kwargs):
+        return await sync_to_async(
+            self.retrieve_checkout_session, thread_sensitive=False
+        )(*args, **kwargs)
+
+
+@contextmanager
+def convert_stripe_errors():
+    """Raises PaymentGatewayError subclasses instead of Stripe errors."""
+    try:
+        yield
+    except stripe.error.AuthenticationError as e:
+        logger.error(f"Stripe AuthenticationError: {e}.")
+        raise PaymentGatewayAuthenticationError(str(e)) from e
+    except stripe.error.InvalidRequestError as e:
+        logger.error(f"Stripe InvalidRequestError: {e}.")
+        raise PaymentGatewayRequestError(str(e)) from e
+    except stripe.error.StripeError as e:
+        logger.error(f"Stripe {type(e).__name__}: {e}.")
+        raise PaymentGatewayError(str(e)) from e
+
+
+class StripeHTTPClient(stripe.http_client.RequestsClient):
+    """Stripe requests client with its own number of network retries."""
+
+    def __init__(self, max_retries, **kwargs):
+        super().__init__(**kwargs)
+        self.max_retries = max_retries
+
+    def _max_network_retries(self):
+        # Stripe SDK 7 reads the retries number from the module by default
+        return self.max_retries
+
+
+class StripeGateway(PaymentGateway):
+    """
+    Stripe Checkout client. Requests have connect and read timeouts and are
+    retried on network errors with idempotency keys, the HTTP client keeps
+    a requests session (a pool of open connections) per thread.
+    The client and the API key belong to the gateway, so the settings
+    of the stripe module are not changed.
+    """
+
+    def __init__(self, api_key, connect_timeout, read_timeout, max_retries):
+        self.api_key = api_key
+        self.http_client = StripeHTTPClient(
+            max_retries, timeout=(connect_timeout, read_timeout)
+        )
+
+    def request(self, method, url, params=None, idempotency_key=None):
+        """Makes the Stripe API request and returns the Stripe object."""
+        requestor = stripe.APIRequestor(key=self.api_key, client=self.http_client)
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+        with convert_stripe_errors():
+            response, api_key = requestor.request(method, url, params, headers)
+        return stripe.convert_to_stripe_object(response, api_key)
+
+    def create_checkout_session(
+        self, order, success_url, cancel_url, client_reference_id=None
+    ):
+        params = get_checkout_params(
+            order, success_url, cancel_url, client_reference_id
+        )
+        session = self.request(
+            "post",
+            stripe.checkout.Session.class_url(),
+            params,
+            idempotency_key=get_idempotency_key(order, params),
+        )
+        logger.info("Stripe Checkout Session created successfully.")
+        return CheckoutSession(session.id, session.url, dict(session.metadata))
+
+    def retrieve_checkout_session(self, session_id):
+        session = self.request(
+            "get", f"{stripe.checkout.Session.class_url()}/{quote(session_id)}"
+        )
+        return CheckoutSession(session.id, session.url, dict(session.metadata))
+
+
+class FakeGateway(PaymentGateway):
+    """
+    In-memory payment gateway for tests and benchmarks, it makes no network
+    requests and answers after the given latency (seconds).
+    """
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.sessions_by_key = {}
+
+    def create_checkout_session(
+        self, order, success_url, cancel_url, client_reference_id=None
+    ):
+        time.sleep(self.latency)
+        key = get_idempotency_key(
+            order,
+            get_checkout_params(order, success_url, cancel_url, client_reference_id),
+        )
+        with self.lock:
+            if key not in self.sessions_by_key:
+                session_id = f"cs_fake_{uuid.uuid4().hex}"
+                session = CheckoutSession(
+                    session_id,
+                    FAKE_CHECKOUT_URL + session_id,
+                    get_checkout_metadata(order),
+                )
+                self.sessions[session_id] = session
+                self.sessions_by_key[key] = session
+            return self.sessions_by_key[key]
+
+    def retrieve_checkout_session(self, session_id):
+        time.sleep(self.latency)
+        with self.lock:
+            if session_id not in self.sessions:
+                raise PaymentGatewayRequestError(
+                    f"No such checkout.session: '{session_id}'"
+                )
+            return self.sessions[session_id]
+
+
+@cache
+def get_payment_gateway():
+    """Returns the gateway of the PAYMENT_GATEWAY setting, it's created once."""
+    if settings.PAYMENT_GATEWAY == "fake":
+        return FakeGateway(latency=settings.FAKE_PAYMENT_GATEWAY_LATENCY / 1000)
+    return StripeGateway(
+        settings.STRIPE_SECRET_KEY,
+        connect_timeout=settings.PAYMENT_GATEWAY_CONNECT_TIMEOUT,
+        read_timeout=settings.PAYMENT_GATEWAY_READ_TIMEOUT,
+        max_retries=settings.PAYMENT_GATEWAY_MAX_RETRIES,
+    )
+
+
+@receiver(setting_changed)
+def reset_payment_gateway(setting, **kwargs):
+    if setting.startswith(("PAYMENT_GATEWAY", "FAKE_PAYMENT_GATEWAY", "STRIPE_")):
+        get_payment_gateway.cache_clear()
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from orders.models import Order
+from payments.models import StripeEvent
+from payments.webhooks import process_event
+
+
+class Command(BaseCommand):
+    help = (
+        "Handles the recorded Stripe webhook events again, "
+        "e.g. after a handler fix, handling is idempotent"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("event_ids", nargs="*", help="Ids of the events")
+        parser.add_argument(
+            "--since", help="Replay the events received since the ISO 8601 time"
+        )
+        parser.add_argument("--type", help="Replay only the events of the type")
+
+    def get_events(self, options):
+        events = StripeEvent.objects.all()
+        if options["event_ids"]:
+            events = events.filter(event_id__in=options["event_ids"])
+            missing_ids = set(options["event_ids"]) - set(
+                events.values_list("event_id", flat=True)
+            )
+            if missing_ids:
+                raise CommandError(f"Unknown events: {', '.join(sorted(missing_ids))}")
+        if options["since"]:
+            since = parse_datetime(options["since"])
+            if since is None:
+                raise CommandError(f"Invalid date and time: {options['since']}")
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+            events = events.filter(received__gte=since)
+        if options["type"]:
+            return events.filter(type=options["type"])
+        return events
+
+    def handle(self, *args, **options):
+        if not any(options[name] for name in ("event_ids", "since", "type")):
+            raise CommandError("Give event ids, --since or --type")
+        number = 0
+        for event in self.get_events(options).iterator():
+            try:
+                process_event(event.payload, replay=True)
+            except Order.DoesNotExist as e:
+                self.stderr.write(f"{event}: {e}")
+                continue
+            number += 1
+        self.stdout.write(self.style.SUCCESS(f"{number} events were replayed."))
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="StripeEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "event_id",
+                    models.CharField(
+                        max_length=255, unique=True, verbose_name="Event id"
+                    ),
+                ),
+                ("type", models.CharField(max_length=100, verbose_name="Type")),
+                ("payload", models.JSONField(verbose_name="Payload")),
+                (
+                    "received",
+                    models.DateTimeField(
+                        auto_now_add=True, db_index=True, verbose_name="Received"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Stripe event",
+                "verbose_name_plural": "Stripe events",
+                "ordering": ["received"],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+from django.db import models
+
+
+class StripeEvent(models.Model):
+    """Received Stripe webhook event, the ledger makes processing idempotent."""
+
+    event_id = models.CharField("Event id", max_length=255, unique=True)
+    type = models.CharField("Type", max_length=100)
+    payload = models.JSONField("Payload")
+    received = models.DateTimeField("Received", auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ["received"]
+        verbose_name = "Stripe event"
+        verbose_name_plural = "Stripe events"
+
+    def __str__(self):
+        return f"{self.type} {self.event_id}"
@@ -1,7 +1,7 @@
 import stripe
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.sites.shortcuts import get_current_site
-from django.core.mail import send_mail
 from django.http.response import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.csrf import csrf_exempt
@@ -14,6 +14,8 @@ from api.orders_views import (
 )
 from core.loggers import logger
 from orders.models import Order
+from payments.gateways import PaymentGatewayError, get_payment_gateway
+from payments.webhooks import process_event
 
 
 class OrderPayView(TemplateView):
@@ -49,49 +51,50 @@ def stripe_config(request):
     return None
 
 
-@csrf_exempt
-def create_checkout_session(request, order_id):
-    """Get an order and pay."""
-    order = get_object_or_404(Order, pk=order_id)
+def get_checkout_request_data(request, order_id):
+    """Returns the order, the site URL and the client reference of the request."""
+    order = get_object_or_404(Order.objects.select_related("user"), pk=order_id)
+    domain_url = f"http://{get_current_site(request)}/"
+    client_reference_id = (
+        request.user.username if request.user.is_authenticated else None
+    )
+    return order, domain_url, client_reference_id
+
+
+async def create_checkout_session(request, order_id):
+    """
+    Get an order and pay. The view is async, so under ASGI waiting for
+    the payment gateway doesn't take a worker.
+    """
+    order, domain_url, client_reference_id = await sync_to_async(
+        get_checkout_request_data
+    )(request, order_id)
     if request.method == "POST":
-        domain_url = f"http://{get_current_site(request)}/"
-        stripe.api_key = settings.STRIPE_SECRET_KEY
         try:
-            checkout_session = stripe.checkout.Session.create(
-                line_items=[
-                    {
-                        "price_data": {
-                            "currency": "rub",
-                            "product_data": {
-                                "name": order,
-                            },
-                            "unit_amount": int(order.total_price * 100),
-                        },
-                        "quantity": 1,
-                    }
-                ],
+            checkout_session = await get_payment_gateway().acreate_checkout_session(
+                order,
                 success_url=domain_url + "success",
                 cancel_url=domain_url + "cancel",
-                client_reference_id=request.user.username
-                if request.user.is_authenticated
-                else None,
-                payment_method_types=["card"],
-                mode="payment",
-                metadata={"order_id": order.id},
+                client_reference_id=client_reference_id,
             )
             return redirect(checkout_session.url)
-        except Exception as e:
+        except PaymentGatewayError as e:
             return JsonResponse(
                 {"message": STRIPE_SESSION_CREATE_ERROR_MESSAGE, "errors": str(e)}
             )
     return None
 
 
+# csrf_exempt of Django 4.2 wraps async views into sync functions
+create_checkout_session.csrf_exempt = True
+
+
 @csrf_exempt
 def stripe_webhook(request):
     """
     Stripe webhook view to handle checkout session completed event
-    (payment verification).
+    (payment verification). Repeated deliveries of an event are only
+    acknowledged, see payments.webhooks.
     """
     logger.info("Start to handle checkout session completed event using webhook.")
     endpoint_secret = settings.STRIPE_WEBHOOK_SECRET
@@ -109,21 +112,11 @@ def stripe_webhook(request):
         # Invalid signature
         logger.error(f"Webhook SignatureVerificationError: {e}.")
         return HttpResponse(status=400)  # TODO: shows success page in this case, fix it
-    if event["type"] == "checkout.session.completed":
-        logger.info("Payment was successful.")
-        order_id = event["data"]["object"]["metadata"]["order_id"]
-        order = get_object_or_404(Order, pk=order_id)
-        order.is_paid = True
-        order.save()
-        customer_email = event["data"]["object"]["customer_email"]
-        # TODO: Emails don't come
-        send_mail(
-            subject="Заказ оплачен",
-            message=f"Ваш заказ №{order_id} успешно оплачен.",
-            recipient_list=[customer_email],
-            from_email=None,
-            # from_email=settings.EMAIL_HOST_USER,
-        )
+    try:
+        process_event(event)
+    except Order.DoesNotExist as e:
+        logger.error(f"Webhook {e}")
+        return HttpResponse(status=404)
     return HttpResponse(
         status=200,
     )
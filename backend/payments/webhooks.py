@@ -0,0 +1,65 @@
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from core.loggers import logger
+from core.tasks import send_email
+from orders.models import Order
+from payments.models import StripeEvent
+
+
+def handle_checkout_session_completed(session):
+    """Marks the order paid and queues the email if it wasn't paid yet."""
+    order_id = session["metadata"]["order_id"]
+    # The conditional update lets only one of concurrent deliveries pay
+    paid = Order.objects.filter(pk=order_id, is_paid=False).update(
+        is_paid=True, updated_at=timezone.now()
+    )
+    if not paid:
+        if not Order.objects.filter(pk=order_id).exists():
+            raise Order.DoesNotExist(f"Order {order_id} does not exist.")
+        logger.info(f"The order {order_id} is already paid.")
+        return
+    logger.info("Payment was successful.")
+    customer_email = session.get("customer_email") or (
+        session.get("customer_details") or {}
+    ).get("email")
+    if customer_email:
+        send_email.delay(
+            subject="Заказ оплачен",
+            message=f"Ваш заказ №{order_id} успешно оплачен.",
+            recipient_list=[customer_email],
+        )
+
+
+# Handlers of the event data objects by event type
+EVENT_HANDLERS = {
+    "checkout.session.completed": handle_checkout_session_completed,
+}
+
+
+def record_event(event):
+    """Saves the event to the ledger, returns False if it's already there."""
+    try:
+        with transaction.atomic():
+            StripeEvent.objects.create(
+                event_id=event["id"], type=event["type"], payload=event
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+def process_event(event, replay=False):
+    """
+    Records and handles the event in one transaction, so a failed event
+    isn't recorded and is handled again on the Stripe retry. Returns False
+    for the already processed events, replayed ones are handled again.
+    """
+    with transaction.atomic():
+        if not record_event(event) and not replay:
+            logger.info(f"Stripe event {event['id']} is already processed.")
+            return False
+        handler = EVENT_HANDLERS.get(event["type"])
+        if handler is not None:
+            handler(event["data"]["object"])
+    return True
@@ -1,5 +1,4 @@
 from django.contrib import admin
-from django.db.models import Avg
 
 from .models import (
     Category,
@@ -247,21 +246,11 @@ class ProductAdmin(admin.ModelAdmin):
         """Shows the number of promotions for this product."""
         return obj.promotions.count()
 
-    @admin.display(description="Rating")
-    def rating(self, obj):
-        """Shows the product rating."""
-        product_reviews = obj.reviews.all()
-        if product_reviews:
-            return round(product_reviews.aggregate(Avg("score"))["score__avg"], 1)
-        return "-empty-"
-
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
-        return (
-            queryset.select_related("category", "subcategory", "producer")
-            .prefetch_related("components", "tags", "promotions", "reviews")
-            .annotate(rating=Avg("reviews__score"))
-        )
+        return queryset.select_related(
+            "category", "subcategory", "producer"
+        ).prefetch_related("components", "tags", "promotions")
 
 
 @admin.register(ProductPromotion)
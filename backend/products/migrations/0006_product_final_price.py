@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:59
+
+from django.db import migrations, models
+from django.db.models import Max, Q
+
+PRICE_DECIMAL_PLACES = 2
+
+
+def fill_final_price(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    products = list(
+        Product.objects.annotate(
+            max_discount=Max(
+                "promotions__discount", filter=Q(promotions__is_active=True)
+            )
+        ).only("id", "price")
+    )
+    for product in products:
+        discount = product.max_discount
+        product.final_price = (
+            round(product.price * (1 - discount / 100), PRICE_DECIMAL_PLACES)
+            if discount
+            else product.price
+        )
+    Product.objects.bulk_update(products, ["final_price"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0005_coupon_alter_promotion_promotion_type"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="final_price",
+            field=models.FloatField(
+                db_index=True,
+                default=0,
+                editable=False,
+                help_text="Price per one product unit including the promotion discount",
+                verbose_name="Final price",
+            ),
+        ),
+        migrations.RunPython(fill_final_price, migrations.RunPython.noop),
+    ]
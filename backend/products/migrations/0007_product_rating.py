@@ -0,0 +1,69 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:21
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+RATING_DECIMAL_PLACES = 1
+
+
+def fill_rating(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    products = list(
+        Product.objects.annotate(
+            reviews_score_sum=Sum("reviews__score"),
+            reviews_count=Count("reviews"),
+        )
+        .filter(reviews_count__gt=0)
+        .only("id")
+    )
+    for product in products:
+        product.rating_sum = product.reviews_score_sum
+        product.rating_count = product.reviews_count
+        product.rating = round(
+            product.rating_sum / product.rating_count, RATING_DECIMAL_PLACES
+        )
+    Product.objects.bulk_update(
+        products, ["rating_sum", "rating_count", "rating"], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0006_product_final_price"),
+        ("reviews", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="rating",
+            field=models.FloatField(
+                db_index=True,
+                editable=False,
+                help_text="Average score of the product reviews",
+                null=True,
+                verbose_name="Rating",
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Number of the product reviews",
+                verbose_name="Rating count",
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_sum",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Sum of the scores of all the product reviews",
+                verbose_name="Rating sum",
+            ),
+        ),
+        migrations.RunPython(fill_rating, migrations.RunPython.noop),
+    ]
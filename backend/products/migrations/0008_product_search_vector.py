@@ -0,0 +1,67 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:28
+
+import django.contrib.postgres.search
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+SEARCH_CONFIG = "russian"
+
+
+def create_search_indexes(apps, schema_editor):
+    """Creates full-text and trigram indexes and fills search vectors."""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS products_product_search_vector_idx "
+        "ON products_product USING gin (search_vector)"
+    )
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS products_product_name_trgm_idx "
+        "ON products_product USING gin (UPPER(name::text) gin_trgm_ops)"
+    )
+    Product = apps.get_model("products", "Product")
+    Producer = apps.get_model("products", "Producer")
+    Component = apps.get_model("products", "Component")
+    producer_name = Producer.objects.filter(pk=OuterRef("producer_id")).values("name")
+    components_names = (
+        Component.objects.filter(products=OuterRef("pk"))
+        .values("products")
+        .annotate(names=StringAgg("name", " "))
+        .values("names")
+    )
+    Product.objects.update(
+        search_vector=SearchVector("name", weight="A", config=SEARCH_CONFIG)
+        + SearchVector(Subquery(producer_name), weight="B", config=SEARCH_CONFIG)
+        + SearchVector(Subquery(components_names), weight="B", config=SEARCH_CONFIG)
+        + SearchVector("description", weight="C", config=SEARCH_CONFIG)
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS products_product_search_vector_idx")
+    schema_editor.execute("DROP INDEX IF EXISTS products_product_name_trgm_idx")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0007_product_rating"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False,
+                help_text="Name, producer, components and description for full-text search",
+                null=True,
+                verbose_name="Search vector",
+            ),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0008_product_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Updated"
+            ),
+        ),
+        migrations.AddField(
+            model_name="component",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Updated"
+            ),
+        ),
+        migrations.AddField(
+            model_name="favoriteproduct",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Updated"
+            ),
+        ),
+        migrations.AddField(
+            model_name="producer",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Updated"
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Updated"
+            ),
+        ),
+        migrations.AddField(
+            model_name="productpromotion",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Updated"
+            ),
+        ),
+        migrations.AddField(
+            model_name="promotion",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Updated"
+            ),
+        ),
+        migrations.AddField(
+            model_name="subcategory",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Updated"
+            ),
+        ),
+        migrations.AddField(
+            model_name="tag",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Updated"
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("products", "0009_category_updated_at_component_updated_at_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="favoriteproduct",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="favorites",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="User",
+            ),
+        ),
+    ]
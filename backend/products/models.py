@@ -1,19 +1,33 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connections, models
+from django.db.models import Max, OuterRef, Q, Subquery
 from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.text import slugify
 
-from core.models import CategoryModel
+from core.models import CategoryModel, UpdatedModel
 from users.models import User
 
 MAX_PROMOTIONS_NUMBER = 1
+PRICE_DECIMAL_PLACES = 2
+RATING_DECIMAL_PLACES = 1
+SEARCH_CONFIG = "russian"
 COUPON_PROMOTION_TYPE_ERROR_MESSAGE = (
     'Указан неверный тип промоакции, нужно выбрать "Промокод"'
 )
 
 
-class Category(CategoryModel):
+def apply_discount(price, discount):
+    """Returns the price reduced by the discount percentage."""
+    if not discount:
+        return price
+    return round(price * (1 - discount / 100), PRICE_DECIMAL_PLACES)
+
+
+class Category(CategoryModel, UpdatedModel):
     """Describes product categories."""
 
     def category_directory_path(self, filename):
@@ -28,7 +42,7 @@ class Category(CategoryModel):
         ordering = ["id"]
 
 
-class Subcategory(CategoryModel):
+class Subcategory(CategoryModel, UpdatedModel):
     """Describes product subcategories."""
 
     def subcategory_directory_path(self, filename):
@@ -49,7 +63,7 @@ class Subcategory(CategoryModel):
         ordering = ["id"]
 
 
-class Component(models.Model):
+class Component(UpdatedModel):
     """Describes what the product consists of."""
 
     name = models.CharField(
@@ -74,7 +88,7 @@ class Component(models.Model):
         return self.name
 
 
-class Tag(models.Model):
+class Tag(UpdatedModel):
     """Describes product tags."""
 
     def tag_directory_path(self, filename):
@@ -102,7 +116,7 @@ class Tag(models.Model):
         super().save(*args, **kwargs)
 
 
-class Producer(models.Model):
+class Producer(UpdatedModel):
     """Describes product producers."""
 
     COMPANY = "company"
@@ -149,7 +163,7 @@ class Producer(models.Model):
         return self.name
 
 
-class Promotion(models.Model):
+class Promotion(UpdatedModel):
     """Describes promotions applied to products."""
 
     SIMPLE = "simple"
@@ -241,7 +255,7 @@ class Coupon(Promotion):
         return self.code
 
 
-class Product(models.Model):
+class Product(UpdatedModel):
     """Describes products."""
 
     GRAMS = "grams"
@@ -310,6 +324,13 @@ class Product(models.Model):
         validators=[MinValueValidator(0)],
         help_text="Price per one product unit",
     )
+    final_price = models.FloatField(
+        "Final price",
+        default=0,
+        editable=False,
+        db_index=True,
+        help_text="Price per one product unit including the promotion discount",
+    )
     promotions = models.ManyToManyField(
         Promotion,
         through="ProductPromotion",
@@ -350,21 +371,58 @@ class Product(models.Model):
     orders_number = models.PositiveIntegerField(
         "Orders number", default=0, help_text="Number of orders for this product"
     )
+    rating_sum = models.PositiveIntegerField(
+        "Rating sum",
+        default=0,
+        editable=False,
+        help_text="Sum of the scores of all the product reviews",
+    )
+    rating_count = models.PositiveIntegerField(
+        "Rating count",
+        default=0,
+        editable=False,
+        help_text="Number of the product reviews",
+    )
+    rating = models.FloatField(
+        "Rating",
+        null=True,
+        editable=False,
+        db_index=True,
+        help_text="Average score of the product reviews",
+    )
+    # GIN index for this field is created by a migration on PostgreSQL only
+    search_vector = SearchVectorField(
+        "Search vector",
+        null=True,
+        editable=False,
+        help_text="Name, producer, components and description for full-text search",
+    )
 
     class Meta:
         verbose_name = "Product"
         verbose_name_plural = "Products"
         ordering = ["id"]
 
-    @property
-    def final_price(self):
+    def save(self, *args, **kwargs):
+        """Updates the final price if the product price could have changed."""
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "price" in update_fields:
+            self.final_price = self.calculate_final_price()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "final_price"}
+        super().save(*args, **kwargs)
+
+    def calculate_final_price(self):
         """
-        Calculates the product price, including the max discount from its promotions.
+        Calculates the product price, including the max discount from its active
+        promotions.
         """
-        if not self.promotions.all():
+        if self.pk is None:
             return self.price
-        discount = self.promotions.all()[0].discount
-        return round(self.price * (1 - discount / 100), 2) if discount else self.price
+        discount = self.promotions.filter(is_active=True).aggregate(
+            max_discount=Max("discount")
+        )["max_discount"]
+        return apply_discount(self.price, discount)
 
     def is_favorited(self, user):
         """Checks whether the product is in the user's favorites."""
@@ -382,11 +440,16 @@ class Product(models.Model):
     # TODO: add expiration_date field and quantity fields (in future if necessary)
 
 
-class FavoriteProduct(models.Model):
+class FavoriteProduct(UpdatedModel):
     """Describes favorite products."""
 
+    # Indexed by unique_favorite_user
     user = models.ForeignKey(
-        User, on_delete=models.CASCADE, related_name="favorites", verbose_name="User"
+        User,
+        on_delete=models.CASCADE,
+        related_name="favorites",
+        verbose_name="User",
+        db_index=False,
     )
     product = models.ForeignKey(
         Product,
@@ -409,7 +472,7 @@ class FavoriteProduct(models.Model):
         return f"{self.user} added {self.product} to favorites"
 
 
-class ProductPromotion(models.Model):
+class ProductPromotion(UpdatedModel):
     """Describes connections between products and promotions."""
 
     MAX_PROMOTIONS_ERROR_MESSAGE = (
@@ -446,3 +509,144 @@ def check_promotion_quantity_after_product_promotion_save(sender, instance, **kw
     """Checks promotion quantity of a product after product_promotion save."""
     if instance.product.promotions.count() > MAX_PROMOTIONS_NUMBER:
         raise ValidationError(ProductPromotion.MAX_PROMOTIONS_ERROR_MESSAGE)
+
+
+def update_final_prices(products):
+    """Recalculates the stored final price of the given products in bulk."""
+    products = products.annotate(
+        max_discount=Max("promotions__discount", filter=Q(promotions__is_active=True))
+    ).only("id", "price", "final_price")
+    changed_products = []
+    now = timezone.now()
+    for product in products:
+        final_price = apply_discount(product.price, product.max_discount)
+        if product.final_price != final_price:
+            product.final_price = final_price
+            product.updated_at = now
+            changed_products.append(product)
+    Product.objects.bulk_update(changed_products, ["final_price", "updated_at"])
+
+
+@receiver(models.signals.post_save, sender=Promotion)
+@receiver(models.signals.post_save, sender=Coupon)
+def update_final_prices_after_promotion_save(sender, instance, **kwargs):
+    """Updates final prices of the promotion products after promotion save."""
+    update_final_prices(Product.objects.filter(promotions=instance.pk))
+
+
+@receiver(models.signals.post_save, sender=ProductPromotion)
+@receiver(models.signals.post_delete, sender=ProductPromotion)
+def update_final_price_after_product_promotion_change(sender, instance, **kwargs):
+    """
+    Updates the product final price and modification time (the promotion
+    links are exported with the product) after product_promotion save or delete.
+    """
+    products = Product.objects.filter(pk=instance.product_id)
+    products.update(updated_at=timezone.now())
+    update_final_prices(products)
+
+
+@receiver(models.signals.m2m_changed, sender=ProductPromotion)
+def update_final_prices_after_promotions_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """
+    Updates final prices after promotions of products were changed
+    using related managers (e.g. product.promotions.set()).
+    """
+    if action == "pre_clear" and reverse:
+        instance._cleared_product_ids = list(
+            instance.products.values_list("pk", flat=True)
+        )
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        update_final_prices(Product.objects.filter(pk=instance.pk))
+        instance.refresh_from_db(fields=["final_price"])
+        return
+    if action == "post_clear":
+        product_ids = instance.__dict__.pop("_cleared_product_ids", [])
+    else:
+        product_ids = pk_set
+    update_final_prices(Product.objects.filter(pk__in=product_ids))
+
+
+def update_search_vectors(products):
+    """
+    Recalculates the full-text search vectors of the given products
+    (PostgreSQL only, other DBs use products.search.ProductSearchIndex).
+    """
+    if connections[products.db].vendor != "postgresql":
+        return
+    producer_name = Producer.objects.filter(pk=OuterRef("producer_id")).values("name")
+    components_names = (
+        Component.objects.filter(products=OuterRef("pk"))
+        .values("products")
+        .annotate(names=StringAgg("name", " "))
+        .values("names")
+    )
+    products.update(
+        search_vector=SearchVector("name", weight="A", config=SEARCH_CONFIG)
+        + SearchVector(Subquery(producer_name), weight="B", config=SEARCH_CONFIG)
+        + SearchVector(Subquery(components_names), weight="B", config=SEARCH_CONFIG)
+        + SearchVector("description", weight="C", config=SEARCH_CONFIG)
+    )
+
+
+@receiver(models.signals.post_save, sender=Product)
+def update_search_vector_after_product_save(sender, instance, **kwargs):
+    """Updates the search vector of the product after product save."""
+    update_search_vectors(Product.objects.filter(pk=instance.pk))
+
+
+@receiver(models.signals.post_save, sender=Producer)
+@receiver(models.signals.post_save, sender=Component)
+def update_search_vectors_after_related_save(sender, instance, **kwargs):
+    """Updates search vectors of the products of the saved producer or component."""
+    if kwargs.get("created"):
+        return
+    update_search_vectors(instance.products.all())
+
+
+@receiver(models.signals.m2m_changed, sender=Product.components.through)
+def update_search_vectors_after_components_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """Updates search vectors after components of products were changed."""
+    if action == "pre_clear" and reverse:
+        instance._cleared_product_ids = list(
+            instance.products.values_list("pk", flat=True)
+        )
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        update_search_vectors(Product.objects.filter(pk=instance.pk))
+        return
+    if action == "post_clear":
+        product_ids = instance.__dict__.pop("_cleared_product_ids", [])
+    else:
+        product_ids = pk_set
+    update_search_vectors(Product.objects.filter(pk__in=product_ids))
+
+
+@receiver(models.signals.m2m_changed, sender=Product.components.through)
+@receiver(models.signals.m2m_changed, sender=Product.tags.through)
+@receiver(models.signals.m2m_changed, sender=Product.promotions.through)
+def update_products_modification_time(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """
+    Updates modification time of products with changed components, tags
+    or promotions, the links are exported with the products.
+    """
+    if action not in ("pre_clear", "post_add", "post_remove"):
+        return
+    if not reverse:
+        products = Product.objects.filter(pk=instance.pk)
+    elif action == "pre_clear":
+        products = instance.products.all()
+    else:
+        products = Product.objects.filter(pk__in=pk_set)
+    products.update(updated_at=timezone.now())
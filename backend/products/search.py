@@ -0,0 +1,263 @@
+import bisect
+import heapq
+import itertools
+import re
+import threading
+from collections import defaultdict
+from operator import itemgetter
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import Case, F, FloatField, Value, When
+
+from core.caching import get_cache_version
+from products.models import SEARCH_CONFIG, Product
+
+WORD_PATTERN = re.compile(r"\w+")
+RUSSIAN_VOWELS = "аеиоуыэюя"
+
+# Endings of the Snowball Russian stemmer
+# fmt: off
+PERFECTIVE_GERUND_ENDINGS = (
+    ("вшись", "вши", "в"),
+    ("ившись", "ывшись", "ивши", "ывши", "ив", "ыв"),
+)
+REFLEXIVE_ENDINGS = ("ся", "сь")
+ADJECTIVE_ENDINGS = (
+    "ими", "ыми", "его", "ого", "ему", "ому", "ее", "ие", "ые", "ое", "ей", "ий",
+    "ый", "ой", "ем", "им", "ым", "ом", "их", "ых", "ую", "юю", "ая", "яя", "ою",
+    "ею",
+)
+PARTICIPLE_ENDINGS = (("ем", "нн", "вш", "ющ", "щ"), ("ивш", "ывш", "ующ"))
+VERB_ENDINGS = (
+    (
+        "ла", "на", "ете", "йте", "ли", "й", "л", "ем", "н", "ло", "но", "ет",
+        "ют", "ны", "ть", "ешь", "нно",
+    ),
+    (
+        "ила", "ыла", "ена", "ейте", "уйте", "ите", "или", "ыли", "ей", "уй",
+        "ил", "ыл", "им", "ым", "ен", "ило", "ыло", "ено", "ят", "ует", "уют",
+        "ит", "ыт", "ены", "ить", "ыть", "ишь", "ую", "ю",
+    ),
+)
+NOUN_ENDINGS = (
+    "иями", "ями", "ами", "ией", "иям", "ием", "иях", "ев", "ов", "ие", "ье",
+    "еи", "ии", "ей", "ой", "ий", "ям", "ем", "ам", "ом", "ах", "ях", "ию",
+    "ью", "ия", "ья", "а", "е", "и", "й", "о", "у", "ы", "ь", "ю", "я",
+)
+SUPERLATIVE_ENDINGS = ("ейше", "ейш")
+DERIVATIONAL_ENDINGS = ("ость", "ост")
+# fmt: on
+
+# Weights of the product fields in the in-process search index
+NAME_WEIGHT = 1.0
+PRODUCER_WEIGHT = 0.4
+COMPONENTS_WEIGHT = 0.4
+DESCRIPTION_WEIGHT = 0.2
+
+
+def remove_ending(word, endings, start=0):
+    """Removes the longest of the endings found in word[start:]."""
+    for ending in sorted(endings, key=len, reverse=True):
+        if word.endswith(ending) and len(word) - len(ending) >= start:
+            return word[: -len(ending)], True
+    return word, False
+
+
+def remove_grouped_ending(word, groups, start=0):
+    """
+    Removes an ending of the first group (only after "а" or "я")
+    or an ending of the second group.
+    """
+    first_group, second_group = groups
+    for ending in sorted(first_group + second_group, key=len, reverse=True):
+        if not word.endswith(ending) or len(word) - len(ending) < start:
+            continue
+        stem = word[: -len(ending)]
+        if ending in second_group or stem.endswith(("а", "я")):
+            return stem, True
+    return word, False
+
+
+def get_regions(word):
+    """Returns the RV and R2 regions starts of the Snowball Russian stemmer."""
+    rv = r2 = len(word)
+    r1 = None
+    for i, letter in enumerate(word):
+        if letter in RUSSIAN_VOWELS:
+            rv = i + 1
+            break
+    for i in range(1, len(word)):
+        if word[i] not in RUSSIAN_VOWELS and word[i - 1] in RUSSIAN_VOWELS:
+            if r1 is None:
+                r1 = i + 1
+            else:
+                r2 = i + 1
+                break
+    return rv, r2
+
+
+def stem(word):
+    """Returns the stem of a Russian word (the Snowball algorithm)."""
+    if not re.fullmatch(r"[а-я]+", word):
+        return word
+    rv, r2 = get_regions(word)
+    word, removed = remove_grouped_ending(word, PERFECTIVE_GERUND_ENDINGS, rv)
+    if not removed:
+        word, _ = remove_ending(word, REFLEXIVE_ENDINGS, rv)
+        word, removed = remove_ending(word, ADJECTIVE_ENDINGS, rv)
+        if removed:
+            word, _ = remove_grouped_ending(word, PARTICIPLE_ENDINGS, rv)
+        else:
+            word, removed = remove_grouped_ending(word, VERB_ENDINGS, rv)
+            if not removed:
+                word, _ = remove_ending(word, NOUN_ENDINGS, rv)
+    word, _ = remove_ending(word, ("и",), rv)
+    word, _ = remove_ending(word, DERIVATIONAL_ENDINGS, r2)
+    word, removed = remove_ending(word, SUPERLATIVE_ENDINGS, rv)
+    if word.endswith("нн") and len(word) - 1 >= rv:
+        return word[:-1]
+    if not removed:
+        word, _ = remove_ending(word, ("ь",), rv)
+    return word
+
+
+def get_words(text):
+    """Splits the text into lowercase words."""
+    return WORD_PATTERN.findall(text.lower().replace("ё", "е"))
+
+
+def get_stems(text):
+    return [stem(word) for word in get_words(text)]
+
+
+class ProductSearchIndex(object):
+    """
+    In-process inverted index of product stems used for the full-text search
+    when the DB has no full-text search engine (e.g. SQLite).
+    It's rebuilt after any change of the product catalogue.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.postings = {}
+        self.stems = []
+
+    def build(self):
+        """Indexes the product name, producer, components and description."""
+        postings = defaultdict(dict)
+        products = (
+            Product.objects.select_related("producer")
+            .prefetch_related("components")
+            .only("id", "name", "description", "producer__name")
+        )
+        for product in products:
+            fields = [
+                (product.name, NAME_WEIGHT),
+                (product.producer.name, PRODUCER_WEIGHT),
+                (product.description, DESCRIPTION_WEIGHT),
+            ] + [
+                (component.name, COMPONENTS_WEIGHT)
+                for component in product.components.all()
+            ]
+            for text, weight in fields:
+                for word_stem in get_stems(text):
+                    product_weights = postings[word_stem]
+                    product_weights[product.id] = max(
+                        product_weights.get(product.id, 0), weight
+                    )
+        self.postings = dict(postings)
+        self.stems = sorted(self.postings)
+
+    def clear(self):
+        """Drops the index, so it's rebuilt on the next search."""
+        with self.lock:
+            self.version = None
+            self.postings = {}
+            self.stems = []
+
+    def refresh(self):
+        """Rebuilds the index if the products were changed."""
+        version = get_cache_version("products")
+        if self.version == version:
+            return
+        with self.lock:
+            if self.version != version:
+                self.build()
+                self.version = version
+
+    def search(self, text, min_weight=0.0):
+        """
+        Returns ranks of the products matching all the words of the text
+        (the last word matches as a prefix to support search-as-you-type)
+        in the fields weighted at least min_weight.
+        """
+        self.refresh()
+        ranks = None
+        stems = get_stems(text)
+        for i, word_stem in enumerate(stems):
+            matches = defaultdict(float)
+            start = bisect.bisect_left(self.stems, word_stem)
+            for indexed_stem in itertools.islice(self.stems, start, None):
+                if indexed_stem != word_stem and (
+                    i != len(stems) - 1 or not indexed_stem.startswith(word_stem)
+                ):
+                    break
+                for product_id, weight in self.postings[indexed_stem].items():
+                    if weight >= min_weight:
+                        matches[product_id] = max(matches[product_id], weight)
+            if ranks is None:
+                ranks = matches
+            else:
+                ranks = {
+                    product_id: ranks[product_id] + weight
+                    for product_id, weight in matches.items()
+                    if product_id in ranks
+                }
+        return ranks or {}
+
+
+product_search_index = ProductSearchIndex()
+
+
+def search_products(queryset, text, name_only=False):
+    """
+    Filters products by the full-text search and annotates them with
+    search_rank, PostgreSQL search_vector column is used if possible.
+    With name_only only the product names are searched.
+    """
+    if connections[queryset.db].vendor == "postgresql":
+        words = get_words(text)
+        if not words:
+            return queryset.none()
+        # The names are the "A" weighted part of the search vector
+        weights = "A" if name_only else ""
+        query = SearchQuery(
+            " & ".join(f"{word}:*{weights}" for word in words),
+            search_type="raw",
+            config=SEARCH_CONFIG,
+        )
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F("search_vector"), query)
+        )
+    ranks = product_search_index.search(
+        text, min_weight=NAME_WEIGHT if name_only else 0.0
+    )
+    top_ranks = heapq.nlargest(
+        settings.PRODUCT_SEARCH_MAX_RESULTS, ranks.items(), key=itemgetter(1)
+    )
+    product_ids_by_rank = defaultdict(list)
+    for product_id, rank in top_ranks:
+        product_ids_by_rank[rank].append(product_id)
+    return queryset.filter(pk__in=[product_id for product_id, _ in top_ranks]).annotate(
+        search_rank=Case(
+            *[
+                When(pk__in=product_ids, then=Value(rank))
+                for rank, product_ids in product_ids_by_rank.items()
+            ],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    )
@@ -0,0 +1,234 @@
+import bisect
+import itertools
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+from django.db import connections
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.loggers import logger
+from products.models import Category, Producer, Product, Tag
+from products.search import get_words
+
+# Minimal trigram similarity of a misspelled word (as in pg_trgm)
+SIMILARITY_THRESHOLD = 0.3
+PREFIX_SCORE = 1.0
+
+Suggestion = namedtuple("Suggestion", ["type", "id", "name", "slug"])
+
+SUGGESTION_MODELS = {
+    Product: "product",
+    Category: "category",
+    Tag: "tag",
+    Producer: "producer",
+}
+
+
+def get_trigrams(word):
+    """Returns trigrams of the word padded like in pg_trgm."""
+    padded_word = f"  {word} "
+    return {
+        "".join(letters)
+        for letters in zip(padded_word, padded_word[1:], padded_word[2:])
+    }
+
+
+def get_similarity(trigrams, other_trigrams):
+    return len(trigrams & other_trigrams) / len(trigrams | other_trigrams)
+
+
+class SuggestionIndex(object):
+    """
+    In-process prefix and trigram index of product, category, tag and producer
+    names for search-as-you-type suggestions. It's updated on save and delete
+    of the objects and fully rebuilt every SUGGESTIONS_REBUILD_INTERVAL seconds
+    to catch changes made by other processes. The rebuilt index is loaded in
+    a background thread without the lock and then swapped in.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.build_lock = threading.Lock()
+        self.built_at = None
+        # Changes made while the index is rebuilt, they are applied to the new one
+        self.changes = None
+        self.suggestions = {}
+        self.word_suggestions = defaultdict(set)
+        self.words = []
+        self.trigram_words = defaultdict(set)
+
+    @property
+    def is_used(self):
+        return self.built_at is not None or self.changes is not None
+
+    def clear(self):
+        """Drops the index, so it's rebuilt on the next search."""
+        with self.lock:
+            self.built_at = None
+            self.suggestions = {}
+            self.word_suggestions = defaultdict(set)
+            self.words = []
+            self.trigram_words = defaultdict(set)
+
+    def load(self):
+        """Adds all the objects to the index."""
+        for model, suggestion_type in SUGGESTION_MODELS.items():
+            fields = ["id", "name"] + (["slug"] if model is not Product else [])
+            for obj in model.objects.only(*fields):
+                self.add(obj, suggestion_type)
+
+    def build(self):
+        """Loads the new index and replaces the current one with it."""
+        with self.lock:
+            self.changes = []
+        index = SuggestionIndex()
+        try:
+            index.load()
+        finally:
+            with self.lock:
+                changes, self.changes = self.changes, None
+        with self.lock:
+            for method, args in changes:
+                getattr(index, method)(*args)
+            self.suggestions = index.suggestions
+            self.word_suggestions = index.word_suggestions
+            self.words = index.words
+            self.trigram_words = index.trigram_words
+            self.built_at = time.monotonic()
+
+    def build_in_background(self):
+        if not self.build_lock.acquire(blocking=False):
+            return
+        try:
+            self.build()
+        except Exception as e:
+            logger.error(f"Suggestions index was not rebuilt: {e}.")
+        finally:
+            self.build_lock.release()
+            connections.close_all()
+
+    def refresh(self):
+        """
+        Builds the index on the first search, later the stale index is
+        rebuilt in the background while searches use the current one.
+        """
+        if self.built_at is None:
+            with self.build_lock:
+                if self.built_at is None:
+                    self.build()
+        elif (
+            time.monotonic() - self.built_at > settings.SUGGESTIONS_REBUILD_INTERVAL
+            and not self.build_lock.locked()
+        ):
+            threading.Thread(
+                target=self.build_in_background,
+                name="suggestions-index-builder",
+                daemon=True,
+            ).start()
+
+    def add(self, obj, suggestion_type):
+        """Adds the object to the index or updates its name."""
+        key = (suggestion_type, obj.pk)
+        with self.lock:
+            if self.changes is not None:
+                self.changes.append(("add", (obj, suggestion_type)))
+            self.discard(key)
+            suggestion = Suggestion(
+                suggestion_type, obj.pk, obj.name, getattr(obj, "slug", None)
+            )
+            self.suggestions[key] = suggestion
+            for word in set(get_words(obj.name)):
+                if word not in self.word_suggestions:
+                    bisect.insort(self.words, word)
+                    for trigram in get_trigrams(word):
+                        self.trigram_words[trigram].add(word)
+                self.word_suggestions[word].add(key)
+
+    def remove(self, key):
+        """Removes the object from the index."""
+        with self.lock:
+            if self.changes is not None:
+                self.changes.append(("remove", (key,)))
+            self.discard(key)
+
+    def discard(self, key):
+        with self.lock:
+            suggestion = self.suggestions.pop(key, None)
+            if suggestion is None:
+                return
+            for word in set(get_words(suggestion.name)):
+                self.word_suggestions[word].discard(key)
+                if self.word_suggestions[word]:
+                    continue
+                del self.word_suggestions[word]
+                del self.words[bisect.bisect_left(self.words, word)]
+                for trigram in get_trigrams(word):
+                    self.trigram_words[trigram].discard(word)
+
+    def match_word(self, query_word):
+        """Returns scores of the indexed words matching the query word."""
+        scores = {}
+        start = bisect.bisect_left(self.words, query_word)
+        for word in itertools.islice(self.words, start, None):
+            if not word.startswith(query_word):
+                break
+            scores[word] = PREFIX_SCORE
+        trigrams = get_trigrams(query_word)
+        similar_words = set()
+        for trigram in trigrams:
+            similar_words |= self.trigram_words.get(trigram, set())
+        for word in similar_words - scores.keys():
+            similarity = get_similarity(trigrams, get_trigrams(word))
+            if similarity >= SIMILARITY_THRESHOLD:
+                scores[word] = similarity
+        return scores
+
+    def search(self, text, limit):
+        """
+        Returns the best suggestions whose names match all the words of
+        the text by prefix or approximately (misspelled words).
+        """
+        query_words = get_words(text)
+        if not query_words:
+            return []
+        self.refresh()
+        with self.lock:
+            scores = None
+            for query_word in query_words:
+                word_scores = defaultdict(float)
+                for word, score in self.match_word(query_word).items():
+                    for key in self.word_suggestions[word]:
+                        word_scores[key] = max(word_scores[key], score)
+                if scores is None:
+                    scores = word_scores
+                else:
+                    scores = {
+                        key: scores[key] + score
+                        for key, score in word_scores.items()
+                        if key in scores
+                    }
+            best_keys = sorted(
+                scores,
+                key=lambda key: (-scores[key], len(self.suggestions[key].name), key),
+            )[:limit]
+            return [self.suggestions[key] for key in best_keys]
+
+
+suggestion_index = SuggestionIndex()
+
+
+@receiver(post_save)
+def update_suggestion_after_save(sender, instance, **kwargs):
+    """Adds the saved product, category, tag or producer to the index."""
+    if sender in SUGGESTION_MODELS and suggestion_index.is_used:
+        suggestion_index.add(instance, SUGGESTION_MODELS[sender])
+
+
+@receiver(post_delete)
+def remove_suggestion_after_delete(sender, instance, **kwargs):
+    """Removes the deleted product, category, tag or producer from the index."""
+    if sender in SUGGESTION_MODELS:
+        suggestion_index.remove((SUGGESTION_MODELS[sender], instance.pk))
@@ -0,0 +1,103 @@
+import atexit
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.loggers import logger
+from products.models import Product
+
+
+class ProductViewsBuffer(object):
+    """
+    Accumulates product page views in memory and saves them to the DB in bulk,
+    so viewing a product doesn't lock and rewrite its row on every request.
+    """
+
+    def __init__(self):
+        """Initialize the empty buffer."""
+        self.views = Counter()
+        self.lock = threading.Lock()
+        self.flusher = None
+        self.flushed_at_exit = False
+
+    def add(self, product_id):
+        """
+        Registers a product view and returns the number of the product views
+        which are not saved to the DB yet.
+        """
+        self.start_flusher()
+        with self.lock:
+            self.views[product_id] += 1
+            return self.views[product_id]
+
+    def flush(self):
+        """
+        Saves the accumulated views to the DB with one UPDATE per increment.
+        The UPDATEs are done in one transaction, so if any of them fails
+        nothing is saved and all the views are returned to the buffer.
+        """
+        with self.lock:
+            views, self.views = self.views, Counter()
+        if not views:
+            return
+        products_by_increment = defaultdict(list)
+        for product_id, increment in views.items():
+            products_by_increment[increment].append(product_id)
+        try:
+            with transaction.atomic():
+                for increment, product_ids in products_by_increment.items():
+                    Product.objects.filter(pk__in=product_ids).update(
+                        views_number=F("views_number") + increment,
+                        updated_at=timezone.now(),
+                    )
+        except Exception as e:
+            logger.error(f"Product views were not saved: {e}.")
+            with self.lock:
+                self.views.update(views)
+            return
+        logger.info(f"Views of {len(views)} products were saved.")
+
+    def clear(self):
+        """Drops the accumulated views without saving them."""
+        with self.lock:
+            self.views.clear()
+
+    def start_flusher(self):
+        """
+        Starts the background thread which flushes the buffer periodically,
+        the rest of the views is saved when the process exits.
+        """
+        interval = settings.PRODUCT_VIEWS_FLUSH_INTERVAL
+        if self.flushed_at_exit and (not interval or self.flusher is not None):
+            return
+        with self.lock:
+            if not self.flushed_at_exit:
+                self.flushed_at_exit = True
+                atexit.register(self.flush)
+            if not interval or self.flusher is not None:
+                return
+            self.flusher = threading.Thread(
+                target=self.flush_periodically,
+                args=(interval,),
+                name="product-views-flusher",
+                daemon=True,
+            )
+        self.flusher.start()
+
+    def flush_periodically(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Product views flushing failed: {e}.")
+            finally:
+                connections.close_all()
+
+
+product_views_buffer = ProductViewsBuffer()
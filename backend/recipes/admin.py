@@ -26,18 +26,20 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display_links = ["name"]
     search_fields = ["author__username", "name", "short_description", "text"]
     list_filter = ["pub_date", "cooking_time", "servings_quantity"]
-    readonly_fields = ["pub_date"]
+    readonly_fields = [
+        "pub_date",
+        "total_ingredients",
+        "proteins",
+        "fats",
+        "carbohydrates",
+        "kcal",
+    ]
     empty_value_display = "-empty-"
     inlines = [RecipeIngredientInline]
 
-    @admin.display(description="Total ingredients")
-    def total_ingredients(self, obj):
-        """Shows the number of ingredients for this recipe."""
-        return obj.ingredients.count()
-
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
-        return queryset.select_related("author").prefetch_related("ingredients")
+        return queryset.select_related("author")
 
 
 @admin.register(ProductsInRecipe)
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0002_recipe_servings_quantity_recipe_short_description"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productsinrecipe",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Updated"
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Updated"
+            ),
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:57
+
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_recipes_nutrition(apps, schema_editor):
+    """Calculates nutrition totals of the existing recipes."""
+    Recipe = apps.get_model("recipes", "Recipe")
+    ProductsInRecipe = apps.get_model("recipes", "ProductsInRecipe")
+    ingredients = (
+        ProductsInRecipe.objects.filter(recipe=OuterRef("pk"))
+        .order_by()
+        .values("recipe")
+    )
+
+    def total(nutrient):
+        amount = F(f"ingredient__{nutrient}") * F("amount") / 100.0
+        return Coalesce(
+            Subquery(ingredients.annotate(total=Sum(amount)).values("total")),
+            0.0,
+            output_field=FloatField(),
+        )
+
+    Recipe.objects.update(
+        total_ingredients=Coalesce(
+            Subquery(ingredients.annotate(count=Count("pk")).values("count")), 0
+        ),
+        proteins=total("proteins"),
+        fats=total("fats"),
+        carbohydrates=total("carbohydrates"),
+    )
+    Recipe.objects.update(
+        kcal=F("proteins") * 4 + F("fats") * 9 + F("carbohydrates") * 4
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0003_productsinrecipe_updated_at_recipe_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="carbohydrates",
+            field=models.FloatField(
+                default=0,
+                editable=False,
+                help_text="Carbohydrates of all the recipe ingredients",
+                verbose_name="Carbohydrates",
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="fats",
+            field=models.FloatField(
+                default=0,
+                editable=False,
+                help_text="Fats of all the recipe ingredients",
+                verbose_name="Fats",
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="kcal",
+            field=models.FloatField(
+                db_index=True,
+                default=0,
+                editable=False,
+                help_text="Kcal of all the recipe ingredients",
+                verbose_name="Kcal",
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="proteins",
+            field=models.FloatField(
+                db_index=True,
+                default=0,
+                editable=False,
+                help_text="Proteins of all the recipe ingredients",
+                verbose_name="Proteins",
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="total_ingredients",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Number of the recipe ingredients",
+                verbose_name="Total ingredients",
+            ),
+        ),
+        migrations.RunPython(fill_recipes_nutrition, migrations.RunPython.noop),
+    ]
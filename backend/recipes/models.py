@@ -1,12 +1,19 @@
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
 
-from core.models import CreatedModel
+from core.models import CreatedModel, UpdatedModel
 from products.models import Product
 from users.models import User
 
+NUTRIENTS = ("proteins", "fats", "carbohydrates")
 
-class Recipe(CreatedModel):
+
+class Recipe(CreatedModel, UpdatedModel):
     """A model for recipes.
 
     It is described by the following fields:
@@ -19,6 +26,8 @@ class Recipe(CreatedModel):
     Multiple field, selection from a list of products,
     with the quantity.
     cooking_time - Cooking time in minutes.
+    total_ingredients, proteins, fats, carbohydrates, kcal - Nutrition totals
+    of the ingredients, they are updated when the ingredients change.
     """
 
     def recipe_directory_path(self, filename):
@@ -53,6 +62,38 @@ class Recipe(CreatedModel):
     servings_quantity = models.CharField(
         "Servings Quantity", max_length=255, blank=True, null=True
     )
+    total_ingredients = models.PositiveIntegerField(
+        "Total ingredients",
+        default=0,
+        editable=False,
+        help_text="Number of the recipe ingredients",
+    )
+    proteins = models.FloatField(
+        "Proteins",
+        default=0,
+        editable=False,
+        db_index=True,
+        help_text="Proteins of all the recipe ingredients",
+    )
+    fats = models.FloatField(
+        "Fats",
+        default=0,
+        editable=False,
+        help_text="Fats of all the recipe ingredients",
+    )
+    carbohydrates = models.FloatField(
+        "Carbohydrates",
+        default=0,
+        editable=False,
+        help_text="Carbohydrates of all the recipe ingredients",
+    )
+    kcal = models.FloatField(
+        "Kcal",
+        default=0,
+        editable=False,
+        db_index=True,
+        help_text="Kcal of all the recipe ingredients",
+    )
 
     class Meta:
         verbose_name = "Recipe"
@@ -63,7 +104,7 @@ class Recipe(CreatedModel):
         return self.name
 
 
-class ProductsInRecipe(models.Model):
+class ProductsInRecipe(UpdatedModel):
     """A model of the ingredients in a recipe.
 
     It is described by the following fields:
@@ -94,3 +135,55 @@ class ProductsInRecipe(models.Model):
     class Meta:
         verbose_name = "Products in recipe"
         verbose_name_plural = "Products in recipes"
+
+
+def update_recipes_nutrition(recipes):
+    """
+    Recalculates the number of ingredients and the nutrition totals
+    of the given recipes from their ingredients.
+    """
+    ingredients = (
+        ProductsInRecipe.objects.filter(recipe=OuterRef("pk"))
+        .order_by()
+        .values("recipe")
+    )
+
+    def total(nutrient):
+        amount = F(f"ingredient__{nutrient}") * F("amount") / 100.0
+        return Coalesce(
+            Subquery(ingredients.annotate(total=Sum(amount)).values("total")),
+            0.0,
+            output_field=FloatField(),
+        )
+
+    recipes.update(
+        total_ingredients=Coalesce(
+            Subquery(ingredients.annotate(count=Count("pk")).values("count")), 0
+        ),
+        proteins=total("proteins"),
+        fats=total("fats"),
+        carbohydrates=total("carbohydrates"),
+    )
+    recipes.update(
+        kcal=F("proteins") * 4 + F("fats") * 9 + F("carbohydrates") * 4,
+        updated_at=timezone.now(),
+    )
+
+
+@receiver(post_save, sender=ProductsInRecipe)
+@receiver(post_delete, sender=ProductsInRecipe)
+def update_recipe_nutrition_after_ingredient_change(sender, instance, **kwargs):
+    """Updates nutrition of the recipe after its ingredient was changed."""
+    update_recipes_nutrition(Recipe.objects.filter(pk=instance.recipe_id))
+
+
+@receiver(post_save, sender=Product)
+def update_recipes_nutrition_after_product_save(
+    sender, instance, created, update_fields, **kwargs
+):
+    """Updates nutrition of the recipes with the product after its change."""
+    if created:
+        return
+    if update_fields is not None and not set(update_fields) & set(NUTRIENTS):
+        return
+    update_recipes_nutrition(Recipe.objects.filter(ingredients=instance))
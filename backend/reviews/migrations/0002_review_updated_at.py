@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reviews", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="review",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Updated"
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0010_drop_favoriteproduct_user_index"),
+        ("reviews", "0002_review_updated_at"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="review",
+            name="product",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="reviews",
+                to="products.product",
+                verbose_name="Product",
+            ),
+        ),
+    ]
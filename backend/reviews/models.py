@@ -1,18 +1,27 @@
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
 
-from products.models import Product
+from core.caching import invalidate_cached_responses
+from core.models import UpdatedModel
+from products.models import RATING_DECIMAL_PLACES, Product
 from users.models import User
 
 
-class Review(models.Model):
+class Review(UpdatedModel):
     """Describes customer reviews on products."""
 
+    # Indexed by unique_product_author
     product = models.ForeignKey(
         Product,
         on_delete=models.CASCADE,
         related_name="reviews",
         verbose_name="Product",
+        db_index=False,
     )
     text = models.TextField(verbose_name="Text", blank=True)
     author = models.ForeignKey(
@@ -41,5 +50,80 @@ class Review(models.Model):
             )
         ]
 
+    def __init__(self, *args, **kwargs):
+        """
+        Remembers the initial score and product to update the product rating
+        on edit.
+        """
+        super().__init__(*args, **kwargs)
+        self._loaded_score = self.__dict__.get("score")
+        self._loaded_product_id = self.__dict__.get("product_id")
+
     def __str__(self):
         return self.text
+
+
+def update_product_rating(product_id, score_change, count_change):
+    """
+    Changes the rating of the product without aggregating its reviews,
+    the cached product responses are made stale only by this change.
+    """
+    rating_sum = F("rating_sum") + score_change
+    rating_count = F("rating_count") + count_change
+    Product.objects.filter(pk=product_id).update(
+        rating_sum=rating_sum,
+        rating_count=rating_count,
+        rating=Round(
+            Cast(rating_sum, FloatField()) / NullIf(rating_count, 0),
+            RATING_DECIMAL_PLACES,
+        ),
+        updated_at=timezone.now(),
+    )
+    invalidate_cached_responses("products")
+
+
+def update_products_rating(products):
+    """
+    Recalculates the rating of the given products from their reviews,
+    it's used after reviews were created in bulk without signals.
+    """
+    reviews = Review.objects.filter(product=OuterRef("pk")).order_by().values("product")
+    products.update(
+        rating_sum=Coalesce(Subquery(reviews.annotate(s=Sum("score")).values("s")), 0),
+        rating_count=Coalesce(Subquery(reviews.annotate(c=Count("pk")).values("c")), 0),
+    )
+    products.update(
+        rating=Round(
+            Cast(F("rating_sum"), FloatField()) / NullIf(F("rating_count"), 0),
+            RATING_DECIMAL_PLACES,
+        ),
+        updated_at=timezone.now(),
+    )
+
+
+@receiver(post_save, sender=Review)
+def update_product_rating_after_review_save(sender, instance, created, **kwargs):
+    """
+    Adds the score of the new review or the change of the edited score,
+    the score of a review moved to another product is moved with it.
+    """
+    if created:
+        update_product_rating(instance.product_id, instance.score, 1)
+    elif instance._loaded_product_id not in (None, instance.product_id):
+        if instance._loaded_score is not None:
+            update_product_rating(
+                instance._loaded_product_id, -instance._loaded_score, -1
+            )
+            update_product_rating(instance.product_id, instance.score, 1)
+    elif instance._loaded_score not in (None, instance.score):
+        update_product_rating(
+            instance.product_id, instance.score - instance._loaded_score, 0
+        )
+    instance._loaded_score = instance.score
+    instance._loaded_product_id = instance.product_id
+
+
+@receiver(post_delete, sender=Review)
+def update_product_rating_after_review_delete(sender, instance, **kwargs):
+    """Subtracts the score of the deleted review."""
+    update_product_rating(instance.product_id, -instance.score, -1)
@@ -0,0 +1,27 @@
+from django.contrib import admin, messages
+
+from task_queue.models import DeadTask, Task
+from task_queue.queue import enqueue
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "attempts", "run_at", "locked_until", "created")
+    list_filter = ("name",)
+    readonly_fields = ("attempts", "locked_until", "last_error", "created")
+
+
+@admin.register(DeadTask)
+class DeadTaskAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "attempts", "created", "failed")
+    list_filter = ("name", "failed")
+    readonly_fields = ("attempts", "error", "created", "failed")
+    actions = ("requeue",)
+
+    @admin.action(description="Queue the selected tasks again")
+    def requeue(self, request, queryset):
+        for dead_task in queryset:
+            enqueue(dead_task.name, dead_task.args, dead_task.kwargs)
+        number = queryset.count()
+        queryset.delete()
+        self.message_user(request, f"{number} tasks are queued.", messages.SUCCESS)
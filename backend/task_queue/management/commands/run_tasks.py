@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from task_queue.queue import run_due_tasks
+
+
+class Command(BaseCommand):
+    help = "Runs the queued tasks, several workers may run at the same time"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run the tasks which are due now and exit",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=settings.TASK_QUEUE_POLL_INTERVAL,
+            help="Seconds to wait for new tasks when the queue is empty",
+        )
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            number = run_due_tasks()
+            self.stdout.write(self.style.SUCCESS(f"{number} tasks were run."))
+            return
+        self.stdout.write("Waiting for tasks, press Ctrl+C to stop.")
+        try:
+            while True:
+                close_old_connections()
+                if not run_due_tasks():
+                    time.sleep(options["sleep"])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
@@ -0,0 +1,109 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:07
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="DeadTask",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=200, verbose_name="Name")),
+                (
+                    "args",
+                    models.JSONField(default=list, verbose_name="Positional arguments"),
+                ),
+                (
+                    "kwargs",
+                    models.JSONField(default=dict, verbose_name="Keyword arguments"),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(verbose_name="Attempts")),
+                ("error", models.TextField(verbose_name="Error")),
+                ("created", models.DateTimeField(verbose_name="Created")),
+                (
+                    "failed",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Failed"),
+                ),
+            ],
+            options={
+                "verbose_name": "Dead task",
+                "verbose_name_plural": "Dead tasks",
+                "ordering": ["-failed"],
+            },
+        ),
+        migrations.CreateModel(
+            name="Task",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=200, verbose_name="Name")),
+                (
+                    "args",
+                    models.JSONField(default=list, verbose_name="Positional arguments"),
+                ),
+                (
+                    "kwargs",
+                    models.JSONField(default=dict, verbose_name="Keyword arguments"),
+                ),
+                (
+                    "attempts",
+                    models.PositiveSmallIntegerField(
+                        default=0, verbose_name="Attempts"
+                    ),
+                ),
+                (
+                    "max_retries",
+                    models.PositiveSmallIntegerField(verbose_name="Max retries"),
+                ),
+                (
+                    "run_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="Run at"
+                    ),
+                ),
+                (
+                    "locked_until",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Locked until"
+                    ),
+                ),
+                ("last_error", models.TextField(blank=True, verbose_name="Last error")),
+                (
+                    "created",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created"),
+                ),
+            ],
+            options={
+                "verbose_name": "Task",
+                "verbose_name_plural": "Tasks",
+                "ordering": ["run_at", "id"],
+                "indexes": [
+                    models.Index(
+                        fields=["run_at", "locked_until"],
+                        name="task_queue__run_at_a2d2d9_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """Queued call of a registered task function."""
+
+    name = models.CharField("Name", max_length=200)
+    args = models.JSONField("Positional arguments", default=list)
+    kwargs = models.JSONField("Keyword arguments", default=dict)
+    attempts = models.PositiveSmallIntegerField("Attempts", default=0)
+    max_retries = models.PositiveSmallIntegerField("Max retries")
+    run_at = models.DateTimeField("Run at", default=timezone.now)
+    locked_until = models.DateTimeField("Locked until", blank=True, null=True)
+    last_error = models.TextField("Last error", blank=True)
+    created = models.DateTimeField("Created", auto_now_add=True)
+
+    class Meta:
+        ordering = ["run_at", "id"]
+        verbose_name = "Task"
+        verbose_name_plural = "Tasks"
+        indexes = [models.Index(fields=["run_at", "locked_until"])]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk}"
+
+
+class DeadTask(models.Model):
+    """Task which failed all its attempts (the dead-letter table)."""
+
+    name = models.CharField("Name", max_length=200)
+    args = models.JSONField("Positional arguments", default=list)
+    kwargs = models.JSONField("Keyword arguments", default=dict)
+    attempts = models.PositiveSmallIntegerField("Attempts")
+    error = models.TextField("Error")
+    created = models.DateTimeField("Created")
+    failed = models.DateTimeField("Failed", auto_now_add=True)
+
+    class Meta:
+        ordering = ["-failed"]
+        verbose_name = "Dead task"
+        verbose_name_plural = "Dead tasks"
+
+    def __str__(self):
+        return f"{self.name} #{self.pk}"
@@ -0,0 +1,131 @@
+import traceback
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.loggers import logger
+from task_queue.models import DeadTask, Task
+
+# Registered task functions by name
+TASKS = {}
+
+
+def task(func=None, *, max_retries=None):
+    """
+    Registers the function as a task. Its delay(*args, **kwargs) method
+    queues the call for the run_tasks worker, the arguments must be
+    JSON serializable.
+    """
+
+    def decorator(func):
+        name = f"{func.__module__}.{func.__name__}"
+        TASKS[name] = func
+
+        @wraps(func)
+        def delay(*args, **kwargs):
+            return enqueue(name, args, kwargs, max_retries)
+
+        func.delay = delay
+        return func
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def enqueue(name, args=(), kwargs=None, max_retries=None):
+    """
+    Queues the task. It's saved in the current transaction, so the task
+    is queued only if the changes it depends on are committed.
+    """
+    if max_retries is None:
+        max_retries = settings.TASK_QUEUE_MAX_RETRIES
+    return Task.objects.create(
+        name=name, args=list(args), kwargs=kwargs or {}, max_retries=max_retries
+    )
+
+
+def get_retry_delay(attempts):
+    """Returns the exponential backoff before the next attempt."""
+    return timedelta(seconds=settings.TASK_QUEUE_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def claim_task():
+    """
+    Locks the next due task for this worker and returns it or None.
+    The attempt is counted together with the lock, so tasks of crashed
+    workers are taken again after their lock expires until they run out
+    of attempts.
+    """
+    now = timezone.now()
+    unlocked = Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    due_tasks = Task.objects.filter(unlocked, run_at__lte=now)
+    locked_until = now + timedelta(seconds=settings.TASK_QUEUE_LOCK_TIMEOUT)
+    for pk in due_tasks.values_list("pk", flat=True)[:10]:
+        # Other workers may have locked the task since the select
+        if Task.objects.filter(unlocked, pk=pk).update(
+            locked_until=locked_until, attempts=F("attempts") + 1
+        ):
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def bury_task(queued_task, error):
+    with transaction.atomic():
+        DeadTask.objects.create(
+            name=queued_task.name,
+            args=queued_task.args,
+            kwargs=queued_task.kwargs,
+            attempts=queued_task.attempts,
+            error=error,
+            created=queued_task.created,
+        )
+        queued_task.delete()
+    logger.error(f"Task {queued_task} failed {queued_task.attempts} times: {error}")
+
+
+def run_task(queued_task):
+    """
+    Runs the claimed task. Succeeded tasks are deleted, failed ones are
+    retried with a backoff and moved to the dead tasks at the end.
+    Returns whether the task succeeded.
+    """
+    if queued_task.attempts > queued_task.max_retries + 1:
+        # The previous attempts stopped the worker before the task finished
+        queued_task.attempts -= 1
+        bury_task(queued_task, queued_task.last_error or "The worker stopped")
+        return False
+    func = TASKS.get(queued_task.name)
+    if func is None:
+        bury_task(queued_task, f"Unknown task {queued_task.name}")
+        return False
+    try:
+        with transaction.atomic():
+            func(*queued_task.args, **queued_task.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if queued_task.attempts > queued_task.max_retries:
+            bury_task(queued_task, error)
+            return False
+        queued_task.run_at = timezone.now() + get_retry_delay(queued_task.attempts)
+        queued_task.locked_until = None
+        queued_task.last_error = error
+        queued_task.save()
+        logger.warning(f"Task {queued_task} failed, retry at {queued_task.run_at}.")
+        return False
+    queued_task.delete()
+    logger.info(f"Task {queued_task.name} succeeded.")
+    return True
+
+
+def run_due_tasks():
+    """Runs the tasks which are due now, returns the number of run tasks."""
+    number = 0
+    while (queued_task := claim_task()) is not None:
+        run_task(queued_task)
+        number += 1
+    return number
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from core.benchmarks import (
+    INDEX_LOOKUPS,
+    CatalogueGenerator,
+    explain_index_lookups,
+    get_percentile,
+    run_benchmarks,
+    uses_expected_index,
+)
+from products.models import Product, ProductPromotion
+from reviews.models import Review
+
+# Rows of the order products, reviews and favorites generated to check
+# the plans, e.g. INDEX_BENCHMARK_ROWS=1000000 checks them at the real scale
+INDEX_BENCHMARK_ROWS = int(os.getenv("INDEX_BENCHMARK_ROWS", default=3000))
+
+
+def test_get_percentile():
+    assert get_percentile([3, 1, 2, 4], 50) == 2.5
+    assert get_percentile([1, 2, 3, 4, 5], 90) == pytest.approx(4.6)
+    assert get_percentile([7], 99) == 7
+
+
+@pytest.mark.django_db
+def test_generate_catalogue():
+    CatalogueGenerator(100, reviews=300, favorites=50, orders=10, recipes=2).generate()
+
+    assert Product.objects.count() == 100
+    assert Review.objects.count() == 300
+    product = Product.objects.filter(rating__isnull=False).first()
+    scores = list(product.reviews.values_list("score", flat=True))
+    assert product.rating_count == len(scores)
+    assert product.rating == round(sum(scores) / len(scores), 1)
+    product_promotion = ProductPromotion.objects.select_related(
+        "product", "promotion"
+    ).first()
+    assert (
+        product_promotion.product.final_price
+        == product_promotion.product.calculate_final_price()
+    )
+
+
+@pytest.mark.django_db
+def test_run_benchmarks():
+    CatalogueGenerator(50, orders=5, recipes=2).generate()
+    results = run_benchmarks(rounds=2, warmup=1)
+
+    assert set(results) == {
+        "product list",
+        "product filter",
+        "product search",
+        "category list",
+        "cart add",
+        "checkout",
+        "pay",
+        "recipe list",
+    }
+    for result in results.values():
+        assert result["errors"] == 0
+        assert result["p50_ms"] <= result["p99_ms"]
+        assert result["queries"] > 0
+
+
+@pytest.mark.django_db
+def test_hot_lookups_use_indexes():
+    rows = INDEX_BENCHMARK_ROWS
+    CatalogueGenerator(
+        max(rows // 10, 100),
+        reviews=rows,
+        favorites=rows,
+        orders=rows // 3,
+        recipes=1,
+    ).generate()
+
+    plans = explain_index_lookups()
+
+    assert set(plans) == {name for name, *_ in INDEX_LOOKUPS}
+    for name, result in plans.items():
+        assert result["uses_index"], f"{name}: {result['plan']}"
+    assert not uses_expected_index(
+        Review, "unique_product_author", plans["favorite flag"]["plan"]
+    )
@@ -2,6 +2,7 @@ import pytest
 from django.urls import reverse
 
 from api.mixins import MESSAGE_ON_DELETE
+from products.models import Product
 from tests.fixtures import (
     CATEGORY_NAME_1,
     CATEGORY_SLUG_1,
@@ -9,6 +10,7 @@ from tests.fixtures import (
     INVALID_SLUG_MESSAGE,
     SUBCATEGORY_NAME_1,
     TEST_NAME,
+    TEST_NUMBER,
     TEST_SLUG,
 )
 
@@ -38,6 +40,29 @@ def test_get_category_by_id(client, categories, subcategories):
     assert response.data["top_products"] == []
 
 
+@pytest.mark.django_db
+@pytest.mark.query_budget(4, max_duplicates=0)
+def test_get_category_list_top_products(client, settings, products):
+    settings.TOP_PRODUCTS_NUMBER = 1
+    bestseller = Product.objects.create(
+        name=TEST_NAME,
+        category=products[2].category,
+        subcategory=products[2].subcategory,
+        producer=products[2].producer,
+        price=TEST_NUMBER,
+        orders_number=TEST_NUMBER,
+    )
+    response = client.get(reverse("api:category-list"))
+
+    assert response.status_code == 200
+    assert response.data[0]["id"] == bestseller.category.pk
+    assert len(response.data[0]["top_products"]) == 1
+    assert response.data[0]["top_products"][0]["id"] == bestseller.pk
+    assert response.data[0]["top_products"][0]["orders_number"] == TEST_NUMBER
+    assert len(response.data[1]["top_products"]) == 1
+    assert response.data[1]["top_products"][0]["id"] == products[0].pk
+
+
 @pytest.mark.django_db
 def test_create_category(auth_admin):
     payload = {"category_name": TEST_NAME}
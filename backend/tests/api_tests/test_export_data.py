@@ -0,0 +1,171 @@
+import csv
+import gzip
+import hashlib
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from core.management.commands.export_data import MANIFEST_FILENAME
+from products.models import Product, ProductPromotion
+from reviews.models import Review
+
+
+@pytest.mark.django_db
+def test_export_data_manifest(tmp_path, products, favorites):
+    call_command("export_data", output_dir=tmp_path, compress="gzip", stdout=StringIO())
+
+    manifest = json.loads((tmp_path / MANIFEST_FILENAME).read_text(encoding="utf-8"))
+    assert manifest["compression"] == "gzip"
+    files = {entry["file"]: entry for entry in manifest["files"]}
+    assert files["products.csv.gz"]["rows"] == Product.objects.count()
+    assert files["favorites.csv.gz"]["rows"] == len(favorites)
+    for entry in manifest["files"]:
+        content = (tmp_path / entry["file"]).read_bytes()
+        assert entry["size"] == len(content)
+        assert entry["sha256"] == hashlib.sha256(content).hexdigest()
+    with gzip.open(tmp_path / "products.csv.gz", "rt", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [int(row["id"]) for row in rows] == sorted(
+        Product.objects.values_list("id", flat=True)
+    )
+
+
+@pytest.mark.django_db
+def test_export_data_loads_back(tmp_path, products, favorites):
+    product_components = {
+        product.id: set(product.components.values_list("id", flat=True))
+        for product in products
+    }
+    call_command("export_data", output_dir=tmp_path, stdout=StringIO())
+    call_command("flush", interactive=False, verbosity=0)
+    call_command("load_data", data_dir=tmp_path, stdout=StringIO())
+
+    loaded_products = Product.objects.prefetch_related("components")
+    assert {
+        product.id: {component.id for component in product.components.all()}
+        for product in loaded_products
+    } == product_components
+
+
+@pytest.mark.django_db
+def test_export_data_delta(tmp_path, products, favorites):
+    call_command("export_data", output_dir=tmp_path / "full", stdout=StringIO())
+    bread, water, cucumbers = products.order_by("pk")
+    bread.name = "Changed bread"
+    bread.save()
+    cucumbers.components.clear()
+    call_command(
+        "export_data",
+        output_dir=tmp_path / "delta",
+        since_manifest=tmp_path / "full" / MANIFEST_FILENAME,
+        stdout=StringIO(),
+    )
+
+    manifest = json.loads(
+        (tmp_path / "delta" / MANIFEST_FILENAME).read_text(encoding="utf-8")
+    )
+    files = {entry["file"]: entry for entry in manifest["files"]}
+    assert manifest["since"] is not None
+    assert files["products.csv"]["rows"] == 2
+    assert files["favorites.csv"]["rows"] == 0
+    assert "sessions.csv" not in files
+
+    water_components = set(water.components.values_list("id", flat=True))
+    bread_components = set(bread.components.values_list("id", flat=True))
+    call_command("flush", interactive=False, verbosity=0)
+    call_command("load_data", data_dir=tmp_path / "full", stdout=StringIO())
+    call_command(
+        "load_data", data_dir=tmp_path / "delta", delta=True, stdout=StringIO()
+    )
+
+    assert Product.objects.count() == 3
+    assert Product.objects.get(pk=bread.pk).name == "Changed bread"
+    assert Product.objects.get(pk=water.pk).name == water.name
+    assert not Product.objects.get(pk=cucumbers.pk).components.exists()
+    assert (
+        set(Product.objects.get(pk=bread.pk).components.values_list("id", flat=True))
+        == bread_components
+    )
+    assert (
+        set(Product.objects.get(pk=water.pk).components.values_list("id", flat=True))
+        == water_components
+    )
+
+
+@pytest.mark.django_db
+def test_export_data_delta_product_promotion(tmp_path, products, promotions):
+    bread, water, cucumbers = products.order_by("pk")
+    bread_promotion = ProductPromotion.objects.create(
+        product=bread, promotion=promotions[0]
+    )
+    ProductPromotion.objects.create(product=water, promotion=promotions[1])
+    bread.refresh_from_db()
+    assert bread.final_price < bread.price
+    call_command("export_data", output_dir=tmp_path / "full", stdout=StringIO())
+    bread_promotion.save()
+    call_command(
+        "export_data",
+        output_dir=tmp_path / "delta",
+        since_manifest=tmp_path / "full" / MANIFEST_FILENAME,
+        stdout=StringIO(),
+    )
+
+    call_command("flush", interactive=False, verbosity=0)
+    call_command("load_data", data_dir=tmp_path / "full", stdout=StringIO())
+    # Only the products of the delta get their denormalized data updated
+    Product.objects.filter(pk__in=[bread.pk, cucumbers.pk]).update(final_price=0)
+    call_command(
+        "load_data", data_dir=tmp_path / "delta", delta=True, stdout=StringIO()
+    )
+
+    assert set(ProductPromotion.objects.values_list("product", "promotion")) == {
+        (bread.pk, promotions[0].pk),
+        (water.pk, promotions[1].pk),
+    }
+    assert Product.objects.get(pk=bread.pk).final_price == bread.final_price
+    assert Product.objects.get(pk=cucumbers.pk).final_price == 0
+
+
+@pytest.mark.django_db
+def test_export_data_delta_denormalized_changes(
+    tmp_path, products, promotions, user, product_views
+):
+    bread, water, cucumbers = products.order_by("pk")
+    ProductPromotion.objects.create(product=bread, promotion=promotions[0])
+    water_promotion = ProductPromotion.objects.create(
+        product=water, promotion=promotions[1]
+    )
+    call_command("export_data", output_dir=tmp_path / "full", stdout=StringIO())
+    water_promotion.delete()
+    Review.objects.create(product=cucumbers, author=user, score=4)
+    product_views.add(bread.pk)
+    product_views.flush()
+    call_command(
+        "export_data",
+        output_dir=tmp_path / "delta",
+        since_manifest=tmp_path / "full" / MANIFEST_FILENAME,
+        stdout=StringIO(),
+    )
+    expected_products = {
+        product.pk: (product.final_price, product.rating, product.views_number)
+        for product in Product.objects.all()
+    }
+
+    call_command("flush", interactive=False, verbosity=0)
+    call_command("load_data", data_dir=tmp_path / "full", stdout=StringIO())
+    call_command(
+        "load_data", data_dir=tmp_path / "delta", delta=True, stdout=StringIO()
+    )
+
+    assert set(ProductPromotion.objects.values_list("product", "promotion")) == {
+        (bread.pk, promotions[0].pk)
+    }
+    assert {
+        product.pk: (product.final_price, product.rating, product.views_number)
+        for product in Product.objects.all()
+    } == expected_products
+    assert Product.objects.get(pk=water.pk).final_price == water.price
+    assert Product.objects.get(pk=cucumbers.pk).rating == 4
+    assert Product.objects.get(pk=bread.pk).views_number == 1
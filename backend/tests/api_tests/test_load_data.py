@@ -0,0 +1,161 @@
+import csv
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from core.management.commands.load_data import CSV_FILES
+from products.models import Product, Promotion
+from reviews.models import Review
+from users.models import User
+
+CSV_ROWS = {
+    "users.csv": [
+        {
+            "id": 1,
+            "password": "-",
+            "last_login": "",
+            "is_superuser": False,
+            "first_name": "",
+            "last_name": "",
+            "is_staff": False,
+            "is_active": True,
+            "date_joined": "2023-01-01T00:00:00+00:00",
+            "username": "loaded_user",
+            "email": "loaded_user@good_food.fake",
+            "city": "Moscow",
+            "birth_date": "",
+            "phone_number": "89000000000",
+            "photo": "",
+        }
+    ],
+    "category.csv": [{"id": 1, "name": "Категория", "slug": "category", "image": ""}],
+    "subcategory.csv": [
+        {
+            "id": 1,
+            "parent_category_id": 1,
+            "name": "Подкатегория",
+            "slug": "subcategory",
+            "image": "",
+        }
+    ],
+    "tags.csv": [{"id": 1, "name": "Тег", "slug": "tag", "image": ""}],
+    "producer.csv": [
+        {
+            "id": 1,
+            "name": "Производитель",
+            "slug": "producer",
+            "producer_type": "company",
+            "description": "",
+            "address": "-",
+            "image": "",
+        }
+    ],
+    "components.csv": [{"id": 1, "name": "Компонент", "slug": "component"}],
+    "promotions.csv": [
+        {
+            "id": 1,
+            "promotion_type": "simple",
+            "name": "Акция",
+            "slug": "promotion",
+            "discount": 10,
+            "conditions": "",
+            "is_active": True,
+            "is_constant": False,
+            "image": "",
+            "start_time": "2023-01-01T00:00:00+00:00",
+            "end_time": "2030-01-01T00:00:00+00:00",
+        }
+    ],
+    "products.csv": [
+        {
+            "id": product_id,
+            "name": f"Товар {product_id}",
+            "description": "",
+            "creation_time": "",
+            "category_id": 1,
+            "subcategory_id": 1,
+            "producer_id": 1,
+            "measure_unit": "items",
+            "amount": 1,
+            "price": 100,
+            "photo": "",
+            "kcal": 0,
+            "proteins": 0,
+            "fats": 0,
+            "carbohydrates": 0,
+        }
+        for product_id in (1, 2)
+    ],
+    "products_components.csv": [{"id": 1, "product_id": 1, "component_id": 1}],
+    "products_tags.csv": [{"id": 1, "product_id": 2, "tag_id": 1}],
+    "products_promotions.csv": [{"id": 1, "product_id": 1, "promotion_id": 1}],
+    "reviews.csv": [
+        {
+            "id": review_id,
+            "text": "",
+            "score": score,
+            "pub_date": "2023-01-01T00:00:00+00:00",
+            "author_id": 1,
+            "product_id": product_id,
+            "was_edited": False,
+        }
+        for review_id, product_id, score in ((1, 1, 4), (2, 2, 5))
+    ],
+}
+
+
+def write_csv_files(data_dir, rows):
+    for filename, *_ in CSV_FILES:
+        file_rows = rows.get(filename, [])
+        with open(data_dir / filename, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=file_rows[0] if file_rows else [])
+            writer.writeheader()
+            writer.writerows(file_rows)
+
+
+@pytest.mark.django_db
+def test_load_data(tmp_path):
+    write_csv_files(tmp_path, CSV_ROWS)
+    call_command("load_data", data_dir=tmp_path, batch_size=1, stdout=StringIO())
+
+    assert User.objects.get(id=1).username == "loaded_user"
+    promotion = Promotion.objects.get(id=1)
+    assert promotion.start_time.year == 2023
+    assert promotion.end_time.year == 2030
+    first_product, second_product = Product.objects.order_by("id")
+    assert list(first_product.components.values_list("id", flat=True)) == [1]
+    assert list(second_product.tags.values_list("id", flat=True)) == [1]
+    assert first_product.final_price == 90
+    assert second_product.final_price == 100
+    assert first_product.rating == 4
+    assert second_product.rating_count == 1
+    assert Review.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_load_data_twice(tmp_path):
+    write_csv_files(tmp_path, CSV_ROWS)
+    call_command("load_data", data_dir=tmp_path, stdout=StringIO())
+    Product.objects.filter(id=1).update(name="renamed")
+    call_command("load_data", data_dir=tmp_path, stdout=StringIO())
+
+    assert User.objects.count() == 1
+    assert Product.objects.count() == 2
+    first_product = Product.objects.get(id=1)
+    assert first_product.name == CSV_ROWS["products.csv"][0]["name"]
+    assert list(first_product.components.values_list("id", flat=True)) == [1]
+    assert first_product.rating_count == 1
+    assert Review.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_load_data_unknown_reference(tmp_path):
+    rows = dict(CSV_ROWS)
+    rows["products_tags.csv"] = [{"id": 1, "product_id": 3, "tag_id": 1}]
+    write_csv_files(tmp_path, rows)
+
+    with pytest.raises(CommandError, match="products_tags.csv, line 2: Product 3"):
+        call_command("load_data", data_dir=tmp_path, stdout=StringIO())
+    assert not Product.objects.exists()
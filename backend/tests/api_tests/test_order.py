@@ -1,8 +1,18 @@
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from orders.models import Order
+from orders.models import (
+    Order,
+    OrderProduct,
+    generate_order_number,
+    sync_order_number_counter,
+)
+from products.models import Product
+from task_queue.models import Task
 from tests.fixtures import ADDRESS1, FIRST_NAME, LAST_NAME, PHONE_NUMBER, USER_EMAIL
 
 
@@ -48,6 +58,7 @@ class TestOrder:
         assert order.package == 200
         assert order.comment == "After 14:00"
         assert order.add_address == "Saint-Peterburg"
+        assert Task.objects.filter(kwargs__recipient_list=[order.user.email]).exists()
 
     def test_create_order_anonimus_client(self, client, products, delivery_points):
         user_data = {
@@ -151,3 +162,99 @@ class TestOrder:
         order = Order.objects.get()
         response = client.delete(f"/api/order/{order.order_number}/", format="json")
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_create_order_query_count_does_not_depend_on_cart_size(
+        self, auth_client_first, products
+    ):
+        # The first order of the day also creates the number counter
+        generate_order_number()
+        queries_number = []
+        for cart_size in (1, len(products)):
+            order_data = {
+                "payment_method": "In getting by cash",
+                "delivery_method": "By courier",
+                "add_address": f"Saint-Peterburg {cart_size}",
+            }
+            shopping_cart_data = {
+                "products": [
+                    {"id": product.id, "quantity": 2}
+                    for product in products[:cart_size]
+                ]
+            }
+            auth_client_first.post(
+                "/api/shopping_cart/", shopping_cart_data, format="json"
+            )
+            with CaptureQueriesContext(connection) as context:
+                response = auth_client_first.post(
+                    "/api/order/", order_data, format="json"
+                )
+            assert response.status_code == status.HTTP_201_CREATED
+            assert len(response.data["products"]) == cart_size
+            queries_number.append(len(context))
+        assert queries_number[0] == queries_number[1]
+        assert Product.objects.get(pk=products[0].pk).orders_number == 2
+        assert Product.objects.get(pk=products[2].pk).orders_number == 1
+
+    def test_get_order_list_with_cursor_pagination(self, auth_client_first, products):
+        for number in range(3):
+            order_data = {
+                "payment_method": "In getting by cash",
+                "delivery_method": "By courier",
+                "add_address": f"Saint-Peterburg {number}",
+            }
+            self.create_shopping_cart_authorized(auth_client_first, products)
+            auth_client_first.post("/api/order/", order_data, format="json")
+        response = auth_client_first.get("/api/order/", {"cursor": "", "limit": 2})
+        next_response = auth_client_first.get(response.data["next"])
+        not_paginated_response = auth_client_first.get("/api/order/")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["count"] == 3
+        assert next_response.data["next"] is None
+        assert [
+            order["id"]
+            for order in response.data["results"] + next_response.data["results"]
+        ] == [order["id"] for order in not_paginated_response.data]
+        assert [order["id"] for order in not_paginated_response.data] == list(
+            Order.objects.order_by("-pk").values_list("pk", flat=True)
+        )
+
+    def test_get_order_with_sparse_fieldset(self, auth_client_first, products):
+        order_data = {
+            "payment_method": "In getting by cash",
+            "delivery_method": "By courier",
+            "add_address": "Saint-Peterburg",
+        }
+        self.create_shopping_cart_authorized(auth_client_first, products)
+        order_id = auth_client_first.post(
+            "/api/order/", order_data, format="json"
+        ).data["id"]
+        order_products = OrderProduct.objects.filter(order_id=order_id)
+        response = auth_client_first.get(
+            f"/api/order/{order_id}/", {"fields": "id,total_price,products"}
+        )
+        expanded_response = auth_client_first.get(
+            f"/api/order/{order_id}/",
+            {"fields": "id,products", "expand": "products"},
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert set(response.data) == {"id", "total_price", "products"}
+        assert sorted(response.data["products"]) == sorted(
+            order_products.values_list("product_id", flat=True)
+        )
+        assert sorted(response.data["products"]) == [products[0].id, products[1].id]
+        assert len(expanded_response.data["products"]) == order_products.count()
+        assert "product" in expanded_response.data["products"][0]
+
+
+@pytest.mark.django_db
+def test_order_numbers_are_sequential():
+    today = timezone.localdate()
+    assert generate_order_number() == f"{today}-000001"
+    assert Order().order_number == ""
+    assert Order.objects.create().order_number == f"{today}-000002"
+
+    Order.objects.create(order_number=f"{today}-000010")
+    sync_order_number_counter()
+    assert generate_order_number() == f"{today}-000011"
@@ -0,0 +1,171 @@
+import json
+from io import StringIO
+
+import pytest
+import stripe
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from rest_framework import status
+
+from api.orders_views import STRIPE_INVALID_SESSION_ID_ERROR_MESSAGE
+from orders.models import Order
+from payments.gateways import (
+    FAKE_CHECKOUT_URL,
+    PaymentGatewayAuthenticationError,
+    StripeGateway,
+)
+from payments.models import StripeEvent
+from task_queue.models import Task
+
+
+@pytest.mark.django_db
+def test_pay_order(auth_client, order):
+    response = auth_client.post(f"/api/order/{order.id}/pay/")
+
+    assert response.status_code == status.HTTP_201_CREATED
+    checkout_session_url = response.data["checkout_session_url"]
+    assert checkout_session_url.startswith(FAKE_CHECKOUT_URL)
+
+    response = auth_client.post(f"/api/order/{order.id}/pay/")
+    assert response.data["checkout_session_url"] == checkout_session_url
+
+
+@pytest.mark.django_db
+def test_successful_pay(client, order, payment_gateway):
+    session = payment_gateway.create_checkout_session(order, "success", "cancel")
+    response = client.post(
+        "/api/order/successful_pay/", {"stripe_session_id": session.id}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["order_id"] == str(order.id)
+    assert response.data["order_number"] == str(order.order_number)
+
+
+@pytest.mark.django_db
+def test_successful_pay_invalid_session(client):
+    response = client.post(
+        "/api/order/successful_pay/", {"stripe_session_id": "cs_invalid"}
+    )
+
+    assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+    assert response.data["errors"][0]["detail"] == (
+        STRIPE_INVALID_SESSION_ID_ERROR_MESSAGE
+    )
+
+
+@pytest.mark.django_db
+def test_create_checkout_session_async_view(auth_client, order):
+    response = auth_client.post(f"/create-checkout-session/{order.id}/")
+
+    assert response.status_code == status.HTTP_302_FOUND
+    assert response.url.startswith(FAKE_CHECKOUT_URL)
+
+
+def test_stripe_gateway(monkeypatch):
+    monkeypatch.setattr(stripe, "default_http_client", None)
+    monkeypatch.setattr(stripe, "max_network_retries", 0)
+    gateway = StripeGateway("sk_test", connect_timeout=1, read_timeout=2, max_retries=3)
+    requests = []
+
+    def request_with_retries(method, url, headers, post_data=None, **kwargs):
+        requests.append(headers)
+        body = {"error": {"message": "Invalid API Key provided"}}
+        return json.dumps(body), 401, {}
+
+    monkeypatch.setattr(
+        gateway.http_client, "request_with_retries", request_with_retries
+    )
+    with pytest.raises(PaymentGatewayAuthenticationError):
+        gateway.retrieve_checkout_session("cs_test")
+
+    assert requests[0]["Authorization"] == "Bearer sk_test"
+    assert gateway.http_client._timeout == (1, 2)
+    assert gateway.http_client._max_network_retries() == 3
+    assert stripe.default_http_client is None
+    assert stripe.max_network_retries == 0
+
+
+@pytest.mark.django_db
+def test_stripe_gateway_idempotency_key_follows_params(monkeypatch, order):
+    gateway = StripeGateway("sk_test", connect_timeout=1, read_timeout=2, max_retries=3)
+    idempotency_keys = []
+
+    def request_with_retries(method, url, headers, post_data=None, **kwargs):
+        idempotency_keys.append(headers["Idempotency-Key"])
+        body = {
+            "id": "cs_test",
+            "object": "checkout.session",
+            "url": "",
+            "metadata": {},
+        }
+        return json.dumps(body), 200, {}
+
+    monkeypatch.setattr(
+        gateway.http_client, "request_with_retries", request_with_retries
+    )
+    gateway.create_checkout_session(order, "success", "cancel")
+    gateway.create_checkout_session(order, "success", "cancel")
+    session = gateway.create_checkout_session(order, "success", "other-cancel")
+
+    assert session.id == "cs_test"
+    assert idempotency_keys[0] == idempotency_keys[1]
+    assert idempotency_keys[2] != idempotency_keys[0]
+
+
+def post_stripe_webhook(client):
+    return client.post(
+        "/webhooks/stripe/",
+        data="{}",
+        content_type="application/json",
+        HTTP_STRIPE_SIGNATURE="signature",
+    )
+
+
+@pytest.mark.django_db
+def test_stripe_webhook_processes_event_once(client, order, checkout_completed_event):
+    assert post_stripe_webhook(client).status_code == status.HTTP_200_OK
+    order.refresh_from_db()
+    assert order.is_paid
+    paid_order_updated_at = order.updated_at
+
+    assert post_stripe_webhook(client).status_code == status.HTTP_200_OK
+    assert StripeEvent.objects.get().event_id == checkout_completed_event["id"]
+    assert Task.objects.count() == 1
+    order.refresh_from_db()
+    assert order.updated_at == paid_order_updated_at
+
+
+@pytest.mark.django_db
+def test_stripe_webhook_event_of_paid_order(client, order, checkout_completed_event):
+    Order.objects.filter(pk=order.pk).update(is_paid=True)
+
+    assert post_stripe_webhook(client).status_code == status.HTTP_200_OK
+    assert StripeEvent.objects.exists()
+    assert not Task.objects.exists()
+
+
+@pytest.mark.django_db
+def test_stripe_webhook_unknown_order_is_not_recorded(
+    client, order, checkout_completed_event
+):
+    checkout_completed_event["data"]["object"]["metadata"]["order_id"] = "0"
+
+    assert post_stripe_webhook(client).status_code == status.HTTP_404_NOT_FOUND
+    assert not StripeEvent.objects.exists()
+
+
+@pytest.mark.django_db
+def test_replay_stripe_events(client, order, checkout_completed_event):
+    post_stripe_webhook(client)
+    Order.objects.filter(pk=order.pk).update(is_paid=False)
+
+    call_command(
+        "replay_stripe_events", checkout_completed_event["id"], stdout=StringIO()
+    )
+
+    order.refresh_from_db()
+    assert order.is_paid
+    assert StripeEvent.objects.count() == 1
+    with pytest.raises(CommandError, match="Unknown events: evt_unknown"):
+        call_command("replay_stripe_events", "evt_unknown", stdout=StringIO())
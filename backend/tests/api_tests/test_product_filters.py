@@ -1,22 +1,92 @@
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from tests.fixtures import PRODUCT_NAME_2, PRODUCT_PRICE_2, TEST_NUMBER
+from products.models import Component, FavoriteProduct, Product
+from tests.fixtures import (
+    CATEGORY_SLUG_1,
+    CATEGORY_SLUG_3,
+    COMPONENT_NAME_4,
+    PRODUCER_SLUG_1,
+    PRODUCER_SLUG_2,
+    PRODUCT_NAME_2,
+    PRODUCT_PRICE_2,
+    PRODUCT_PRICE_3,
+    PROMOTION_DISCOUNT_1,
+    PROMOTION_DISCOUNT_2,
+    TEST_NAME,
+    TEST_NUMBER,
+)
 
 
 @pytest.mark.django_db
 def test_product_name_filter(client, products):
-    filter = f"?name={products[1].name[1:4]}"
+    filter = f"?name={products[1].name[:3].lower()}"
     response = client.get(reverse("api:product-list") + filter)
 
     assert response.status_code == 200
-    # TODO: can't test Unicode case-insensitive comparisons on sqlite DB,
-    # TODO: but it works for PostgreSQL
     assert response.data["count"] == 1
     assert response.data["results"][0]["id"] == products[1].pk
     assert response.data["results"][0]["name"] == PRODUCT_NAME_2
 
 
+@pytest.mark.django_db
+def test_product_name_filter_searches_names_only(client, products):
+    products[0].components.add(Component.objects.get(name=COMPONENT_NAME_4))
+    response = client.get(reverse("api:product-list"), {"name": "воды"})
+
+    assert response.status_code == 200
+    assert [product["id"] for product in response.data["results"]] == [products[1].pk]
+
+
+@pytest.mark.django_db
+def test_product_search_filter_uses_word_forms(client, products):
+    response = client.get(reverse("api:product-list"), {"search": "батоны"})
+    prefix_response = client.get(reverse("api:product-list"), {"search": "нарезн"})
+
+    assert response.status_code == 200
+    assert [product["id"] for product in response.data["results"]] == [products[0].pk]
+    assert [product["id"] for product in prefix_response.data["results"]] == [
+        products[0].pk
+    ]
+
+
+@pytest.mark.django_db
+def test_product_search_filter_by_producer(client, products):
+    producer = products[1].producer
+    response = client.get(reverse("api:product-list"), {"search": producer.name})
+
+    assert response.status_code == 200
+    assert {product["id"] for product in response.data["results"]} == set(
+        producer.products.values_list("pk", flat=True)
+    )
+
+
+@pytest.mark.django_db
+def test_product_search_filter_ranks_name_matches_first(client, products):
+    products[0].components.add(Component.objects.get(name=COMPONENT_NAME_4))
+    response = client.get(reverse("api:product-list"), {"search": "воды"})
+    not_found_response = client.get(reverse("api:product-list"), {"search": "сыр"})
+
+    assert response.status_code == 200
+    assert [product["id"] for product in response.data["results"]] == [
+        products[1].pk,
+        products[0].pk,
+    ]
+    assert not_found_response.data["count"] == 0
+
+
+@pytest.mark.django_db
+def test_product_search_filter_keeps_most_relevant_results(client, products, settings):
+    settings.PRODUCT_SEARCH_MAX_RESULTS = 1
+    products[0].components.add(Component.objects.get(name=COMPONENT_NAME_4))
+    response = client.get(reverse("api:product-list"), {"search": "воды"})
+
+    assert response.status_code == 200
+    assert [product["id"] for product in response.data["results"]] == [products[1].pk]
+
+
 @pytest.mark.django_db
 def test_product_category_filter(client, products, categories):
     filter = f"?category={categories[1].slug}"
@@ -374,6 +444,29 @@ def test_product_is_favorited_filter(auth_client, products):
     assert response.data["results"][2]["is_favorited"] is False
 
 
+@pytest.mark.django_db
+def test_product_is_favorited_filter_query_count(auth_client, user, products):
+    url = reverse("api:product-list") + "?is_favorited=1"
+    FavoriteProduct.objects.create(user=user, product=products[0])
+    with CaptureQueriesContext(connection) as small_catalogue:
+        auth_client.get(url)
+    for number in range(TEST_NUMBER // 10):
+        product = Product.objects.create(
+            name=f"{TEST_NAME} {number}",
+            category=products[0].category,
+            subcategory=products[0].subcategory,
+            producer=products[0].producer,
+            price=PRODUCT_PRICE_2,
+        )
+        FavoriteProduct.objects.create(user=user, product=product)
+    with CaptureQueriesContext(connection) as big_catalogue:
+        response = auth_client.get(url)
+
+    assert response.status_code == 200
+    assert response.data["count"] == TEST_NUMBER // 10 + 1
+    assert len(big_catalogue) == len(small_catalogue)
+
+
 @pytest.mark.django_db
 def test_product_min_price_filter(client, products):
     filter = f"?min_price={PRODUCT_PRICE_2}"
@@ -416,3 +509,113 @@ def test_product_max_price_filter_invalid(client, products):
 
     assert response.status_code == 200
     assert response.data["count"] == 3
+
+
+@pytest.mark.django_db
+def test_product_price_filters_use_final_price(client, products, promotions):
+    products[2].promotions.set([promotions[1]])
+    final_price = PRODUCT_PRICE_3 * (1 - PROMOTION_DISCOUNT_2 / 100)
+    filter = f"?min_price={final_price}&max_price={final_price}"
+    response = client.get(reverse("api:product-list") + filter)
+
+    assert response.status_code == 200
+    assert response.data["count"] == 1
+    assert response.data["results"][0]["id"] == products[2].pk
+    assert response.data["results"][0]["final_price"] == final_price
+
+    filter = f"?min_price={PRODUCT_PRICE_3}"
+    response = client.get(reverse("api:product-list") + filter)
+
+    assert response.status_code == 200
+    assert response.data["count"] == 0
+
+
+@pytest.mark.django_db
+def test_product_final_price_follows_promotion_changes(client, products, promotions):
+    product = products[2]
+    promotion = promotions[1]
+    product.promotions.set([promotion])
+    promotion.discount = PROMOTION_DISCOUNT_1
+    promotion.save()
+    product.refresh_from_db()
+
+    assert product.final_price == PRODUCT_PRICE_3 * (1 - PROMOTION_DISCOUNT_1 / 100)
+
+    promotion.is_active = False
+    promotion.save()
+    product.refresh_from_db()
+
+    assert product.final_price == PRODUCT_PRICE_3
+
+    promotion.is_active = True
+    promotion.save()
+    product.refresh_from_db()
+
+    assert product.final_price < PRODUCT_PRICE_3
+
+    promotion.products.clear()
+    product.refresh_from_db()
+
+    assert product.final_price == PRODUCT_PRICE_3
+
+
+@pytest.mark.django_db
+def test_product_final_price_ordering(client, products, promotions):
+    product = products[1]
+    product.promotions.set([promotions[1]])
+    product.price = 10
+    product.save()
+    response = client.get(reverse("api:product-list") + "?ordering=-final_price")
+
+    assert response.status_code == 200
+    assert response.data["results"][0]["id"] == products[2].pk
+    assert response.data["results"][1]["id"] == products[0].pk
+    assert response.data["results"][2]["id"] == products[1].pk
+    assert response.data["results"][2]["final_price"] == 10 * (
+        1 - PROMOTION_DISCOUNT_2 / 100
+    )
+
+
+@pytest.mark.django_db
+def test_product_facets(client, products):
+    response = client.get(reverse("api:product-facets"), {"producer": PRODUCER_SLUG_2})
+
+    assert response.status_code == 200
+    assert {value["slug"]: value["count"] for value in response.data["producer"]} == {
+        PRODUCER_SLUG_1: 1,
+        PRODUCER_SLUG_2: 2,
+    }
+    assert {value["slug"] for value in response.data["category"]} == {
+        CATEGORY_SLUG_1,
+        CATEGORY_SLUG_3,
+    }
+    assert response.data["tags"] == []
+    assert response.data["price"] == {
+        "min": min(PRODUCT_PRICE_2, PRODUCT_PRICE_3),
+        "max": max(PRODUCT_PRICE_2, PRODUCT_PRICE_3),
+    }
+
+
+@pytest.mark.django_db
+def test_product_facets_query_count(client, products):
+    client.get(reverse("api:product-facets"))
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(
+            reverse("api:product-facets"), {"producer": PRODUCER_SLUG_1}
+        )
+    with CaptureQueriesContext(connection) as cached_queries:
+        cached_response = client.get(
+            reverse("api:product-facets"), {"producer": PRODUCER_SLUG_1}
+        )
+
+    assert response.status_code == 200
+    assert len(queries) == 2
+    assert len(cached_queries) == 1
+    assert cached_response.data == response.data
+
+
+@pytest.mark.django_db
+def test_product_facets_invalid_filter(client, products):
+    response = client.get(reverse("api:product-facets"), {"producer": TEST_NAME})
+
+    assert response.status_code == 400
@@ -1,9 +1,18 @@
+from unittest import mock
+
 import pytest
+from django.db import DatabaseError, connection
+from django.db.models import F, QuerySet
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from api.mixins import MESSAGE_ON_DELETE
+from core.models import CacheVersion
 from products.models import Product, ProductPromotion
+from products.suggestions import SuggestionIndex, suggestion_index
+from reviews.models import Review
 from tests.fixtures import (
+    CATEGORY_NAME_3,
     PRODUCT_AMOUNT_1,
     PRODUCT_NAME_1,
     PRODUCT_PRICE_1,
@@ -14,6 +23,7 @@ from tests.fixtures import (
 
 
 @pytest.mark.django_db
+@pytest.mark.query_budget(12, max_duplicates=0)
 def test_get_product_list(client, products):
     response = client.get(reverse("api:product-list"))
 
@@ -53,6 +63,7 @@ def test_get_product_list(client, products):
 
 
 @pytest.mark.django_db
+@pytest.mark.query_budget(11, max_duplicates=0)
 def test_get_product_by_id(client, products):
     response = client.get(reverse("api:product-detail", kwargs={"pk": products[0].pk}))
 
@@ -83,6 +94,49 @@ def test_get_product_by_id(client, products):
     assert response.data["orders_number"] == 0
 
 
+@pytest.mark.django_db
+def test_product_views_are_saved_in_bulk(client, products, product_views):
+    url = reverse("api:product-detail", kwargs={"pk": products[0].pk})
+    client.get(url)
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert response.data["views_number"] == 2
+    assert Product.objects.get(pk=products[0].pk).views_number == 0
+
+    product_views.flush()
+    response = client.get(url)
+
+    assert Product.objects.get(pk=products[0].pk).views_number == 2
+    assert response.data["views_number"] == 3
+
+
+@pytest.mark.django_db
+def test_product_views_are_kept_if_saving_fails(client, products, product_views):
+    product_views.add(products[0].pk)
+    product_views.add(products[1].pk)
+    product_views.add(products[1].pk)
+    update = QuerySet.update
+    calls = []
+
+    def update_once(queryset, **kwargs):
+        calls.append(kwargs)
+        if len(calls) > 1:
+            raise DatabaseError("Failed")
+        return update(queryset, **kwargs)
+
+    with mock.patch.object(QuerySet, "update", update_once):
+        product_views.flush()
+
+    assert len(calls) == 2
+    assert list(Product.objects.values_list("views_number", flat=True)) == [0, 0, 0]
+
+    product_views.flush()
+
+    assert Product.objects.get(pk=products[0].pk).views_number == 1
+    assert Product.objects.get(pk=products[1].pk).views_number == 2
+
+
 @pytest.mark.django_db
 def test_create_product(auth_admin, subcategories, producers, components):
     payload = {
@@ -865,3 +919,316 @@ def test_delete_product_fail_if_not_authenticated(client, products):
     assert response.status_code == 401
     assert response.data["type"] == "client_error"
     assert response.data["errors"][0]["code"] == "not_authenticated"
+
+
+@pytest.mark.django_db
+def test_get_product_list_is_cached_for_anonymous_user(client, products):
+    response = client.get(reverse("api:product-list"))
+    with CaptureQueriesContext(connection) as context:
+        cached_response = client.get(reverse("api:product-list"))
+
+    assert cached_response.status_code == 200
+    assert len(context) == 1
+    assert "core_cacheversion" in context.captured_queries[0]["sql"]
+    assert cached_response.data == response.data
+    assert cached_response["ETag"] == response["ETag"]
+
+
+@pytest.mark.django_db
+def test_cached_product_list_is_invalidated_after_change(client, products):
+    client.get(reverse("api:product-list"))
+    product = products[0]
+    product.name = TEST_NAME
+    product.save()
+    response = client.get(reverse("api:product-list"))
+
+    assert response.status_code == 200
+    assert response.data["results"][0]["name"] == TEST_NAME
+
+
+@pytest.mark.django_db
+def test_cached_product_list_is_invalidated_by_other_process(client, products):
+    response = client.get(reverse("api:product-list"))
+    CacheVersion.objects.filter(group="products").update(version=F("version") + 1)
+    modified_response = client.get(
+        reverse("api:product-list"), HTTP_IF_NONE_MATCH=response["ETag"]
+    )
+
+    assert modified_response.status_code == 200
+    assert modified_response["ETag"] != response["ETag"]
+    assert modified_response["Last-Modified"] != response["Last-Modified"]
+
+
+@pytest.mark.django_db
+def test_cached_product_list_is_invalidated_by_rating_change(client, products, user):
+    def get_products_version():
+        return CacheVersion.objects.get(group="products").version
+
+    client.get(reverse("api:product-list"))
+    version = get_products_version()
+    review = Review.objects.create(product=products[0], author=user, score=4)
+    assert get_products_version() > version
+
+    version = get_products_version()
+    review.text = TEST_NAME
+    review.save()
+    assert get_products_version() == version
+
+    review.score = 5
+    review.save()
+    assert get_products_version() > version
+    response = client.get(reverse("api:product-list"))
+    assert response.data["results"][0]["rating"] == 5
+
+
+@pytest.mark.django_db
+def test_get_product_list_not_modified(client, products, promotions):
+    response = client.get(reverse("api:product-list"))
+    not_modified_response = client.get(
+        reverse("api:product-list"), HTTP_IF_NONE_MATCH=response["ETag"]
+    )
+    ProductPromotion.objects.create(product=products[0], promotion=promotions[0])
+    modified_response = client.get(
+        reverse("api:product-list"), HTTP_IF_NONE_MATCH=response["ETag"]
+    )
+
+    assert not_modified_response.status_code == 304
+    assert not_modified_response["ETag"] == response["ETag"]
+    assert modified_response.status_code == 200
+    assert modified_response["ETag"] != response["ETag"]
+
+
+@pytest.mark.django_db
+def test_get_product_list_is_not_cached_for_authorized_user(auth_client, products):
+    response = auth_client.get(reverse("api:product-list"))
+
+    assert response.status_code == 200
+    assert not response.has_header("ETag")
+
+
+@pytest.mark.django_db
+def test_product_rating_follows_reviews(client, products, user, user2):
+    product = products[0]
+    Review.objects.create(product=product, author=user, score=5)
+    review = Review.objects.create(product=product, author=user2, score=2)
+    product.refresh_from_db()
+    assert (product.rating_sum, product.rating_count, product.rating) == (7, 2, 3.5)
+
+    review = Review.objects.get(pk=review.pk)
+    review.score = 3
+    review.save()
+    product.refresh_from_db()
+    assert (product.rating_sum, product.rating_count, product.rating) == (8, 2, 4.0)
+
+    Review.objects.filter(author=user).delete()
+    review.delete()
+    product.refresh_from_db()
+    assert (product.rating_sum, product.rating_count, product.rating) == (0, 0, None)
+
+
+@pytest.mark.django_db
+def test_product_rating_follows_review_moved_to_other_product(
+    client, products, user, user2
+):
+    old_product, new_product = products[0], products[1]
+    Review.objects.create(product=old_product, author=user, score=5)
+    Review.objects.create(product=new_product, author=user, score=4)
+    review = Review.objects.create(product=old_product, author=user2, score=2)
+
+    review = Review.objects.get(pk=review.pk)
+    review.product = new_product
+    review.score = 3
+    review.save()
+    old_product.refresh_from_db()
+    new_product.refresh_from_db()
+    assert (old_product.rating_sum, old_product.rating_count) == (5, 1)
+    assert (new_product.rating_sum, new_product.rating_count) == (7, 2)
+    assert new_product.rating == 3.5
+
+
+@pytest.mark.django_db
+def test_get_product_list_ordered_by_rating(client, products, user):
+    Review.objects.create(product=products[1], author=user, score=4)
+    Review.objects.create(product=products[2], author=user, score=5)
+    response = client.get(reverse("api:product-list"), {"ordering": "rating"})
+
+    assert response.status_code == 200
+    ratings = [product["rating"] for product in response.data["results"]]
+    assert [rating for rating in ratings if rating is not None] == [4.0, 5.0]
+
+
+@pytest.mark.django_db
+def test_get_product_list_with_cursor_pagination(client, products):
+    expected_ids = sorted(
+        (product.final_price, product.id) for product in Product.objects.all()
+    )
+    response = client.get(
+        reverse("api:product-list"),
+        {"cursor": "", "limit": 2, "ordering": "final_price"},
+    )
+    next_response = client.get(response.data["next"])
+
+    assert response.status_code == 200
+    assert response.data["count"] == 3
+    assert response.data["previous"] is None
+    assert next_response.data["next"] is None
+    assert [
+        product["id"]
+        for product in response.data["results"] + next_response.data["results"]
+    ] == [product_id for _, product_id in expected_ids]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "ordering",
+    [
+        "rating",
+        "-rating",
+        "final_price",
+        "-final_price",
+        "views_number",
+        "-orders_number",
+        "-creation_time",
+        "producer",
+        "-id",
+        None,
+    ],
+)
+def test_cursor_pagination_walks_all_products(client, products, user, ordering):
+    Review.objects.create(product=products[1], author=user, score=4)
+    Product.objects.filter(pk=products[2].pk).update(price=products[0].price)
+    Product.objects.filter(pk=products[2].pk).update(
+        final_price=products[0].final_price
+    )
+    params = {"cursor": "", "limit": 1}
+    if ordering is not None:
+        params["ordering"] = ordering
+    response = client.get(reverse("api:product-list"), params)
+    pages = [response.data]
+    while pages[-1]["next"] is not None and len(pages) <= len(products):
+        pages.append(client.get(pages[-1]["next"]).data)
+    ids = [product["id"] for page in pages for product in page["results"]]
+    previous_pages = [pages[-1]]
+    while previous_pages[-1]["previous"] is not None and len(previous_pages) <= len(
+        products
+    ):
+        previous_pages.append(client.get(previous_pages[-1]["previous"]).data)
+    previous_ids = [
+        product["id"] for page in previous_pages[:0:-1] for product in page["results"]
+    ]
+
+    assert response.status_code == 200
+    assert sorted(ids) == sorted(product.id for product in products)
+    assert previous_ids == ids[:-1]
+
+
+@pytest.mark.django_db
+def test_cursor_pagination_by_many_to_many_field(client, products):
+    response = client.get(
+        reverse("api:product-list"), {"cursor": "", "ordering": "components"}
+    )
+
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_suggest_by_prefix(client, products, categories):
+    response = client.get(reverse("api:product-suggest"), {"q": "бат"})
+
+    assert response.status_code == 200
+    assert [(s["type"], s["name"]) for s in response.data] == [
+        ("product", PRODUCT_NAME_1)
+    ]
+
+
+@pytest.mark.django_db
+def test_suggest_misspelled_words(client, products, categories):
+    response = client.get(reverse("api:product-suggest"), {"q": "напитке"})
+
+    assert response.status_code == 200
+    assert [(s["type"], s["name"]) for s in response.data] == [
+        ("category", CATEGORY_NAME_3)
+    ]
+
+
+@pytest.mark.django_db
+def test_suggest_follows_changes(client, products, tags):
+    tag = tags.get(name__endswith="меню")
+    client.get(reverse("api:product-suggest"), {"q": "меню"})
+    tag.name = TEST_NAME
+    tag.save()
+    Product.objects.filter(name=PRODUCT_NAME_1).delete()
+
+    assert client.get(reverse("api:product-suggest"), {"q": "меню"}).data == []
+    assert client.get(reverse("api:product-suggest"), {"q": "бат"}).data == []
+    response = client.get(reverse("api:product-suggest"), {"q": TEST_NAME})
+    assert [(s["type"], s["id"]) for s in response.data] == [("tag", tag.id)]
+
+
+@pytest.mark.django_db
+def test_suggest_keeps_changes_made_during_rebuild(client, products, tags, monkeypatch):
+    tag = tags.get(name__endswith="меню")
+    client.get(reverse("api:product-suggest"), {"q": "меню"})
+    load = SuggestionIndex.load
+
+    def load_and_rename_tag(index):
+        load(index)
+        tag.name = TEST_NAME
+        tag.save()
+
+    monkeypatch.setattr(SuggestionIndex, "load", load_and_rename_tag)
+    suggestion_index.build()
+
+    assert client.get(reverse("api:product-suggest"), {"q": "меню"}).data == []
+    response = client.get(reverse("api:product-suggest"), {"q": TEST_NAME})
+    assert [(s["type"], s["id"]) for s in response.data] == [("tag", tag.id)]
+
+
+@pytest.mark.django_db
+def test_suggest_limit(client, products):
+    response = client.get(reverse("api:product-suggest"), {"q": "о", "limit": 1})
+
+    assert response.status_code == 200
+    assert len(response.data) == 1
+
+
+@pytest.mark.django_db
+def test_get_product_list_with_sparse_fieldset(auth_client, products):
+    with CaptureQueriesContext(connection) as queries:
+        response = auth_client.get(
+            reverse("api:product-list"),
+            {"fields": "id,name,final_price,is_favorited,category"},
+        )
+    expanded_response = auth_client.get(
+        reverse("api:product-list"),
+        {"fields": "id,category", "expand": "category"},
+    )
+
+    assert response.status_code == 200
+    product = response.data["results"][0]
+    assert set(product) == {"id", "name", "final_price", "is_favorited", "category"}
+    assert product["category"] == products.get(pk=product["id"]).category_id
+    assert not any(
+        "JOIN" in query["sql"] or "products_tag" in query["sql"]
+        for query in queries.captured_queries
+    )
+    assert set(expanded_response.data["results"][0]["category"]) == {
+        "category_name",
+        "category_slug",
+    }
+
+
+@pytest.mark.django_db
+def test_get_category_list_with_sparse_fieldset(client, products):
+    response = client.get(
+        reverse("api:category-list"), {"fields": "id,name,top_products"}
+    )
+
+    assert response.status_code == 200
+    for category in response.data:
+        assert set(category) == {"id", "name", "top_products"}
+        assert category["top_products"] == list(
+            Product.objects.filter(category_id=category["id"]).values_list(
+                "pk", flat=True
+            )
+        )
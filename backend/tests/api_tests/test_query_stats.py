@@ -0,0 +1,43 @@
+import pytest
+from django.urls import reverse
+
+from core.middleware import get_fingerprint, query_stats_recorded
+from tests.query_budget import QueryBudget
+
+
+def test_query_fingerprint_ignores_parameters():
+    assert get_fingerprint(
+        'SELECT * FROM "product" WHERE "id" IN (%s, %s) LIMIT 21'
+    ) == get_fingerprint('SELECT * FROM "product" WHERE "id" IN (%s, %s, %s) LIMIT 1')
+    assert get_fingerprint('SELECT * FROM "product"') != get_fingerprint(
+        'SELECT * FROM "tag"'
+    )
+
+
+@pytest.mark.django_db
+def test_query_stats_headers(client, settings, products):
+    settings.QUERY_STATS_HEADERS = True
+    response = client.get(reverse("api:product-detail", kwargs={"pk": products[0].pk}))
+
+    assert response.status_code == 200
+    assert int(response["X-DB-Query-Count"]) > 0
+    assert response["X-DB-Duplicate-Queries"] == "0"
+    assert float(response["X-DB-Time-Ms"]) >= 0
+
+
+@pytest.mark.django_db
+def test_query_stats_headers_are_off_by_default(client, products):
+    response = client.get(reverse("api:product-list"))
+
+    assert not response.has_header("X-DB-Query-Count")
+
+
+@pytest.mark.django_db
+def test_query_budget_exceeded(client, products):
+    budget = QueryBudget(1)
+    query_stats_recorded.connect(budget.check)
+    try:
+        with pytest.raises(AssertionError, match="the budget is 1"):
+            client.get(reverse("api:product-list"))
+    finally:
+        query_stats_recorded.disconnect(budget.check)
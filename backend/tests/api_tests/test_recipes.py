@@ -0,0 +1,55 @@
+import pytest
+
+from recipes.models import ProductsInRecipe
+
+
+@pytest.mark.django_db
+@pytest.mark.query_budget(3, max_duplicates=0)
+def test_get_recipe_list(client, recipes):
+    sandwich, bread_with_water = recipes
+    response = client.get("/api/recipes/")
+
+    assert response.status_code == 200
+    recipes_data = {recipe["id"]: recipe for recipe in response.data}
+    assert len(recipes_data) == 2
+    assert recipes_data[sandwich.id]["total_ingredients"] == 2
+    assert recipes_data[sandwich.id]["proteins"] == 5
+    assert recipes_data[sandwich.id]["fats"] == 1.5
+    assert recipes_data[sandwich.id]["carbohydrates"] == 28
+    assert recipes_data[sandwich.id]["kcal"] == 146
+    assert recipes_data[bread_with_water.id]["kcal"] == 259
+
+
+@pytest.mark.django_db
+def test_recipe_nutrition_is_updated(products, recipes):
+    sandwich = recipes.first()
+    bread, water, cucumbers = products
+    assert sandwich.proteins == 5
+
+    cucumbers.proteins = 3
+    cucumbers.save()
+    sandwich.refresh_from_db()
+    assert sandwich.proteins == 7
+
+    ProductsInRecipe.objects.get(recipe=sandwich, ingredient=bread).delete()
+    sandwich.refresh_from_db()
+    assert sandwich.total_ingredients == 1
+    assert sandwich.proteins == 3
+    assert sandwich.kcal == 3 * 4 + 3 * 4
+
+
+@pytest.mark.django_db
+def test_filter_and_order_recipes_by_nutrition(client, recipes):
+    sandwich, bread_with_water = recipes
+
+    response = client.get("/api/recipes/", {"min_kcal": 200})
+    assert [recipe["id"] for recipe in response.data] == [bread_with_water.id]
+
+    response = client.get("/api/recipes/", {"max_proteins": 6})
+    assert [recipe["id"] for recipe in response.data] == [sandwich.id]
+
+    response = client.get("/api/recipes/", {"ordering": "-kcal"})
+    assert [recipe["id"] for recipe in response.data] == [
+        bread_with_water.id,
+        sandwich.id,
+    ]
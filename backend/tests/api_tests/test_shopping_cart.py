@@ -1,9 +1,18 @@
+from unittest import mock
+
 import pytest
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 
+from api.orders_serializers import PRODUCT_ERROR_MESSAGE
+from orders.cart_storages import CacheCartStorage
+
 
 @pytest.mark.django_db(transaction=True)
 class TestShoppingCart:
+    @pytest.mark.query_budget(8)
     def test_create_shopping_cart_auth_client(self, auth_client, products):
         shopping_cart_data = {
             "products": [
@@ -150,3 +159,130 @@ class TestShoppingCart:
         endpoint = "/api/shopping_cart/remove_all"
         response = auth_client.delete(endpoint, format="json")
         assert "products" not in response
+
+    def test_shopping_cart_item_is_saved_separately(
+        self, client, products, shopping_carts_cache, cache_cart_storage
+    ):
+        shopping_cart_data = {
+            "products": [
+                {"id": products[0].id, "quantity": 1},
+                {"id": products[1].id, "quantity": 3},
+            ]
+        }
+        client.post("/api/shopping_cart/", shopping_cart_data, format="json")
+        cart_id = client.session[settings.SHOPPING_CART_SESSION_ID]
+        item_key = f"shopping_cart:{cart_id}:{products[0].id}"
+        updated_shopping_cart_data = {
+            "products": [{"id": products[0].id, "quantity": 5}]
+        }
+        with mock.patch.object(
+            shopping_carts_cache, "set", wraps=shopping_carts_cache.set
+        ) as cache_set:
+            response = client.post(
+                "/api/shopping_cart/", updated_shopping_cart_data, format="json"
+            )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert [call.args[0] for call in cache_set.call_args_list] == [item_key]
+        assert shopping_carts_cache.get(item_key)["quantity"] == 5
+        data = client.get("/api/shopping_cart/").json()
+        assert data["count_of_products"] == 8
+
+    def test_concurrent_shopping_cart_items_are_kept(
+        self, client, products, cache_cart_storage
+    ):
+        client.post(
+            "/api/shopping_cart/",
+            {"products": [{"id": products[0].id, "quantity": 1}]},
+            format="json",
+        )
+        request = mock.Mock(session=client.session)
+        first_storage = CacheCartStorage(request)
+        second_storage = CacheCartStorage(request)
+        first_items = first_storage.load()
+        second_items = second_storage.load()
+        first_items[str(products[1].id)] = {"quantity": 2}
+        second_items[str(products[2].id)] = {"quantity": 3}
+        first_storage.save_item(first_items, str(products[1].id))
+        second_storage.save_item(second_items, str(products[2].id))
+        assert set(CacheCartStorage(request).load()) == {
+            str(product.id) for product in products
+        }
+        second_storage.delete_item(second_items, str(products[0].id))
+        assert set(CacheCartStorage(request).load()) == {
+            str(products[1].id),
+            str(products[2].id),
+        }
+
+    def test_shopping_cart_slot_is_reused_on_adding_again(
+        self, client, products, shopping_carts_cache, cache_cart_storage
+    ):
+        shopping_cart_data = {"products": [{"id": products[0].id, "quantity": 1}]}
+        client.post("/api/shopping_cart/", shopping_cart_data, format="json")
+        cart_key = f"shopping_cart:{client.session[settings.SHOPPING_CART_SESSION_ID]}"
+        for _ in range(3):
+            response = client.delete(f"/api/shopping_cart/{products[0].id}/")
+            assert response.status_code == status.HTTP_200_OK
+            assert client.get("/api/shopping_cart/").json()["count_of_products"] == 0
+            client.post("/api/shopping_cart/", shopping_cart_data, format="json")
+        assert shopping_carts_cache.get(cart_key) == 1
+        data = client.get("/api/shopping_cart/").json()
+        assert data["count_of_products"] == 1
+
+    def test_session_shopping_cart_is_moved_to_cache(
+        self, client, products, cache_cart_storage
+    ):
+        session = client.session
+        session[settings.SHOPPING_CART_SESSION_ID] = {
+            str(products[0].id): {
+                "id": products[0].id,
+                "name": products[0].name,
+                "photo": "",
+                "category": products[0].category.slug,
+                "quantity": 2,
+                "final_price": products[0].final_price,
+                "created_at": "2023-11-26T10:27:08",
+                "amount": products[0].amount,
+                "measure_unit": products[0].measure_unit,
+            }
+        }
+        session.save()
+        response = client.get("/api/shopping_cart/")
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert len(data["products"]) == 1
+        assert data["count_of_products"] == 2
+        assert isinstance(client.session[settings.SHOPPING_CART_SESSION_ID], str)
+        data = client.get("/api/shopping_cart/").json()
+        assert data["count_of_products"] == 2
+
+    def test_add_unknown_product_to_shopping_cart(self, client, products):
+        shopping_cart_data = {
+            "products": [
+                {"id": products[0].id, "quantity": 1},
+                {"id": 10**6, "quantity": 1},
+            ]
+        }
+        response = client.post("/api/shopping_cart/", shopping_cart_data, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data["errors"][0]["detail"] == PRODUCT_ERROR_MESSAGE
+        assert client.get("/api/shopping_cart/").json()["count_of_products"] == 0
+
+    def test_add_product_to_shopping_cart_query_count(self, client, products):
+        queries_number = []
+        for cart_size in (1, 3):
+            shopping_cart_data = {
+                "products": [
+                    {"id": product.id, "quantity": 1}
+                    for product in products[:cart_size]
+                ]
+            }
+            client.cookies.clear()
+            with CaptureQueriesContext(connection) as context:
+                response = client.post(
+                    "/api/shopping_cart/", shopping_cart_data, format="json"
+                )
+            assert response.status_code == status.HTTP_201_CREATED
+            assert response.json()["products"][0]["category"]
+            queries_number.append(len(context))
+        # the products are validated and fetched with their categories in bulk
+        assert queries_number[0] == queries_number[1]
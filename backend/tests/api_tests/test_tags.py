@@ -31,6 +31,24 @@ def test_get_tag_by_id(client, tags):
     assert response.data["slug"] == TAG_SLUG_1
 
 
+@pytest.mark.django_db
+def test_get_tag_list_top_products(client, settings, tags, products):
+    settings.TOP_PRODUCTS_NUMBER = 1
+    for orders_number, product in enumerate(products):
+        product.orders_number = orders_number
+        product.save()
+    products[0].tags.set(tags)
+    products[1].tags.set(tags)
+    products[2].tags.set(tags[:1])
+    response = client.get(reverse("api:tag-list"))
+
+    assert response.status_code == 200
+    assert len(response.data[0]["top_products"]) == 1
+    assert response.data[0]["top_products"][0]["id"] == products[2].pk
+    assert len(response.data[1]["top_products"]) == 1
+    assert response.data[1]["top_products"][0]["id"] == products[1].pk
+
+
 @pytest.mark.django_db
 def test_create_tag(auth_admin):
     payload = {"name": TEST_NAME}
@@ -39,6 +57,7 @@ def test_create_tag(auth_admin):
     assert response.status_code == 201
     assert response.data["name"] == TEST_NAME
     assert response.data["slug"] == TEST_SLUG
+    assert response.data["top_products"] == []
 
 
 @pytest.mark.django_db
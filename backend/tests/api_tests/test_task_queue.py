@@ -0,0 +1,105 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core import mail
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework import status
+
+from core.tasks import send_email
+from task_queue.models import DeadTask, Task
+from task_queue.queue import claim_task, run_due_tasks, run_task, task
+
+
+@task(max_retries=1)
+def failing_task(message):
+    raise ValueError(message)
+
+
+@pytest.mark.django_db
+def test_send_email_task():
+    send_email.delay("Subject", "Message", ["test@good_food.fake"])
+    assert not mail.outbox
+
+    call_command("run_tasks", once=True, stdout=StringIO())
+
+    assert len(mail.outbox) == 1
+    assert mail.outbox[0].to == ["test@good_food.fake"]
+    assert not Task.objects.exists()
+
+
+@pytest.mark.django_db
+def test_failed_task_is_retried_and_buried():
+    failing_task.delay("SMTP is down")
+
+    assert run_due_tasks() == 1
+    queued_task = Task.objects.get()
+    assert queued_task.attempts == 1
+    assert "SMTP is down" in queued_task.last_error
+    assert queued_task.run_at > timezone.now()
+    assert run_due_tasks() == 0
+
+    Task.objects.update(run_at=timezone.now())
+    assert run_due_tasks() == 1
+    assert not Task.objects.exists()
+    dead_task = DeadTask.objects.get()
+    assert dead_task.name.endswith("failing_task")
+    assert dead_task.args == ["SMTP is down"]
+    assert dead_task.attempts == 2
+
+
+@pytest.mark.django_db
+def test_locked_task_is_not_claimed():
+    queued_task = send_email.delay("Subject", "Message", ["test@good_food.fake"])
+    assert claim_task() == queued_task
+    assert claim_task() is None
+
+    Task.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+    assert claim_task() == queued_task
+
+
+@pytest.mark.django_db
+def test_task_stopping_worker_is_buried():
+    failing_task.delay("Out of memory")
+    expired = timezone.now() - timedelta(seconds=1)
+    for attempts in (1, 2):
+        # The worker dies after claiming the task
+        assert claim_task().attempts == attempts
+        Task.objects.update(locked_until=expired)
+
+    assert not run_task(claim_task())
+    assert not Task.objects.exists()
+    assert DeadTask.objects.get().attempts == 2
+
+
+@pytest.mark.django_db
+def test_stripe_webhook_queues_email(client, order, checkout_completed_event):
+    response = client.post(
+        "/webhooks/stripe/",
+        data="{}",
+        content_type="application/json",
+        HTTP_STRIPE_SIGNATURE="signature",
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    order.refresh_from_db()
+    assert order.is_paid
+    assert not mail.outbox
+    run_due_tasks()
+    assert mail.outbox[0].to == ["customer@good_food.fake"]
+
+
+@pytest.mark.django_db
+def test_password_reset_email_is_queued(client, user, settings):
+    settings.DJOSER = {
+        **settings.DJOSER,
+        "PASSWORD_RESET_CONFIRM_URL": "password/reset/{uid}/{token}",
+    }
+    response = client.post("/api/users/reset_password/", {"email": user.email})
+
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert not mail.outbox
+    run_due_tasks()
+    assert mail.outbox[0].to == [user.email]
+    assert "password" in mail.outbox[0].body.lower()
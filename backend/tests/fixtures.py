@@ -1,8 +1,11 @@
 import pytest
+import stripe
+from django.core.cache import cache, caches
 from rest_framework.test import APIClient
 
 import users
-from orders.models import Delivery, ShoppingCart
+from orders.models import Delivery, Order, ShoppingCart
+from payments.gateways import get_payment_gateway
 from products.models import (
     Category,
     Component,
@@ -13,6 +16,10 @@ from products.models import (
     Subcategory,
     Tag,
 )
+from products.search import product_search_index
+from products.suggestions import suggestion_index
+from products.views_counter import product_views_buffer
+from recipes.models import ProductsInRecipe, Recipe
 from users.models import Address, User
 
 TEST_NAME = "Test"
@@ -112,6 +119,46 @@ PRODUCT_AMOUNT_1 = 300
 PRODUCT_AMOUNT_2 = 500
 PRODUCT_AMOUNT_3 = 2
 
+RECIPE_NAME_1 = "Бутерброд с огурцом"
+RECIPE_NAME_2 = "Хлеб с водой"
+
+
+@pytest.fixture(autouse=True)
+def product_views(settings):
+    """Disables background saving of product views and clears the buffer."""
+    settings.PRODUCT_VIEWS_FLUSH_INTERVAL = 0
+    yield product_views_buffer
+    product_views_buffer.clear()
+
+
+@pytest.fixture
+def cache_cart_storage(settings):
+    """Keeps shopping carts in the cache instead of the session."""
+    settings.SHOPPING_CART_STORAGE = "orders.cart_storages.CacheCartStorage"
+
+
+@pytest.fixture(autouse=True)
+def shopping_carts_cache(settings):
+    """Clears the cache of shopping carts after the test."""
+    yield caches[settings.SHOPPING_CART_CACHE]
+    caches[settings.SHOPPING_CART_CACHE].clear()
+
+
+@pytest.fixture(autouse=True)
+def response_cache():
+    """Clears the cached responses and the search indexes after the test."""
+    yield cache
+    cache.clear()
+    product_search_index.clear()
+    suggestion_index.clear()
+
+
+@pytest.fixture(autouse=True)
+def payment_gateway(settings):
+    """Replaces Stripe with the in-memory payment gateway."""
+    settings.PAYMENT_GATEWAY = "fake"
+    return get_payment_gateway()
+
 
 @pytest.fixture
 def admin(django_user_model):
@@ -278,6 +325,30 @@ def products(subcategories, components, producers):
     return Product.objects.all()
 
 
+@pytest.fixture
+def recipes(user, products):
+    bread, water, cucumbers = products
+    bread.proteins, bread.fats, bread.carbohydrates = 8, 3, 50
+    bread.save()
+    cucumbers.proteins, cucumbers.fats, cucumbers.carbohydrates = 1, 0, 3
+    cucumbers.save()
+    sandwich = Recipe.objects.create(
+        author=user, name=RECIPE_NAME_1, text=TEST_TEXT, cooking_time=5
+    )
+    ProductsInRecipe.objects.create(recipe=sandwich, ingredient=bread, amount=50)
+    ProductsInRecipe.objects.create(recipe=sandwich, ingredient=cucumbers, amount=100)
+    bread_with_water = Recipe.objects.create(
+        author=user, name=RECIPE_NAME_2, text=TEST_TEXT, cooking_time=1
+    )
+    ProductsInRecipe.objects.create(
+        recipe=bread_with_water, ingredient=bread, amount=100
+    )
+    ProductsInRecipe.objects.create(
+        recipe=bread_with_water, ingredient=water, amount=500
+    )
+    return Recipe.objects.order_by("pk")
+
+
 @pytest.fixture
 def favorites(user, products):
     FavoriteProduct.objects.create(user=user, product=products[0])
@@ -309,6 +380,36 @@ def tasks_db(tasks_db_session):
     users.delete_all()
 
 
+@pytest.fixture
+def order(user):
+    return Order.objects.create(
+        user=user, order_number=TEST_NUMBER, total_price=PRODUCT_PRICE_1
+    )
+
+
+@pytest.fixture
+def checkout_completed_event(order, monkeypatch):
+    """
+    Returns the event of the paid order, the webhook receives it
+    without the signature check.
+    """
+    event = {
+        "id": "evt_test",
+        "type": "checkout.session.completed",
+        "data": {
+            "object": {
+                "metadata": {"order_id": str(order.id)},
+                "customer_email": None,
+                "customer_details": {"email": "customer@good_food.fake"},
+            }
+        },
+    }
+    monkeypatch.setattr(
+        stripe.Webhook, "construct_event", lambda *args, **kwargs: event
+    )
+    return event
+
+
 @pytest.fixture
 def address(user):
     return Address.objects.create(address="Saint-Petersburg", user=user)
@@ -0,0 +1,44 @@
+import pytest
+
+from core.middleware import query_stats_recorded
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "query_budget(max_queries, max_duplicates=None): fail the test if any "
+        "request it makes runs more SQL queries or duplicate queries",
+    )
+
+
+class QueryBudget(object):
+    """Checks SQL query stats of every request against the budget."""
+
+    def __init__(self, max_queries, max_duplicates=None):
+        self.max_queries = max_queries
+        self.max_duplicates = max_duplicates
+
+    def check(self, sender, request, stats, **kwargs):
+        endpoint = f"{request.method} {request.get_full_path()}"
+        assert stats.count <= self.max_queries, (
+            f"{endpoint} ran {stats.count} SQL queries, "
+            f"the budget is {self.max_queries}"
+        )
+        if self.max_duplicates is not None:
+            assert stats.duplicates <= self.max_duplicates, (
+                f"{endpoint} ran {stats.duplicates} duplicate SQL queries, "
+                f"the budget is {self.max_duplicates}"
+            )
+
+
+@pytest.fixture(autouse=True)
+def query_budget(request):
+    """Applies the query_budget marker to the requests of the test."""
+    marker = request.node.get_closest_marker("query_budget")
+    if marker is None:
+        yield None
+        return
+    budget = QueryBudget(*marker.args, **marker.kwargs)
+    query_stats_recorded.connect(budget.check)
+    yield budget
+    query_stats_recorded.disconnect(budget.check)
@@ -0,0 +1,49 @@
+from django.utils.html import strip_tags
+from djoser import email
+
+from core.tasks import send_email
+
+
+class QueuedEmailMixin:
+    """Renders the djoser email in the request and queues its sending."""
+
+    def send(self, to, *args, **kwargs):
+        self.render()
+        message = self.body
+        if self.html and message == self.html:
+            message = strip_tags(self.html)
+        send_email.delay(
+            subject=self.subject,
+            message=message,
+            recipient_list=list(to),
+            from_email=kwargs.get("from_email"),
+            html_message=self.html,
+        )
+
+
+class ActivationEmail(QueuedEmailMixin, email.ActivationEmail):
+    pass
+
+
+class ConfirmationEmail(QueuedEmailMixin, email.ConfirmationEmail):
+    pass
+
+
+class PasswordResetEmail(QueuedEmailMixin, email.PasswordResetEmail):
+    pass
+
+
+class PasswordChangedConfirmationEmail(
+    QueuedEmailMixin, email.PasswordChangedConfirmationEmail
+):
+    pass
+
+
+class UsernameChangedConfirmationEmail(
+    QueuedEmailMixin, email.UsernameChangedConfirmationEmail
+):
+    pass
+
+
+class UsernameResetEmail(QueuedEmailMixin, email.UsernameResetEmail):
+    pass
@@ -6,6 +6,7 @@ from django.db import models
 from django.utils import timezone
 from django_cleanup import cleanup
 
+from core.models import UpdatedModel
 from users import utils
 
 PHONE_NUMBER_ERROR = (
@@ -16,7 +17,7 @@ PHONE_NUMBER_REGEX = r"^(\+7|7|8)\d{10}$"
 
 
 @cleanup.select
-class User(AbstractUser):
+class User(AbstractUser, UpdatedModel):
     """Extending the Built-in Model User."""
 
     def user_directory_path(self, filename):
@@ -67,7 +68,7 @@ class User(AbstractUser):
                 raise ValidationError("Указана неверная дата рождения.")
 
 
-class Address(models.Model):
+class Address(UpdatedModel):
     """Describes address of user."""
 
     address = models.TextField("Address")